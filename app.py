@@ -11,6 +11,7 @@ from routes.leaderboard import leaderboard_bp
 from routes.market import market_bp
 from routes.signals import signals_bp
 from routes.admin import admin_bp
+from services.scheduler import init_scheduler
 
 def create_app(config_name='default'):
     app = Flask(__name__)
@@ -49,6 +50,8 @@ def create_app(config_name='default'):
     with app.app_context():
         db.create_all()
 
+    init_scheduler(app)
+
     return app
 
 app = create_app(os.getenv('FLASK_ENV', 'development'))
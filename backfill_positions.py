@@ -0,0 +1,32 @@
+import argparse
+
+from flask import Flask
+
+from config import config
+from models import db
+from services.positions import rebuild_positions
+
+
+def main(args):
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    if args.database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        print("🔧 Reconstruction des positions à partir des trades...")
+        stats = rebuild_positions(batch_size=args.batch_size, update_trades=not args.keep_trades)
+
+    print(f"✅ {stats['trades']} trades rejoués, {stats['positions']} positions écrites")
+    if stats['oversold']:
+        print(f"ℹ️ {stats['oversold']} ventes dépassaient la quantité détenue (P&L réalisé sur la quantité détenue)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruit la table position en un seul passage sur les trades")
+    parser.add_argument('--batch-size', type=int, default=10_000, help="Lignes lues et écrites par lot")
+    parser.add_argument('--keep-trades', action='store_true', help="Ne pas renseigner profit_loss des ventes existantes")
+    parser.add_argument('--database-url', help="URL SQLAlchemy (défaut: SQLALCHEMY_DATABASE_URI)")
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.market_data import serialize_history
+
+
+def make_history(bars):
+    index = pd.date_range("2000-01-03", periods=bars, freq="1min", tz="America/New_York")
+    close = 100 + np.cumsum(np.random.standard_normal(bars))
+    return pd.DataFrame(
+        {
+            "Open": close + np.random.standard_normal(bars) * 0.1,
+            "High": close + 0.5,
+            "Low": close - 0.5,
+            "Close": close,
+            "Volume": np.random.randint(1_000, 1_000_000, size=bars),
+        },
+        index=index,
+    )
+
+
+def legacy_iterrows(hist):
+    chart_data = []
+    for index, row in hist.iterrows():
+        chart_data.append(
+            {
+                "timestamp": index.isoformat(),
+                "open": float(row["Open"]),
+                "high": float(row["High"]),
+                "low": float(row["Low"]),
+                "close": float(row["Close"]),
+                "volume": int(row["Volume"]),
+            }
+        )
+    return chart_data
+
+
+def timed(func, *args, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench():
+    print("=" * 60)
+    print("📊 BENCHMARK SÉRIALISATION OHLCV")
+    print("=" * 60)
+
+    for bars in (10_000, 100_000):
+        hist = make_history(bars)
+        print(f"\n📈 {bars} barres:")
+
+        legacy_time, legacy = timed(legacy_iterrows, hist, repeat=1)
+        rows_time, rows = timed(serialize_history, hist, "rows")
+        columns_time, columns = timed(serialize_history, hist, "columns")
+
+        assert rows == legacy, "Le format rows doit être identique à l'ancien format"
+
+        rows_size = len(json.dumps(rows))
+        columns_size = len(json.dumps(columns))
+
+        print(f"   iterrows (ancien):  {legacy_time * 1000:9.1f} ms")
+        print(f"   rows (vectorisé):   {rows_time * 1000:9.1f} ms  (x{legacy_time / rows_time:.0f})")
+        print(f"   columns:            {columns_time * 1000:9.1f} ms  (x{legacy_time / columns_time:.0f})")
+        print(f"   JSON rows:    {rows_size / 1024:9.0f} Ko")
+        print(f"   JSON columns: {columns_size / 1024:9.0f} Ko")
+
+
+if __name__ == "__main__":
+    bench()
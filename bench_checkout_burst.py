@@ -0,0 +1,127 @@
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+# Base SQLite jetable et pas de scheduler: à définir avant d'importer la config
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_checkout.db')
+os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+
+BURST = 10
+PROBES = 20
+
+
+def request(base, method, path, payload=None, token=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method)
+    req.add_header('Content-Type', 'application/json')
+    if token:
+        req.add_header('Authorization', f'Bearer {token}')
+    with urllib.request.urlopen(req, timeout=120) as response:
+        return response.status, json.loads(response.read())
+
+
+def add_legacy_checkout(app):
+    # Ancien comportement: le délai du paiement bloque le worker HTTP
+    @app.route('/bench/legacy-checkout', methods=['POST'])
+    def legacy_checkout():
+        time.sleep(Config.PAYMENT_PROCESSING_DELAY)
+        return {'status': 'completed'}, 201
+
+
+def start_server(app):
+    # Un seul thread: équivalent d'un worker gunicorn synchrone
+    server = make_server('127.0.0.1', 0, app, threaded=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def probe_latencies(base, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        request(base, 'GET', '/api/payment/plans')
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_burst(base, path, token):
+    statuses = []
+    threads = [
+        threading.Thread(target=lambda: statuses.append(
+            request(base, 'POST', path, {'plan_type': 'starter', 'payment_method': 'cmi'}, token)
+        ))
+        for _ in range(BURST)
+    ]
+    for thread in threads:
+        thread.start()
+    # Laisser les checkouts arriver avant de sonder les autres endpoints
+    time.sleep(0.05)
+    latencies = probe_latencies(base, PROBES)
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+
+def report(label, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"   {label:28s} p50 {statistics.median(ordered) * 1000:8.1f} ms"
+        f"   p95 {p95 * 1000:8.1f} ms   max {ordered[-1] * 1000:8.1f} ms"
+    )
+
+
+def bench():
+    print("=" * 60)
+    print(f"💳 BURST DE {BURST} CHECKOUTS (délai paiement {Config.PAYMENT_PROCESSING_DELAY}s, 1 worker)")
+    print("=" * 60)
+
+    app = create_app()
+    add_legacy_checkout(app)
+    server, base = start_server(app)
+
+    _, auth = request(base, 'POST', '/api/auth/register', {
+        'username': 'bench', 'email': 'bench@example.com', 'password': 'bench123'
+    })
+    token = auth['access_token']
+
+    report("sans charge", probe_latencies(base, PROBES))
+
+    latencies, _ = run_burst(base, '/bench/legacy-checkout', token)
+    report("checkout bloquant (ancien)", latencies)
+
+    latencies, statuses = run_burst(base, '/api/payment/checkout', token)
+    report("checkout asynchrone", latencies)
+    assert all(status == 202 for status, _ in statuses), "Le checkout doit répondre 202"
+
+    # Attendre la fin des jobs via l'endpoint de statut
+    start = time.perf_counter()
+    pending = {body['job_id'] for _, body in statuses}
+    while pending:
+        time.sleep(0.2)
+        for job_id in list(pending):
+            _, status = request(base, 'GET', f'/api/payment/status/{job_id}', token=token)
+            if status['status'] != 'pending':
+                assert status['status'] == 'completed' and status['challenge'], status
+                pending.discard(job_id)
+        if time.perf_counter() - start > 60:
+            print("❌ Jobs toujours en attente après 60s")
+            sys.exit(1)
+    print(f"\n✅ {BURST} paiements finalisés et challenges créés en {time.perf_counter() - start:.1f}s")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    bench()
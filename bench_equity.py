@@ -0,0 +1,133 @@
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from flask import Flask
+from sqlalchemy import insert
+
+from config import config
+from models import db, User, Challenge, Position
+from services.equity import mark_to_market, peek_price
+from services.market_data import QUOTE_CACHE
+from services.morocco_scraper import MOROCCO_CACHE
+
+CHALLENGES = 5_000
+POSITIONS_PER_CHALLENGE = 5
+SYMBOLS = ['AAPL', 'TSLA', 'GOOGL', 'AMZN', 'MSFT', 'BTC-USD', 'ETH-USD']
+MOROCCO_TICKERS = ['IAM', 'ATW', 'BCP', 'MNG', 'SNEP']
+RUNS = 5
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    path = os.path.join(tempfile.mkdtemp(), 'bench_equity.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('BENCH_DATABASE_URL', f'sqlite:///{path}')
+    db.init_app(app)
+    return app
+
+
+def seed():
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    db.session.execute(insert(User), [
+        {
+            'id': i,
+            'username': f'user{i}',
+            'email': f'user{i}@example.com',
+            'password_hash': 'x',
+            'role': 'user',
+            'created_at': now,
+            'is_active': True
+        }
+        for i in range(1, CHALLENGES + 1)
+    ])
+    db.session.execute(insert(Challenge), [
+        {
+            'id': i,
+            'user_id': i,
+            'plan_type': 'starter',
+            'initial_balance': 5000.0,
+            'current_balance': 5000.0 * rng.uniform(0.2, 0.8),
+            'daily_start_balance': 5000.0,
+            'status': 'active',
+            'profit_target': 10.0,
+            'max_daily_loss_percent': 5.0,
+            'max_total_loss_percent': 10.0,
+            'started_at': now
+        }
+        for i in range(1, CHALLENGES + 1)
+    ])
+    universe = SYMBOLS + MOROCCO_TICKERS + ['UNPRICED']
+    db.session.execute(insert(Position), [
+        {
+            'challenge_id': i,
+            'symbol': symbol,
+            'quantity': float(rng.randint(1, 20)),
+            'avg_cost': rng.uniform(50, 150),
+            'realized_pnl': 0.0,
+            'updated_at': now
+        }
+        for i in range(1, CHALLENGES + 1)
+        for symbol in rng.sample(universe, POSITIONS_PER_CHALLENGE)
+    ])
+    db.session.commit()
+
+    # Cotations en cache, comme après un passage du scheduler
+    for symbol in SYMBOLS:
+        QUOTE_CACHE.set(symbol, {'symbol': symbol, 'price': rng.uniform(50, 150)}, 3600)
+    for ticker in MOROCCO_TICKERS:
+        MOROCCO_CACHE.set(ticker, {'symbol': ticker, 'price': rng.uniform(50, 150)}, 3600)
+
+
+def naive_equity():
+    """Valorisation challenge par challenge (une requête et une boucle par challenge)"""
+    results = {}
+    for challenge in Challenge.query.filter_by(status='active').all():
+        equity = challenge.current_balance
+        for position in Position.query.filter_by(challenge_id=challenge.id).all():
+            price = peek_price(position.symbol)
+            equity += position.quantity * (price if price is not None else position.avg_cost)
+        results[challenge.id] = equity
+    db.session.expunge_all()
+    return results
+
+
+def timed(func, runs):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    return result, sorted(durations)[len(durations) // 2]
+
+
+def bench():
+    print("=" * 60)
+    print(f"📈 BENCHMARK VALORISATION ({CHALLENGES:,} challenges x {POSITIONS_PER_CHALLENGE} positions)")
+    print("=" * 60)
+
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+
+        expected, naive = timed(naive_equity, 1)
+        snapshot, vectorized = timed(mark_to_market, RUNS)
+
+        actual = dict(zip(snapshot['challenge_ids'].tolist(), snapshot['equity'].tolist()))
+        error = max(abs(actual[cid] - value) for cid, value in expected.items())
+
+        print(f"\n   boucle par challenge   {naive * 1000:10.1f} ms")
+        print(f"   passage vectorisé      {vectorized * 1000:10.1f} ms  (x{naive / vectorized:.0f})")
+        print(f"   symboles sans cotation {snapshot['unpriced_symbols']}")
+        print(f"   écart max d'equity     {error:.2e}")
+        print(f"   drawdown journalier max {np.max(snapshot['daily_drawdown_percent']):.2f}%")
+
+
+if __name__ == "__main__":
+    bench()
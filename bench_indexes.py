@@ -0,0 +1,172 @@
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import insert, text
+
+from config import config
+from migrate_indexes import ensure_indexes
+from models import db, User, Challenge, Trade, Payment
+
+USERS = 5_000
+CHALLENGES_PER_USER = 3
+TRADES = 1_000_000
+CHUNK = 50_000
+SAMPLES = 200
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    path = os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('BENCH_DATABASE_URL', f'sqlite:///{path}')
+    db.init_app(app)
+    return app
+
+
+def drop_model_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+    db.session.commit()
+
+
+def seed():
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    db.session.execute(insert(User), [
+        {
+            'id': user_id,
+            'username': f'user{user_id}',
+            'email': f'user{user_id}@example.com',
+            'password_hash': 'x',
+            'role': 'user',
+            'created_at': now,
+            'is_active': True
+        }
+        for user_id in range(1, USERS + 1)
+    ])
+
+    challenges = []
+    for user_id in range(1, USERS + 1):
+        for n in range(CHALLENGES_PER_USER):
+            challenges.append({
+                'id': len(challenges) + 1,
+                'user_id': user_id,
+                'plan_type': 'starter',
+                'initial_balance': 5000.0,
+                'current_balance': 5000.0 * rng.uniform(0.9, 1.1),
+                'daily_start_balance': 5000.0,
+                # Un seul challenge actif par utilisateur, les autres terminés
+                'status': 'active' if n == CHALLENGES_PER_USER - 1 else rng.choice(['passed', 'failed']),
+                'profit_target': 10.0,
+                'max_daily_loss_percent': 5.0,
+                'max_total_loss_percent': 10.0,
+                'started_at': now - timedelta(days=rng.randint(0, 365))
+            })
+    db.session.execute(insert(Challenge), challenges)
+
+    db.session.execute(insert(Payment), [
+        {
+            'user_id': c['user_id'],
+            'amount': 200.0,
+            'currency': 'DH',
+            'payment_method': 'cmi',
+            'status': 'completed',
+            'transaction_id': f'tx-{c["id"]}',
+            'created_at': c['started_at']
+        }
+        for c in challenges
+    ])
+
+    for start in range(0, TRADES, CHUNK):
+        rows = []
+        for _ in range(min(CHUNK, TRADES - start)):
+            challenge = challenges[rng.randrange(len(challenges))]
+            rows.append({
+                'challenge_id': challenge['id'],
+                'user_id': challenge['user_id'],
+                'symbol': rng.choice(['AAPL', 'TSLA', 'BTC-USD', 'IAM']),
+                'action': rng.choice(['buy', 'sell']),
+                'quantity': 1.0,
+                'price': 100.0,
+                'profit_loss': 0.0,
+                'timestamp': challenge['started_at'] + timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+            })
+        db.session.execute(insert(Trade), rows)
+    db.session.commit()
+
+
+def month_range():
+    now = datetime.utcnow()
+    start = datetime(now.year, now.month, 1)
+    end = datetime(now.year + (now.month == 12), now.month % 12 + 1, 1)
+    return start, end
+
+
+QUERIES = {
+    'challenge actif (user, status)': lambda uid: Challenge.query.filter_by(
+        user_id=uid, status='active').first(),
+    'historique trades (user, date)': lambda uid: Trade.query.filter_by(
+        user_id=uid).order_by(Trade.timestamp.desc()).all(),
+    'trades d\'un challenge': lambda uid: Trade.query.filter_by(
+        challenge_id=uid * CHALLENGES_PER_USER).count(),
+    'historique paiements': lambda uid: Payment.query.filter_by(
+        user_id=uid).order_by(Payment.created_at.desc()).all(),
+    'challenges du mois (plage)': lambda uid: Challenge.query.filter(
+        Challenge.started_at >= month_range()[0],
+        Challenge.started_at < month_range()[1]).count(),
+}
+
+
+def run_queries():
+    rng = random.Random(7)
+    user_ids = [rng.randint(1, USERS) for _ in range(SAMPLES)]
+    results = {}
+    for label, query in QUERIES.items():
+        samples = user_ids if 'mois' not in label else user_ids[:20]
+        start = time.perf_counter()
+        for uid in samples:
+            query(uid)
+            db.session.expunge_all()
+        results[label] = (time.perf_counter() - start) / len(samples)
+    return results
+
+
+def bench():
+    print("=" * 60)
+    print(f"🗂️  BENCHMARK INDEX ({TRADES:,} trades, {USERS:,} utilisateurs)")
+    print("=" * 60)
+
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        drop_model_indexes()
+
+        start = time.perf_counter()
+        seed()
+        print(f"\n🌱 Données générées en {time.perf_counter() - start:.1f}s")
+
+        before = run_queries()
+
+        start = time.perf_counter()
+        created = ensure_indexes()
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(text('ANALYZE'))
+        print(f"🔧 {len(created)} index créés en {time.perf_counter() - start:.1f}s\n")
+
+        after = run_queries()
+
+        for label in QUERIES:
+            print(
+                f"   {label:32s} {before[label] * 1000:9.2f} ms -> {after[label] * 1000:7.2f} ms"
+                f"  (x{before[label] / after[label]:.0f})"
+            )
+
+
+if __name__ == "__main__":
+    bench()
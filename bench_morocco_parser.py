@@ -0,0 +1,83 @@
+import time
+import tracemalloc
+
+from services.morocco_parsers import HAS_LXML, PARSER_BACKENDS, parse_quote_page, parse_snapshot_page
+
+
+def make_quote_page(ticker, news=300):
+    # Page de cotation typique: menu, scripts, fil d'actualités, puis la cotation
+    menu = "".join(f'<li class="nav-item"><a href="/secteur/{i}">Secteur {i}</a></li>' for i in range(80))
+    items = "".join(
+        f'<article class="news"><h3><a href="/news/{i}">Titre {i}</a></h3>'
+        f'<p class="summary">Résumé de l\'article {i} sur la séance du jour.</p>'
+        f'<span class="date">2024-01-{i % 28 + 1:02d}</span></article>'
+        for i in range(news)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Cotation</title>"
+        + "".join(f'<script src="/static/app{i}.js"></script>' for i in range(20))
+        + "<style>.price{font-weight:bold}</style></head><body>"
+        + f'<nav><ul>{menu}</ul></nav>'
+        + f'<div class="quote"><h1 class="company-name">Société {ticker}</h1>'
+        + '<span class="price">1,234.50</span><span class="change-percent">+0.75%</span></div>'
+        + f'<section class="feed">{items}</section>'
+        + "<footer>Bourse de Casablanca</footer></body></html>"
+    ).encode("utf-8")
+
+
+def make_snapshot_page(rows=80):
+    body = "".join(
+        f'<tr data-ticker="T{i:03d}"><td class="company-name">Société {i}</td>'
+        f'<td class="price">{100 + i}.25</td><td class="change-percent">-0.{i % 10}%</td>'
+        f'<td class="volume">{i * 1000}</td></tr>'
+        for i in range(rows)
+    )
+    return (
+        "<html><body><nav>" + "<a href='#'>lien</a>" * 200 + "</nav>"
+        + f'<table class="cotations"><tbody>{body}</tbody></table></body></html>'
+    ).encode("utf-8")
+
+
+def measure(func, page, backend, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(page, backend)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(page, backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def bench():
+    print("=" * 60)
+    print("🧪 BENCHMARK PARSING HTML (Bourse de Casablanca)")
+    print("=" * 60)
+    if not HAS_LXML:
+        print("⚠️  lxml non installé: les backends lxml et strainer utilisent html.parser")
+
+    fixtures = [
+        ("page de cotation", parse_quote_page, make_quote_page("IAM")),
+        ("page du marché", parse_snapshot_page, make_snapshot_page()),
+    ]
+
+    for label, func, page in fixtures:
+        print(f"\n📄 {label} ({len(page) / 1024:.0f} Ko):")
+        reference = None
+        baseline = None
+        for backend in PARSER_BACKENDS:
+            elapsed, peak, result = measure(func, page, backend)
+            if reference is None:
+                reference, baseline = result, elapsed
+            assert result == reference, f"{backend} ne retourne pas les mêmes données"
+            print(
+                f"   {backend:12s} {elapsed * 1000:8.2f} ms/page"
+                f"  (x{baseline / elapsed:4.1f})   pic mémoire {peak / 1024:8.0f} Ko"
+            )
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,121 @@
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import insert
+
+from config import config
+from models import db, User, Challenge, Position
+from routes.trading import check_challenge_rules
+from services.equity import challenge_equity
+from services.market_data import QUOTE_CACHE
+from services.sweeper import reset_daily_start_balances, sweep_rules
+
+CHALLENGES = 100_000
+WITH_POSITIONS = 0.5
+SYMBOLS = ['AAPL', 'TSLA', 'MSFT', 'BTC-USD']
+CHUNK = 20_000
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    path = os.path.join(tempfile.mkdtemp(), 'bench_sweeper.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('BENCH_DATABASE_URL', f'sqlite:///{path}')
+    db.init_app(app)
+    return app
+
+
+def seed():
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    for start in range(1, CHALLENGES + 1, CHUNK):
+        ids = range(start, min(start + CHUNK, CHALLENGES + 1))
+        db.session.execute(insert(User), [
+            {
+                'id': i,
+                'username': f'user{i}',
+                'email': f'user{i}@example.com',
+                'password_hash': 'x',
+                'role': 'user',
+                'created_at': now,
+                'is_active': True
+            }
+            for i in ids
+        ])
+        db.session.execute(insert(Challenge), [
+            {
+                'id': i,
+                'user_id': i,
+                'plan_type': 'starter',
+                'initial_balance': 5000.0,
+                # Environ un quart des challenges en infraction (surtout perte journalière)
+                'current_balance': 5000.0 * rng.uniform(0.93, 1.11),
+                'daily_start_balance': 5000.0 * rng.uniform(0.99, 1.01),
+                'status': 'active',
+                'profit_target': 10.0,
+                'max_daily_loss_percent': 5.0,
+                'max_total_loss_percent': 10.0,
+                'started_at': now
+            }
+            for i in ids
+        ])
+        db.session.execute(insert(Position), [
+            {
+                'challenge_id': i,
+                'symbol': rng.choice(SYMBOLS),
+                'quantity': float(rng.randint(1, 5)),
+                'avg_cost': 100.0,
+                'realized_pnl': 0.0,
+                'updated_at': now
+            }
+            for i in ids if rng.random() < WITH_POSITIONS
+        ])
+    db.session.commit()
+
+    for symbol in SYMBOLS:
+        QUOTE_CACHE.set(symbol, {'symbol': symbol, 'price': rng.uniform(80, 120)}, 3600)
+
+
+def naive_sweep():
+    """Règles appliquées objet par objet (check_challenge_rules), puis annulées"""
+    ended = {}
+    for challenge in Challenge.query.filter_by(status='active').all():
+        if check_challenge_rules(challenge, challenge_equity(challenge)[0])['status'] != 'active':
+            ended[challenge.id] = challenge.status
+    db.session.rollback()
+    return ended
+
+
+def bench():
+    print("=" * 60)
+    print(f"🧹 BENCHMARK SWEEPER ({CHALLENGES:,} challenges actifs)")
+    print("=" * 60)
+
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+
+        start = time.perf_counter()
+        expected = naive_sweep()
+        naive = time.perf_counter() - start
+
+        sweep = sweep_rules()
+        actual = dict(db.session.query(Challenge.id, Challenge.status).filter(Challenge.status != 'active'))
+
+        reset = reset_daily_start_balances()
+
+        print(f"\n   objet par objet       {naive * 1000:10.0f} ms  ({len(expected):,} terminés)")
+        print(f"   sweeper SQL           {sweep['duration_ms']:10.0f} ms  ({sweep['updated']:,} terminés,"
+              f" {sweep['batches']} lots, lot le plus lent {sweep['slowest_batch_ms']:.0f} ms)  (x{naive * 1000 / sweep['duration_ms']:.0f})")
+        print(f"   réinitialisation      {reset['duration_ms']:10.0f} ms  ({reset['updated']:,} challenges)")
+        print(f"   mêmes statuts         {'✅' if actual == expected else '❌'}")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+
+# Base SQLite jetable et pas de scheduler: à définir avant d'importer la config
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_trade_batch.db')
+os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+os.environ['PAYMENT_PROCESSING_DELAY'] = '0'
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from models import db, Challenge  # noqa: E402
+
+ORDERS = 1000
+BATCH_SIZES = (10, 100, 500)
+
+
+def request(base, method, path, payload=None, token=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method)
+    req.add_header('Content-Type', 'application/json')
+    if token:
+        req.add_header('Authorization', f'Bearer {token}')
+    with urllib.request.urlopen(req, timeout=120) as response:
+        return response.status, json.loads(response.read())
+
+
+def setup_user(app, base, name):
+    _, auth = request(base, 'POST', '/api/auth/register', {
+        'username': name, 'email': f'{name}@example.com', 'password': 'bench123'
+    })
+    token = auth['access_token']
+    _, job = request(base, 'POST', '/api/payment/checkout', {'plan_type': 'elite', 'payment_method': 'cmi'}, token)
+    while request(base, 'GET', f"/api/payment/status/{job['job_id']}", token=token)[1]['status'] == 'pending':
+        time.sleep(0.01)
+
+    with app.app_context():
+        challenge = Challenge.query.filter_by(user_id=auth['user']['id'], status='active').one()
+        # Règles désactivées pour que tous les ordres soient exécutés
+        challenge.max_daily_loss_percent = 1000
+        challenge.max_total_loss_percent = 1000
+        challenge.profit_target = 1000
+        db.session.commit()
+    return token
+
+
+def make_orders(count):
+    return [
+        {'symbol': 'AAPL', 'action': 'sell' if i % 2 else 'buy', 'quantity': 1, 'price': 100.0 + i % 5}
+        for i in range(count)
+    ]
+
+
+def bench():
+    print("=" * 60)
+    print(f"⚡ BENCHMARK EXÉCUTION DE {ORDERS} ORDRES")
+    print("=" * 60)
+
+    app = create_app()
+    server = make_server('127.0.0.1', 0, app, threaded=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    token = setup_user(app, base, 'single')
+    start = time.perf_counter()
+    for order in make_orders(ORDERS):
+        status, _ = request(base, 'POST', '/api/trades/execute', order, token)
+        assert status == 200
+    single = time.perf_counter() - start
+    print(f"\n   /execute (1 ordre/requête)     {ORDERS / single:8.0f} ordres/s   {single:6.2f}s")
+
+    for size in BATCH_SIZES:
+        token = setup_user(app, base, f'batch{size}')
+        orders = make_orders(ORDERS)
+        start = time.perf_counter()
+        for i in range(0, ORDERS, size):
+            status, body = request(base, 'POST', '/api/trades/execute-batch', {'orders': orders[i:i + size]}, token)
+            assert status == 200 and body['executed'] == len(orders[i:i + size]), body
+        elapsed = time.perf_counter() - start
+        print(
+            f"   /execute-batch ({size:3d} ordres/lot) {ORDERS / elapsed:8.0f} ordres/s   {elapsed:6.2f}s"
+            f"  (x{single / elapsed:.1f})"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    bench()
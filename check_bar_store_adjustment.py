@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Store de barres jetable: à définir avant d'importer la config
+os.environ['BAR_STORE_DIR'] = tempfile.mkdtemp()
+os.environ['BAR_STORE_REFRESH_SECONDS'] = '0'
+
+from services import bar_store  # noqa: E402
+
+SYMBOL = 'AAPL'
+
+
+class FixtureSource:
+    """
+    Source de barres journalières ajustées, à la place de yfinance (pas de
+    réseau): journal des téléchargements, dividende appliqué à la demande
+    """
+
+    def __init__(self, days):
+        self.index = pd.date_range(end=pd.Timestamp.now(tz='UTC').normalize(), periods=days, freq='D')
+        self.closes = np.round(100 + np.cumsum(np.random.default_rng(4).normal(0, 1, days)), 2)
+        self.visible = days - 2
+        self.log = []
+
+    def frame(self, start=None):
+        index, closes = self.index[:self.visible], self.closes[:self.visible]
+        if start is not None:
+            keep = index >= start
+            index, closes = index[keep], closes[keep]
+        return pd.DataFrame({'Open': closes, 'High': closes, 'Low': closes, 'Close': closes,
+                             'Volume': np.full(closes.size, 1000.0)}, index=index)
+
+    def history(self, start=None, period=None, interval='1d'):
+        # Un rafraîchissement incrémental part des deux dernières barres
+        self.log.append('incremental' if start is not None and start >= self.index[self.visible - 3] else 'full')
+        return self.frame(start)
+
+    def download(self, tickers, start=None, **kwargs):
+        self.log.append('grouped')
+        return self.frame(start)
+
+    def new_day(self):
+        self.visible += 1
+
+    def dividend(self, factor):
+        # Ajustement rétroactif de toutes les barres passées, comme auto_adjust
+        self.closes[:self.visible] = np.round(self.closes[:self.visible] * factor, 4)
+
+
+def report(label, ok, detail=''):
+    print(f"{'✅' if ok else '❌'} {label}" + (f" ({detail})" if detail else ''))
+    return ok
+
+
+def matches_source(source):
+    # Le rechargement complet couvre la période du store, pas tout l'historique de la source
+    stored = bar_store.load_closes(SYMBOL, '1d')[1].tolist()
+    return len(stored) >= 60 and stored == source.frame()['Close'].tolist()[-len(stored):]
+
+
+def main():
+    source = FixtureSource(120)
+    bar_store.yf.Ticker = lambda symbol: source
+    bar_store.yf.download = source.download
+
+    print("=" * 60)
+    print("🧮 STORE DE BARRES: réajustement après dividende")
+    print("=" * 60)
+    results = []
+
+    bar_store.refresh(SYMBOL, '1d', '3mo')
+    bar_store.refresh(SYMBOL, '1d', '3mo')
+    results.append(report(
+        "rafraîchissement sans réajustement: barres ajoutées seulement",
+        source.log == ['full', 'incremental'] and matches_source(source),
+        f"téléchargements {source.log}"
+    ))
+
+    # Dividende + nouvelle barre: la barre de recouvrement a changé
+    source.log.clear()
+    source.dividend(0.98)
+    source.new_day()
+    bar_store.refresh(SYMBOL, '1d', '3mo')
+    results.append(report(
+        "refresh: historique réajusté rechargé en entier",
+        source.log == ['incremental', 'full'] and matches_source(source),
+        f"téléchargements {source.log}"
+    ))
+
+    # Même scénario par le téléchargement groupé
+    source.log.clear()
+    source.dividend(0.95)
+    source.new_day()
+    errors = bar_store.refresh_many([SYMBOL], '1d', '3mo')
+    results.append(report(
+        "refresh_many: historique réajusté rechargé en entier",
+        not errors and source.log == ['grouped', 'incremental', 'full']
+        and matches_source(source),
+        f"téléchargements {source.log}"
+    ))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+
+# Base jetable et pas de scheduler: à définir avant d'importer la config
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'check_batch.db')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', f'sqlite:///{DB_PATH}')
+os.environ['SCHEDULER_ENABLED'] = 'false'
+os.environ['PAYMENT_PROCESSING_DELAY'] = '0'
+
+import routes.trading  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db, Challenge, Position, Trade  # noqa: E402
+
+FAILING_INDEX = 3
+ORDERS = [{'symbol': 'AAPL', 'action': 'buy', 'quantity': 1, 'price': 10.0 + i} for i in range(6)]
+
+
+def report(label, ok, detail=''):
+    print(f"{'✅' if ok else '❌'} {label}" + (f" ({detail})" if detail else ''))
+    return ok
+
+
+def setup_user(app, client, name):
+    auth = client.post('/api/auth/register', json={
+        'username': name, 'email': f'{name}@example.com', 'password': 'check123'
+    }).get_json()
+    headers = {'Authorization': f"Bearer {auth['access_token']}"}
+    job = client.post('/api/payment/checkout', json={'plan_type': 'starter', 'payment_method': 'cmi'}, headers=headers).get_json()
+    while client.get(f"/api/payment/status/{job['job_id']}", headers=headers).get_json()['status'] == 'pending':
+        pass
+
+    with app.app_context():
+        challenge = Challenge.query.filter_by(user_id=auth['user']['id'], status='active').one()
+        # Règles désactivées: seul le contenu du lot compte
+        challenge.max_daily_loss_percent = 1000
+        challenge.max_total_loss_percent = 1000
+        challenge.profit_target = 1000
+        db.session.commit()
+        return headers, challenge.id, challenge.current_balance
+
+
+def snapshot(app, challenge_id):
+    with app.app_context():
+        challenge = db.session.get(Challenge, challenge_id)
+        position = Position.query.filter_by(challenge_id=challenge_id, symbol='AAPL').first()
+        return (
+            challenge.current_balance,
+            Trade.query.filter_by(challenge_id=challenge_id).count(),
+            position.quantity if position else 0
+        )
+
+
+def failing_apply_trade(apply_trade):
+    """Erreur inattendue (non TradeRejected) sur l'ordre FAILING_INDEX, après ses écritures"""
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        result = apply_trade(*args, **kwargs)
+        calls.append(args)
+        if len(calls) == FAILING_INDEX + 1:
+            raise RuntimeError('panne simulée')
+        return result
+
+    return wrapper
+
+
+def main():
+    app = create_app()
+    client = app.test_client()
+
+    print("=" * 60)
+    print(f"🧾 LOT DE TRADES: échec de l'ordre {FAILING_INDEX + 1} sur {len(ORDERS)}")
+    print("=" * 60)
+    results = []
+
+    # Erreur inattendue au milieu du lot: les ordres précédents, déjà
+    # libérés de leur savepoint, sont annulés avec le reste du lot
+    headers, challenge_id, initial = setup_user(app, client, 'batch_failure')
+    original = routes.trading.apply_trade
+    routes.trading.apply_trade = failing_apply_trade(original)
+    try:
+        response = client.post('/api/trades/execute-batch', json={'orders': ORDERS}, headers=headers)
+    finally:
+        routes.trading.apply_trade = original
+    balance, trades, quantity = snapshot(app, challenge_id)
+    results.append(report(
+        "erreur en cours de lot: lot entier annulé",
+        response.status_code == 400 and balance == initial and trades == 0 and quantity == 0,
+        f"HTTP {response.status_code}, balance {balance:.2f} / {initial:.2f}, {trades} trades, position {quantity}"
+    ))
+
+    # Le même lot sans panne passe en entier
+    response = client.post('/api/trades/execute-batch', json={'orders': ORDERS}, headers=headers)
+    balance, trades, quantity = snapshot(app, challenge_id)
+    expected = initial - sum(order['quantity'] * order['price'] for order in ORDERS)
+    results.append(report(
+        "lot rejoué sans panne: tous les ordres validés",
+        response.status_code == 200 and abs(balance - expected) < 1e-6
+        and trades == len(ORDERS) and quantity == len(ORDERS),
+        f"balance {balance:.2f} / {expected:.2f}, {trades} trades"
+    ))
+
+    # Ordre refusé au milieu du lot: seul cet ordre est annulé (la vente
+    # sans position a déjà crédité la balance quand elle est refusée)
+    headers, challenge_id, initial = setup_user(app, client, 'batch_rejected')
+    orders = list(ORDERS)
+    orders[FAILING_INDEX] = {'symbol': 'AAPL', 'action': 'sell', 'quantity': 100, 'price': 50.0}
+    response = client.post('/api/trades/execute-batch', json={'orders': orders}, headers=headers)
+    statuses = [result['status'] for result in response.get_json()['results']]
+    balance, trades, quantity = snapshot(app, challenge_id)
+    kept = [order for index, order in enumerate(orders) if index != FAILING_INDEX]
+    expected = initial - sum(order['quantity'] * order['price'] for order in kept)
+    results.append(report(
+        "ordre refusé en cours de lot: seuls ses effets annulés",
+        response.status_code == 200 and statuses[FAILING_INDEX] == 'rejected'
+        and statuses.count('executed') == len(kept) and abs(balance - expected) < 1e-6
+        and trades == len(kept) and quantity == len(kept),
+        f"balance {balance:.2f} / {expected:.2f}, {trades} trades, position {quantity}"
+    ))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Store de barres jetable, sans accès réseau: à définir avant d'importer la config
+os.environ['BAR_STORE_DIR'] = tempfile.mkdtemp()
+os.environ['BAR_STORE_REFRESH_SECONDS'] = '86400'
+os.environ['CACHE_BACKEND'] = 'memory'
+
+from services import bar_store  # noqa: E402
+from services.ai_signals import (  # noqa: E402
+    IndicatorEngine, calculate_ma, calculate_rsi, generate_signal_from_closes,
+    indicator_series, memoized_signal, MA_LONG, MA_SHORT
+)
+from services.market_data import get_chart_data  # noqa: E402
+
+BARS = 300
+DAY = 86400
+
+
+def report(label, ok, detail=''):
+    print(f"{'✅' if ok else '❌'} {label}" + (f" ({detail})" if detail else ''))
+    return ok
+
+
+def random_closes(seed):
+    rng = np.random.default_rng(seed)
+    closes = 100 + np.cumsum(rng.normal(0, 1, BARS))
+    # Paliers plats: gains et pertes nuls (RSI à 50, 0 ou 100)
+    closes[40:60] = closes[40]
+    closes[100:130] = np.maximum.accumulate(closes[100:130])
+    return np.round(closes, 2)
+
+
+def reference(closes):
+    return {
+        'rsi': [calculate_rsi(closes[:i + 1]) for i in range(closes.size)],
+        'ma20': [calculate_ma(closes[:i + 1], MA_SHORT) for i in range(closes.size)],
+        'ma50': [calculate_ma(closes[:i + 1], MA_LONG) for i in range(closes.size)],
+    }
+
+
+class Source:
+    """Barres servies à IndicatorEngine.advance, avec le nombre de barres lues"""
+
+    def __init__(self, timestamps, closes):
+        self.timestamps = timestamps
+        self.closes = closes
+        self.read = 0
+
+    def __call__(self, since):
+        first = int(np.searchsorted(self.timestamps, since)) if since is not None else 0
+        self.read += self.timestamps.size - first
+        return self.timestamps[first:], self.closes[first:]
+
+
+def main():
+    print("=" * 60)
+    print(f"📈 INDICATEURS: moteur incrémental et séries vs calcul complet ({BARS} barres)")
+    print("=" * 60)
+    results = []
+    closes = random_closes(6)
+    timestamps = np.arange(BARS, dtype=np.int64) * DAY
+    expected = reference(closes)
+
+    # 1. Séries complètes: valeur i identique au calcul sur closes[:i + 1]
+    series = indicator_series(closes)
+    mismatches = sum(series[name].tolist() != expected[name] for name in expected)
+    results.append(report("indicator_series identique barre à barre", mismatches == 0, f"{mismatches} séries différentes"))
+
+    # 2. Moteur avancé barre par barre: seules les nouvelles barres sont lues
+    engine = IndicatorEngine()
+    source = Source(timestamps[:2], closes[:2])
+    identical = True
+    for i in range(1, BARS):
+        source.timestamps, source.closes = timestamps[:i + 1], closes[:i + 1]
+        indicators = engine.advance(('TEST', '1d'), source)
+        identical &= (
+            indicators['rsi'] == expected['rsi'][i]
+            and indicators['ma20'] == expected['ma20'][i]
+            and indicators['ma50'] == expected['ma50'][i]
+        )
+    results.append(report(
+        "moteur incrémental identique à calculate_rsi / calculate_ma", identical,
+        f"{source.read} barres lues pour {BARS - 1} mises à jour"
+    ))
+    results.append(report("une mise à jour ne relit que la dernière barre", source.read <= 2 * BARS))
+
+    # 3. Dernière barre révisée: état reconstruit depuis l'historique
+    revised = closes.copy()
+    revised[-1] += 5
+    indicators = engine.advance(('TEST', '1d'), Source(timestamps, revised))
+    results.append(report(
+        "barre révisée: état reconstruit",
+        indicators['rsi'] == calculate_rsi(revised) and indicators['ma20'] == calculate_ma(revised, MA_SHORT),
+        f"RSI {indicators['rsi']:.4f}"
+    ))
+
+    # 4. Signal mémoïsé (moteur) == signal recalculé sur tout l'historique
+    source = Source(timestamps, closes)
+    signal = memoized_signal('TEST', '1d', (int(timestamps[-1]), float(closes[-1])), source)
+    results.append(report(
+        "signal du moteur identique à generate_signal_from_closes",
+        signal == generate_signal_from_closes('TEST', closes),
+        signal['signal']
+    ))
+
+    # 5. Graphique: indicateurs calculés sur tout le store, alignés sur la période
+    now = time.time()
+    stored = np.round(random_closes(7), 2)
+    stamps = (now - DAY * np.arange(BARS)[::-1]).astype(np.int64).astype(float)
+    base = bar_store._base_path('AAPL', '1d')
+    bar_store._write_bars(base, np.vstack([stamps, stored, stored, stored, stored, np.full(BARS, 1000.0)]))
+    bar_store._write_meta(base, {'tz': 'UTC', 'coverage_start': 0, 'refreshed_at': now})
+    chart = get_chart_data('AAPL', '1d', '1mo', 'columns', indicators=True)
+    count = len(chart['close'])
+    full = reference(stored)
+    results.append(report(
+        "graphique: indicateurs alignés sur les barres affichées",
+        all(chart[name] == full[name][-count:] for name in full),
+        f"{count} barres sur {BARS} stockées"
+    ))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import os
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Request, Response
+
+QUOTE_PAGE = """<html><body>
+<h1 class="company-name">Lafarge Holcim Maroc</h1>
+<span class="price">1,845.00</span>
+<span class="change-percent">+0.82%</span>
+</body></html>"""
+
+ETAG = '"lhm-v1"'
+
+
+class FixtureSite:
+    """
+    Site de cotations local: pages HTML fixes, 503 à la demande, et
+    journal des requêtes (ticker, If-None-Match)
+    """
+
+    def __init__(self, failures):
+        self.failures = dict(failures)
+        self.log = []
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        ticker = request.path.rsplit('/', 1)[-1]
+        with self.lock:
+            self.log.append((ticker, request.headers.get('If-None-Match')))
+            failures = self.failures.get(ticker, 0)
+            if failures:
+                self.failures[ticker] = failures - 1
+
+        if failures:
+            response = Response('indisponible', status=503)
+        elif request.headers.get('If-None-Match') == ETAG:
+            response = Response(status=304, headers={'ETag': ETAG})
+        else:
+            response = Response(QUOTE_PAGE, mimetype='text/html', headers={'ETag': ETAG})
+        return response(environ, start_response)
+
+    def requests_for(self, ticker):
+        with self.lock:
+            return [entry for entry in self.log if entry[0] == ticker]
+
+
+# 2 échecs pour FLAKY (rattrapés par les retries), toujours en échec pour DOWN
+site = FixtureSite({'FLAKY': 2, 'DOWN': 10 ** 6})
+server = make_server('127.0.0.1', 0, site, threaded=True)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+# Le scraper lit sa configuration à l'import
+os.environ['MOROCCO_BASE_URL'] = f'http://127.0.0.1:{server.server_port}/cotation'
+os.environ['MOROCCO_SNAPSHOT_URL'] = ''
+os.environ['MOROCCO_HTTP_RETRIES'] = '2'
+os.environ['MOROCCO_HTTP_BACKOFF'] = '0.1'
+os.environ['CACHE_BACKEND'] = 'memory'
+
+from config import Config  # noqa: E402
+from services.morocco_scraper import (  # noqa: E402
+    get_scraper_metrics, get_session, scrape_casablanca_stock
+)
+
+
+def report(label, ok, detail=''):
+    print(f"{'✅' if ok else '❌'} {label}" + (f" ({detail})" if detail else ''))
+    return ok
+
+
+def main():
+    print("=" * 60)
+    print("🌐 SCRAPER CASABLANCA: serveur local de pages fixes")
+    print("=" * 60)
+    results = []
+
+    # 1. Requête conditionnelle: la page inchangée revient en 304
+    first = scrape_casablanca_stock('LHM')
+    second = scrape_casablanca_stock('LHM', force_refresh=True)
+    requests_lhm = site.requests_for('LHM')
+    results.append(report(
+        "page parsée au premier appel",
+        first.get('price') == 1845.0 and first.get('company_name') == 'Lafarge Holcim Maroc',
+        f"prix {first.get('price')}"
+    ))
+    results.append(report(
+        "304 via ETag / If-None-Match au rechargement",
+        len(requests_lhm) == 2 and requests_lhm[1][1] == ETAG
+        and get_scraper_metrics()['not_modified'] == 1
+        and second.get('price') == first.get('price'),
+        f"If-None-Match envoyé: {requests_lhm[-1][1]}"
+    ))
+
+    # 2. 503 passagers: retries avec backoff puis succès
+    started = time.perf_counter()
+    flaky = scrape_casablanca_stock('FLAKY')
+    elapsed = time.perf_counter() - started
+    attempts = len(site.requests_for('FLAKY'))
+    results.append(report(
+        "503 rattrapés par les retries",
+        'error' not in flaky and attempts == 3 and elapsed >= 0.1,
+        f"{attempts} requêtes en {elapsed:.2f} s"
+    ))
+
+    # 3. 503 persistants: retries épuisés, erreur retournée
+    down = scrape_casablanca_stock('DOWN')
+    attempts = len(site.requests_for('DOWN'))
+    results.append(report(
+        "503 persistants: erreur après les retries",
+        'error' in down and attempts == 3,
+        f"{attempts} requêtes"
+    ))
+
+    # 4. Session partagée: un seul pool de connexions pour l'hôte, dont la
+    # connexion est reprise à chaque requête (le serveur de développement
+    # ferme chaque connexion: elle est rouverte, pas recréée)
+    session = get_session()
+    pool = session.get_adapter(Config.MOROCCO_BASE_URL).poolmanager.connection_from_url(Config.MOROCCO_BASE_URL)
+    requests_before = pool.num_requests
+    for _ in range(5):
+        scrape_casablanca_stock('LHM', force_refresh=True)
+    manager = session.get_adapter(Config.MOROCCO_BASE_URL).poolmanager
+    results.append(report(
+        "session et pool de connexions réutilisés",
+        get_session() is session and len(manager.pools) == 1
+        and pool.num_requests - requests_before == 5 and pool.num_connections == 1,
+        f"{pool.num_requests} requêtes, {pool.num_connections} connexion(s) créée(s)"
+    ))
+
+    server.shutdown()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
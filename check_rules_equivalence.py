@@ -0,0 +1,140 @@
+import argparse
+import random
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import Flask
+from sqlalchemy import insert
+
+from config import config
+from models import db, User, Challenge
+from routes.trading import check_challenge_rules
+from services.rules import RULE_NONE, RULE_OUTCOMES, apply_rule_statuses, evaluate_rules_arrays, rule_status_expression
+
+
+def random_case(rng):
+    """
+    Un challenge aléatoire; une partie des cas tombe exactement sur un seuil
+    (égalité >=, arrondis des pourcentages)
+    """
+    initial = rng.choice([5000.0, 10000.0, 25000.0, rng.uniform(1, 1e6)])
+    daily_start = initial * rng.uniform(0.8, 1.2)
+    profit_target = rng.choice([10.0, 8.0, rng.uniform(0, 50)])
+    max_total = rng.choice([10.0, 5.0, rng.uniform(0, 50)])
+    max_daily = rng.choice([5.0, 3.0, rng.uniform(0, 50)])
+
+    kind = rng.randrange(6)
+    if kind == 0:
+        equity = initial * (1 + profit_target / 100)
+    elif kind == 1:
+        equity = initial * (1 - max_total / 100)
+    elif kind == 2:
+        equity = daily_start * (1 - max_daily / 100)
+    elif kind == 3:
+        equity = rng.choice([initial, daily_start])
+    else:
+        equity = initial * rng.uniform(0.5, 1.5)
+
+    return SimpleNamespace(
+        initial_balance=initial,
+        current_balance=equity,
+        daily_start_balance=daily_start,
+        profit_target=profit_target,
+        max_total_loss_percent=max_total,
+        max_daily_loss_percent=max_daily,
+        status='active',
+        ended_at=None
+    )
+
+
+def scalar(cases):
+    results = []
+    for case in cases:
+        outcome = check_challenge_rules(SimpleNamespace(**vars(case)))
+        results.append((outcome['status'], outcome.get('reason')))
+    return results
+
+
+def vectorized(cases):
+    statuses, codes = evaluate_rules_arrays(
+        [c.initial_balance for c in cases],
+        [c.current_balance for c in cases],
+        [c.daily_start_balance for c in cases],
+        [c.profit_target for c in cases],
+        [c.max_total_loss_percent for c in cases],
+        [c.max_daily_loss_percent for c in cases]
+    )
+    return [
+        (str(status), RULE_OUTCOMES[code][1] if code != RULE_NONE else None)
+        for status, code in zip(statuses, codes)
+    ]
+
+
+def sql(cases):
+    """Statuts calculés par le CASE SQL du sweeper, puis appliqués par apply_rule_statuses"""
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [{
+        'id': 1, 'username': 'check', 'email': 'check@example.com', 'password_hash': 'x',
+        'role': 'user', 'created_at': now, 'is_active': True
+    }])
+    db.session.execute(insert(Challenge), [
+        dict(vars(case), id=i, user_id=1, plan_type='starter', started_at=now)
+        for i, case in enumerate(cases, start=1)
+    ])
+    db.session.commit()
+
+    expression = rule_status_expression(Challenge.current_balance)
+    computed = dict(db.session.query(Challenge.id, expression))
+    statuses = [computed[i] for i in range(1, len(cases) + 1)]
+
+    ids = list(range(1, len(cases) + 1))
+    apply_rule_statuses(ids, [status for status, _ in vectorized(cases)])
+    db.session.commit()
+    applied = dict(db.session.query(Challenge.id, Challenge.status))
+    return statuses, [applied[i] for i in ids]
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    cases = [random_case(rng) for _ in range(args.cases)]
+
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    expected = scalar(cases)
+    actual = vectorized(cases)
+    with app.app_context():
+        db.create_all()
+        sql_statuses, applied = sql(cases)
+
+    expected_statuses = [status for status, _ in expected]
+    checks = [
+        ("numpy (statut et règle)", actual, expected),
+        ("CASE SQL", sql_statuses, expected_statuses),
+        ("UPDATE ... CASE appliqué", applied, expected_statuses)
+    ]
+
+    print("=" * 60)
+    print(f"⚖️  ÉQUIVALENCE DES RÈGLES ({args.cases:,} cas, graine {args.seed})")
+    print("=" * 60)
+    counts = {status: expected_statuses.count(status) for status in ('active', 'passed', 'failed')}
+    print(f"\n   cas scalaires: {counts}")
+
+    ok = True
+    for label, got, want in checks:
+        mismatches = [i for i, (a, b) in enumerate(zip(got, want)) if a != b]
+        ok = ok and not mismatches
+        print(f"{'✅' if not mismatches else '❌'} {label}: {len(mismatches)} écarts")
+        for i in mismatches[:5]:
+            print(f"   cas {i}: {vars(cases[i])} -> {got[i]} au lieu de {want[i]}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare check_challenge_rules à ses versions tableaux et SQL")
+    parser.add_argument('--cases', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    sys.exit(main(parser.parse_args()))
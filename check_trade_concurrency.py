@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Base jetable et pas de scheduler: à définir avant d'importer la config
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'check_concurrency.db')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', f'sqlite:///{DB_PATH}')
+os.environ['SCHEDULER_ENABLED'] = 'false'
+os.environ['PAYMENT_PROCESSING_DELAY'] = '0'
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from models import db, Challenge, Position, Trade  # noqa: E402
+from services.leaderboard import check_consistency  # noqa: E402
+
+
+def request(base, method, path, payload=None, token=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method)
+    req.add_header('Content-Type', 'application/json')
+    if token:
+        req.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(req, timeout=120) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def setup_user(app, base, name):
+    _, auth = request(base, 'POST', '/api/auth/register', {
+        'username': name, 'email': f'{name}@example.com', 'password': 'check123'
+    })
+    token = auth['access_token']
+    status, job = request(base, 'POST', '/api/payment/checkout', {'plan_type': 'starter', 'payment_method': 'cmi'}, token)
+    assert status == 202, job
+    while request(base, 'GET', f"/api/payment/status/{job['job_id']}", token=token)[1]['status'] == 'pending':
+        pass
+
+    with app.app_context():
+        challenge = Challenge.query.filter_by(user_id=auth['user']['id'], status='active').one()
+        # Règles désactivées: seul le contrôle de solde limite les trades
+        challenge.max_daily_loss_percent = 1000
+        challenge.max_total_loss_percent = 1000
+        challenge.profit_target = 1000
+        db.session.commit()
+        return token, challenge.id, challenge.current_balance
+
+
+def fire(base, token, orders, workers):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda order: request(base, 'POST', '/api/trades/execute', order, token), orders))
+
+
+def check(app, label, challenge_id, initial_balance, orders, results, prior_trades=0):
+    accepted = [order for order, (status, _) in zip(orders, results) if status == 200]
+    rejected = [body.get('error') for status, body in results if status != 200]
+    expected = initial_balance + sum(
+        order['quantity'] * order['price'] * (1 if order['action'] == 'sell' else -1)
+        for order in accepted
+    )
+
+    with app.app_context():
+        challenge = db.session.get(Challenge, challenge_id)
+        trade_count = Trade.query.filter_by(challenge_id=challenge_id).count()
+        balance = challenge.current_balance
+
+    ok = abs(balance - expected) < 1e-6 and trade_count == prior_trades + len(accepted) and balance >= 0
+    print(f"\n{'✅' if ok else '❌'} {label}")
+    print(f"   {len(accepted)} trades acceptés, {len(rejected)} refusés {sorted(set(rejected))}")
+    print(f"   balance finale {balance:.2f} / attendue {expected:.2f}, trades en base {trade_count}")
+    return ok, len(accepted)
+
+
+def main(args):
+    app = create_app()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    print("=" * 60)
+    print(f"🔒 CONCURRENCE: {args.trades} trades parallèles sur un challenge ({args.workers} clients)")
+    print("=" * 60)
+    results = []
+
+    # 1. Achats et ventes mélangés: aucune mise à jour perdue
+    token, challenge_id, _ = setup_user(app, base, 'mixed')
+    # Position initiale couvrant toutes les ventes
+    _, body = request(base, 'POST', '/api/trades/execute', {'symbol': 'AAPL', 'action': 'buy', 'quantity': 1000, 'price': 1}, token)
+    initial = body['challenge']['current_balance']
+    orders = [
+        {'symbol': 'AAPL', 'action': 'buy' if i % 2 else 'sell', 'quantity': 1 + i % 3, 'price': 10.0 + i % 7}
+        for i in range(args.trades)
+    ]
+    responses = fire(base, token, orders, args.workers)
+    ok, _ = check(app, "achats/ventes: aucune mise à jour perdue", challenge_id, initial, orders, responses, prior_trades=1)
+    results.append(ok)
+
+    expected_quantity = 1000 + sum(
+        order['quantity'] * (1 if order['action'] == 'buy' else -1)
+        for order, (status, _) in zip(orders, responses) if status == 200
+    )
+    with app.app_context():
+        quantity = Position.query.filter_by(challenge_id=challenge_id, symbol='AAPL').one().quantity
+    print(f"{'✅' if abs(quantity - expected_quantity) < 1e-6 else '❌'} position {quantity} / attendue {expected_quantity}")
+    results.append(abs(quantity - expected_quantity) < 1e-6)
+
+    # 2. Achats dépassant le solde: exactement balance / valeur acceptés
+    token, challenge_id, initial = setup_user(app, base, 'overdraft')
+    value = initial / (args.trades // 4)
+    orders = [{'symbol': 'AAPL', 'action': 'buy', 'quantity': 1, 'price': value} for _ in range(args.trades)]
+    ok, accepted = check(app, "achats concurrents: jamais de solde négatif", challenge_id, initial, orders,
+                         fire(base, token, orders, args.workers))
+    results.append(ok and accepted == args.trades // 4)
+
+    # 3. Lot avec un ordre refusé: le rollback de son savepoint ne doit pas
+    # annuler l'invalidation des caches demandée par l'ordre exécuté
+    token, challenge_id, initial = setup_user(app, base, 'batch')
+    now = datetime.utcnow()
+    leaderboard_path = f'/api/leaderboard/monthly?year={now.year}&month={now.month}'
+    request(base, 'GET', leaderboard_path)
+    request(base, 'GET', '/api/challenges/active', token=token)
+    status, body = request(base, 'POST', '/api/trades/execute-batch', {'orders': [
+        {'symbol': 'AAPL', 'action': 'buy', 'quantity': 1, 'price': 10.0},
+        {'symbol': 'AAPL', 'action': 'buy', 'quantity': 1, 'price': initial * 2}
+    ]}, token)
+    _, entries = request(base, 'GET', leaderboard_path)
+    _, active = request(base, 'GET', '/api/challenges/active', token=token)
+    trades = next((entry['total_trades'] for entry in entries if entry['username'] == 'batch'), None)
+    ok = (
+        status == 200 and [result['status'] for result in body['results']] == ['executed', 'rejected']
+        and trades == 1 and abs(active['challenge']['current_balance'] - (initial - 10.0)) < 1e-6
+    )
+    print(f"\n{'✅' if ok else '❌'} lot avec ordre refusé: caches invalidés")
+    print(f"   trades au classement {trades} / attendu 1, "
+          f"balance servie {active['challenge']['current_balance']:.2f} / attendue {initial - 10.0:.2f}")
+    results.append(ok)
+
+    with app.app_context():
+        mismatches = check_consistency()
+    print(f"\n{'✅' if not mismatches else '❌'} classement cohérent ({len(mismatches)} écarts)")
+    results.append(not mismatches)
+
+    server.shutdown()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trades concurrents sur un même challenge")
+    parser.add_argument('--trades', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=32)
+    sys.exit(main(parser.parse_args()))
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -21,6 +22,78 @@ class Config:
     MAX_TOTAL_LOSS_PERCENT = 10
     PROFIT_TARGET_PERCENT = 10
 
+    # Traitement asynchrone des paiements (checkout)
+    PAYMENT_PROCESSING_DELAY = float(os.getenv('PAYMENT_PROCESSING_DELAY', 2))
+    PAYMENT_WORKERS = int(os.getenv('PAYMENT_WORKERS', 4))
+    # Âge (secondes) au-delà duquel un paiement en attente est repris par le scheduler
+    CHECKOUT_STALE_AFTER = int(os.getenv('CHECKOUT_STALE_AFTER', 300))
+
+    # Cache partagé (memory ou redis)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_REVALIDATE_BACKOFF = int(os.getenv('CACHE_REVALIDATE_BACKOFF', 30))
+    QUOTE_CACHE_TTL = int(os.getenv('QUOTE_CACHE_TTL', 15))
+    QUOTE_CACHE_MAX_ENTRIES = int(os.getenv('QUOTE_CACHE_MAX_ENTRIES', 256))
+    # Durée de conservation d'une cotation en échec (source indisponible)
+    QUOTE_CACHE_NEGATIVE_TTL = int(os.getenv('QUOTE_CACHE_NEGATIVE_TTL', 5))
+
+    # Cache des cotations de la Bourse de Casablanca
+    MOROCCO_CACHE_TTL = int(os.getenv('MOROCCO_CACHE_TTL', 60))
+    MOROCCO_CACHE_STALE_TTL = int(os.getenv('MOROCCO_CACHE_STALE_TTL', 300))
+    MOROCCO_CACHE_NEGATIVE_TTL = int(os.getenv('MOROCCO_CACHE_NEGATIVE_TTL', 10))
+    MOROCCO_CACHE_MAX_ENTRIES = int(os.getenv('MOROCCO_CACHE_MAX_ENTRIES', 512))
+
+    # Client HTTP du scraper de la Bourse de Casablanca
+    MOROCCO_BASE_URL = os.getenv('MOROCCO_BASE_URL', 'https://www.boursenews.ma/cotation')
+    MOROCCO_HTTP_TIMEOUT = float(os.getenv('MOROCCO_HTTP_TIMEOUT', 10))
+    MOROCCO_HTTP_RETRIES = int(os.getenv('MOROCCO_HTTP_RETRIES', 3))
+    MOROCCO_HTTP_BACKOFF = float(os.getenv('MOROCCO_HTTP_BACKOFF', 0.5))
+    MOROCCO_HTTP_POOL_SIZE = int(os.getenv('MOROCCO_HTTP_POOL_SIZE', 10))
+    # Pages scrapées en parallèle (ne pas dépasser la taille du pool HTTP)
+    MOROCCO_CONCURRENCY = int(os.getenv('MOROCCO_CONCURRENCY', 8))
+    # Page listant tout le marché; vide = un scraping par ticker
+    MOROCCO_SNAPSHOT_URL = os.getenv('MOROCCO_SNAPSHOT_URL', '')
+    # Parser HTML: html.parser, lxml (package optionnel) ou strainer
+    MOROCCO_PARSER = os.getenv('MOROCCO_PARSER', 'strainer')
+    # Tickers distincts acceptés par GET /api/market/morocco
+    MOROCCO_MAX_TICKERS = int(os.getenv('MOROCCO_MAX_TICKERS', 20))
+
+    # Store local des barres OHLCV
+    BAR_STORE_DIR = os.getenv('BAR_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'bars'))
+    BAR_STORE_REFRESH_SECONDS = int(os.getenv('BAR_STORE_REFRESH_SECONDS', 60))
+
+    # Mémoïsation des signaux (clé: symbole, intervalle, dernière barre)
+    SIGNAL_CACHE_TTL = int(os.getenv('SIGNAL_CACHE_TTL', 86400))
+    SIGNAL_CACHE_MAX_ENTRIES = int(os.getenv('SIGNAL_CACHE_MAX_ENTRIES', 512))
+
+    # Cache des réponses du classement mensuel (invalidé à chaque trade)
+    LEADERBOARD_CACHE_TTL = int(os.getenv('LEADERBOARD_CACHE_TTL', 30))
+
+    # Challenge actif par utilisateur (invalidé à chaque paiement, trade ou
+    # changement de statut; sans Redis, soldes et statut vérifiés en base à
+    # chaque lecture, le TTL borne l'écart sur les autres champs)
+    ACTIVE_CHALLENGE_CACHE_TTL = int(os.getenv('ACTIVE_CHALLENGE_CACHE_TTL', 30))
+    ACTIVE_CHALLENGE_CACHE_MAX_ENTRIES = int(os.getenv('ACTIVE_CHALLENGE_CACHE_MAX_ENTRIES', 10000))
+    ACTIVE_CHALLENGE_NEGATIVE_TTL = int(os.getenv('ACTIVE_CHALLENGE_NEGATIVE_TTL', 2))
+
+    # Rafraîchissement des prix en arrière-plan (intervalles en secondes)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'tradesense-scheduler.lock'))
+    SCHEDULER_JITTER = int(os.getenv('SCHEDULER_JITTER', 5))
+    # Délai entre deux tentatives de prise du verrou par un worker non leader
+    SCHEDULER_LEADER_RETRY_INTERVAL = int(os.getenv('SCHEDULER_LEADER_RETRY_INTERVAL', 30))
+    SCHEDULER_STOCKS_INTERVAL = int(os.getenv('SCHEDULER_STOCKS_INTERVAL', 30))
+    SCHEDULER_CRYPTO_INTERVAL = int(os.getenv('SCHEDULER_CRYPTO_INTERVAL', 15))
+    SCHEDULER_MOROCCO_INTERVAL = int(os.getenv('SCHEDULER_MOROCCO_INTERVAL', 30))
+    SCHEDULER_BARS_INTERVAL = int(os.getenv('SCHEDULER_BARS_INTERVAL', 45))
+    SCHEDULER_SWEEP_INTERVAL = int(os.getenv('SCHEDULER_SWEEP_INTERVAL', 60))
+    SCHEDULER_CHECKOUT_INTERVAL = int(os.getenv('SCHEDULER_CHECKOUT_INTERVAL', 60))
+
+    # Application des règles en arrière-plan
+    SWEEPER_BATCH_SIZE = int(os.getenv('SWEEPER_BATCH_SIZE', 5000))
+    # Heure UTC de début de la journée de trading (réinitialisation de daily_start_balance)
+    TRADING_DAY_START_HOUR = int(os.getenv('TRADING_DAY_START_HOUR', 0))
+
 PLANS = Config.PLANS
 MAX_DAILY_LOSS_PERCENT = Config.MAX_DAILY_LOSS_PERCENT
 MAX_TOTAL_LOSS_PERCENT = Config.MAX_TOTAL_LOSS_PERCENT
@@ -50,10 +50,46 @@ CREATE TABLE payment (
   status VARCHAR(20) DEFAULT 'pending',
   transaction_id VARCHAR(100) UNIQUE,
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  plan_type VARCHAR(20),
+  challenge_id INTEGER,
   FOREIGN KEY (user_id) REFERENCES user(id) ON UPDATE CASCADE ON DELETE CASCADE,
+  FOREIGN KEY (challenge_id) REFERENCES challenge(id),
   CHECK (status IN ('pending','completed','failed','refunded'))
 );
 
+CREATE TABLE position (
+  id INTEGER PRIMARY KEY,
+  challenge_id INTEGER NOT NULL,
+  symbol VARCHAR(20) NOT NULL,
+  quantity FLOAT NOT NULL DEFAULT 0.0,
+  avg_cost FLOAT NOT NULL DEFAULT 0.0,
+  realized_pnl FLOAT NOT NULL DEFAULT 0.0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (challenge_id) REFERENCES challenge(id),
+  CONSTRAINT uq_position_challenge_symbol UNIQUE (challenge_id, symbol)
+);
+
+CREATE TABLE leaderboard_entry (
+  id INTEGER PRIMARY KEY,
+  period DATE NOT NULL,
+  user_id INTEGER NOT NULL,
+  challenge_count INTEGER NOT NULL DEFAULT 0,
+  profit_percent_sum FLOAT NOT NULL DEFAULT 0.0,
+  avg_profit_percent FLOAT NOT NULL DEFAULT 0.0,
+  trade_count INTEGER NOT NULL DEFAULT 0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (user_id) REFERENCES user(id),
+  CONSTRAINT uq_leaderboard_period_user UNIQUE (period, user_id)
+);
+
+CREATE INDEX ix_challenge_user_status ON challenge (user_id, status);
+CREATE INDEX ix_challenge_started_at ON challenge (started_at);
+CREATE INDEX ix_trade_user_timestamp ON trade (user_id, timestamp);
+CREATE INDEX ix_trade_challenge_id ON trade (challenge_id);
+CREATE INDEX ix_payment_user_created_at ON payment (user_id, created_at);
+CREATE INDEX ix_payment_status_created_at ON payment (status, created_at);
+CREATE INDEX ix_leaderboard_period_avg ON leaderboard_entry (period, avg_profit_percent);
+
 COMMIT;
 BEGIN;
 
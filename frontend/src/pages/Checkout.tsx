@@ -3,6 +3,9 @@ import { useLocation, useNavigate } from 'react-router-dom';
 import { CreditCard, Bitcoin, Wallet, CheckCircle, XCircle, Loader2, ArrowLeft } from 'lucide-react';
 import { paymentAPI } from '../services/api';
 
+const CHECKOUT_POLL_INTERVAL_MS = 1000;
+const CHECKOUT_POLL_ATTEMPTS = 30;
+
 interface Plan {
   name: string;
   price: string;
@@ -28,18 +31,27 @@ export default function Checkout() {
 
   if (!plan) return null;
 
+  // Le paiement est traité en arrière-plan: on interroge son statut
+  const waitForCheckout = async (jobId: string) => {
+    for (let attempt = 0; attempt < CHECKOUT_POLL_ATTEMPTS; attempt++) {
+      await new Promise(resolve => setTimeout(resolve, CHECKOUT_POLL_INTERVAL_MS));
+      const { data } = await paymentAPI.getCheckoutStatus(jobId);
+      if (data.status === 'completed') return;
+      if (data.status === 'failed') throw new Error(data.error || 'Échec du paiement.');
+    }
+    throw new Error('Le paiement est toujours en cours de traitement. Consultez votre historique.');
+  };
+
   const handlePayment = async (paymentMethod: string) => {
     setLoading(true);
     setError(null);
 
-    // Simulate delay
-    await new Promise(resolve => setTimeout(resolve, 2000));
-
     try {
-      await paymentAPI.checkout({
+      const { data } = await paymentAPI.checkout({
         plan_type: plan.name.toLowerCase(),
         payment_method: paymentMethod
       });
+      await waitForCheckout(data.job_id);
       setShowSuccessModal(true);
     } catch (err: any) {
       if (err?.response?.status === 401) {
@@ -38,25 +38,32 @@ export const authAPI = {
 export const paymentAPI = {
   getPlans: () => api.get('/api/payment/plans'),
   checkout: (data: any) => api.post('/api/payment/checkout', data),
-  getHistory: () => api.get('/api/payment/history'),
+  getCheckoutStatus: (jobId: string) => api.get(`/api/payment/status/${jobId}`),
+  getHistory: (params?: { limit?: number; cursor?: string; status?: string; start?: string; end?: string }) =>
+    api.get('/api/payment/history', { params }),
 };
 
 export const tradingAPI = {
   getActiveChallenge: () => api.get('/api/challenges/active'),
   executeTrade: (data: any) => api.post('/api/trades/execute', data),
-  getTradeHistory: () => api.get('/api/trades/history'),
+  executeTradeBatch: (orders: any[]) => api.post('/api/trades/execute-batch', { orders }),
+  getTradeHistory: (params?: { limit?: number; cursor?: string; challenge_id?: number; symbol?: string; start?: string; end?: string }) =>
+    api.get('/api/trades/history', { params }),
 };
 
 export const marketAPI = {
   getLivePrice: (symbol: string) => api.get(`/api/market/live/${symbol}`),
+  getLivePrices: (symbols: string[]) => api.get('/api/market/live', { params: { symbols: symbols.join(',') } }),
   getChartData: (symbol: string) => api.get(`/api/market/chart/${symbol}`),
   getMoroccoStock: (ticker: string) => api.get(`/api/market/morocco/${ticker}`),
+  getMoroccoStocks: (tickers: string[]) => api.get('/api/market/morocco', { params: { tickers: tickers.join(',') } }),
   getSignal: (symbol: string) => api.get(`/api/signals/${symbol}`),
+  getSignals: (symbols: string[]) => api.get('/api/signals', { params: { symbols: symbols.join(',') } }),
   getMoroccoSignal: (ticker: string) => api.get(`/api/signals/morocco/${ticker}`),
 };
 
 export const leaderboardAPI = {
-  getMonthly: () => api.get('/api/leaderboard/monthly'),
+  getMonthly: (params?: { month?: number; year?: number }) => api.get('/api/leaderboard/monthly', { params }),
 };
 
 // Export the axios instance as well for flexibility
@@ -0,0 +1,73 @@
+import argparse
+
+from flask import Flask
+from sqlalchemy import inspect, text
+
+from config import config
+from models import db
+
+
+def ensure_columns():
+    """
+    Ajoute aux tables existantes les colonnes déclarées qui leur manquent
+
+    db.create_all() ne modifie pas une table existante. Seules les colonnes
+    nullables sans valeur par défaut côté serveur sont ajoutées (ALTER
+    TABLE ... ADD COLUMN, SQLite comme PostgreSQL). À appeler dans un
+    contexte d'application.
+
+    Returns:
+        list: Colonnes ajoutées ('table.colonne')
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable or column.server_default is not None:
+                    print(f"⚠️ {table.name}.{column.name}: colonne obligatoire, migration manuelle requise")
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column_type}"
+                ))
+                added.append(f"{table.name}.{column.name}")
+
+    return added
+
+
+def migrate_columns(database_url=None):
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    if database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+
+    print("🔧 Ajout des colonnes manquantes...")
+
+    with app.app_context():
+        print(f"   Base: {db.engine.url.render_as_string(hide_password=True)}")
+        added = ensure_columns()
+
+    if added:
+        for name in added:
+            print(f"✅ {name}")
+        print(f"\n✅ {len(added)} colonnes ajoutées")
+    else:
+        print("ℹ️ Toutes les colonnes sont déjà présentes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajoute aux tables existantes les colonnes déclarées dans models.py")
+    parser.add_argument('--database-url', help="URL SQLAlchemy (défaut: SQLALCHEMY_DATABASE_URI)")
+    args = parser.parse_args()
+    migrate_columns(args.database_url)
@@ -0,0 +1,88 @@
+import argparse
+
+from flask import Flask
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateIndex
+
+from config import config
+from models import db
+
+
+def ensure_indexes():
+    """
+    Crée les index déclarés par les modèles qui manquent dans la base
+
+    db.create_all() ne crée les index qu'avec les nouvelles tables; cette
+    fonction les ajoute aux tables existantes (SQLite comme PostgreSQL).
+    Sur PostgreSQL les index sont créés avec CONCURRENTLY, sans bloquer
+    les écritures sur la table. Un index en échec est signalé et les
+    suivants sont tout de même créés. À appeler dans un contexte
+    d'application.
+
+    Returns:
+        list: Noms des index créés
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    postgresql = db.engine.dialect.name == 'postgresql'
+    created = []
+
+    # CREATE INDEX CONCURRENTLY est interdit dans une transaction
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                try:
+                    connection.execute(text(_create_statement(index, postgresql)))
+                except (OperationalError, ProgrammingError) as e:
+                    print(f"❌ {index.name}: {e.orig}")
+                    if postgresql:
+                        print(f"   Un index invalide peut rester: DROP INDEX CONCURRENTLY {index.name}; puis relancer")
+                    continue
+                created.append(index.name)
+
+    return created
+
+
+def _create_statement(index, concurrently):
+    options = index.dialect_options['postgresql']
+    previous = options['concurrently']
+    options['concurrently'] = concurrently
+    try:
+        # Compilé tout de suite: l'option n'est modifiée que pour cette instruction
+        return str(CreateIndex(index, if_not_exists=True).compile(dialect=db.engine.dialect))
+    finally:
+        options['concurrently'] = previous
+
+
+def migrate_indexes(database_url=None):
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    if database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+
+    print("🔧 Création des index manquants...")
+
+    with app.app_context():
+        print(f"   Base: {db.engine.url.render_as_string(hide_password=True)}")
+        created = ensure_indexes()
+
+    if created:
+        for name in created:
+            print(f"✅ {name}")
+        print(f"\n✅ {len(created)} index créés")
+    else:
+        print("ℹ️ Tous les index sont déjà présents")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajoute aux tables existantes les index déclarés dans models.py")
+    parser.add_argument('--database-url', help="URL SQLAlchemy (défaut: SQLALCHEMY_DATABASE_URI)")
+    args = parser.parse_args()
+    migrate_indexes(args.database_url)
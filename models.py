@@ -1,9 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import sqlite3
 import bcrypt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 
+
+# pysqlite n'ouvre la transaction qu'au premier INSERT/UPDATE/DELETE: un
+# SAVEPOINT émis avant démarre alors sa propre transaction, que le RELEASE
+# valide. On ouvre donc la transaction englobante juste avant le premier
+# savepoint (begin_nested), en IMMEDIATE: le verrou d'écriture est pris
+# d'emblée, sans blocage mutuel avec une autre transaction déjà en lecture.
+@event.listens_for(Engine, 'savepoint')
+def _sqlite_begin_before_savepoint(connection, name):
+    dbapi_connection = connection.connection.dbapi_connection
+    if isinstance(dbapi_connection, sqlite3.Connection) and not dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -34,6 +49,13 @@ class User(db.Model):
         }
 
 class Challenge(db.Model):
+    __table_args__ = (
+        # Challenge actif d'un utilisateur (trading, paiement)
+        db.Index('ix_challenge_user_status', 'user_id', 'status'),
+        # Classement mensuel (filtre par plage de dates)
+        db.Index('ix_challenge_started_at', 'started_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     plan_type = db.Column(db.String(20), nullable=False)
@@ -68,6 +90,13 @@ class Challenge(db.Model):
         }
 
 class Trade(db.Model):
+    __table_args__ = (
+        # Historique des trades d'un utilisateur, trié par date
+        db.Index('ix_trade_user_timestamp', 'user_id', 'timestamp'),
+        # Trades d'un challenge (classement, statistiques)
+        db.Index('ix_trade_challenge_id', 'challenge_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     challenge_id = db.Column(db.Integer, db.ForeignKey('challenge.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -91,7 +120,41 @@ class Trade(db.Model):
             'timestamp': self.timestamp.isoformat()
         }
 
+class Position(db.Model):
+    """
+    Position ouverte d'un challenge sur un symbole, mise à jour à chaque
+    trade (voir services/positions.py)
+    """
+    __table_args__ = (
+        db.UniqueConstraint('challenge_id', 'symbol', name='uq_position_challenge_symbol'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenge.id'), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Float, default=0.0, nullable=False)
+    avg_cost = db.Column(db.Float, default=0.0, nullable=False)
+    realized_pnl = db.Column(db.Float, default=0.0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'symbol': self.symbol,
+            'quantity': self.quantity,
+            'avg_cost': self.avg_cost,
+            'cost_basis': self.quantity * self.avg_cost,
+            'realized_pnl': self.realized_pnl,
+            'updated_at': self.updated_at.isoformat()
+        }
+
 class Payment(db.Model):
+    __table_args__ = (
+        # Historique des paiements d'un utilisateur, trié par date
+        db.Index('ix_payment_user_created_at', 'user_id', 'created_at'),
+        # Reprise des paiements restés en attente (services.checkout)
+        db.Index('ix_payment_status_created_at', 'status', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -100,6 +163,9 @@ class Payment(db.Model):
     status = db.Column(db.String(20), default='pending', nullable=False)
     transaction_id = db.Column(db.String(100), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Plan acheté et challenge créé une fois le paiement traité
+    plan_type = db.Column(db.String(20))
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenge.id'))
 
     def to_dict(self):
         return {
@@ -110,7 +176,43 @@ class Payment(db.Model):
             'payment_method': self.payment_method,
             'status': self.status,
             'transaction_id': self.transaction_id,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat(),
+            'plan_type': self.plan_type,
+            'challenge_id': self.challenge_id
+        }
+
+class LeaderboardEntry(db.Model):
+    """
+    Agrégat mensuel par utilisateur des challenges démarrés dans le mois,
+    maintenu à chaque trade et à chaque nouveau challenge
+    (voir services/leaderboard.py)
+    """
+    __table_args__ = (
+        db.UniqueConstraint('period', 'user_id', name='uq_leaderboard_period_user'),
+        # Lecture du top N d'un mois
+        db.Index('ix_leaderboard_period_avg', 'period', 'avg_profit_percent'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    challenge_count = db.Column(db.Integer, default=0, nullable=False)
+    profit_percent_sum = db.Column(db.Float, default=0.0, nullable=False)
+    avg_profit_percent = db.Column(db.Float, default=0.0, nullable=False)
+    trade_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    user = db.relationship('User', lazy='joined')
+
+    def to_dict(self):
+        return {
+            'period': self.period.isoformat(),
+            'user_id': self.user_id,
+            'username': self.user.username if self.user else None,
+            'challenge_count': self.challenge_count,
+            'avg_profit_percent': round(self.avg_profit_percent, 2),
+            'trade_count': self.trade_count,
+            'updated_at': self.updated_at.isoformat()
         }
 
 class PayPalConfig(db.Model):
@@ -0,0 +1,53 @@
+import argparse
+import sys
+
+from flask import Flask
+
+from config import config
+from models import db
+from services.leaderboard import check_consistency, rebuild
+
+
+def main(args):
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    if args.database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    db.init_app(app)
+
+    scope = f"{args.month:02d}/{args.year}" if args.month else "tous les mois"
+
+    with app.app_context():
+        db.create_all()
+
+        if not args.check:
+            print(f"🔧 Reconstruction du classement ({scope})...")
+            count = rebuild(args.year, args.month)
+            print(f"✅ {count} entrées écrites")
+
+        print(f"🔍 Vérification du classement ({scope})...")
+        mismatches = check_consistency(args.year, args.month)
+
+    if not mismatches:
+        print("✅ Classement cohérent avec l'agrégat des challenges et trades")
+        return 0
+
+    for mismatch in mismatches[:50]:
+        print(
+            f"❌ {mismatch['period']} user {mismatch['user_id']} {mismatch['field']}: "
+            f"stocké {mismatch['stored']} / attendu {mismatch['expected']}"
+        )
+    print(f"\n❌ {len(mismatches)} écarts (relancer sans --check pour reconstruire)")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruit ou vérifie le classement mensuel maintenu")
+    parser.add_argument('--check', action='store_true', help="Vérifie sans reconstruire")
+    parser.add_argument('--month', type=int, help="Mois (1-12), avec --year")
+    parser.add_argument('--year', type=int, help="Année, avec --month")
+    parser.add_argument('--database-url', help="URL SQLAlchemy (défaut: SQLALCHEMY_DATABASE_URI)")
+    args = parser.parse_args()
+    if (args.month is None) != (args.year is None):
+        parser.error("--month et --year vont ensemble")
+    sys.exit(main(args))
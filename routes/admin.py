@@ -1,5 +1,11 @@
 from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_restful import Api, Resource
+from models import db, User
+from services.active_challenge import get_active_challenge_cache_stats
+from services.equity import get_equity_metrics
+from services.rules import reevaluate_all
+from services.sweeper import get_sweeper_metrics
 
 admin_bp = Blueprint('admin_bp', __name__)
 api = Api(admin_bp)
@@ -8,4 +14,55 @@ class AdminDashboard(Resource):
     def get(self):
         return jsonify({"message": "Admin dashboard"})
 
+def is_superadmin():
+    """Indique si l'utilisateur du JWT courant est superadmin"""
+    user = db.session.get(User, int(get_jwt_identity()))
+    return user is not None and user.role == 'superadmin'
+
+class ChallengeReevaluation(Resource):
+    method_decorators = [jwt_required()]
+
+    def post(self):
+        """Réévalue les règles de tous les challenges actifs (admin only)"""
+        try:
+            if not is_superadmin():
+                return {'error': 'Accès non autorisé'}, 403
+
+            return reevaluate_all(), 200
+
+        except Exception:
+            db.session.rollback()
+            return {'error': 'Erreur lors de la réévaluation des challenges'}, 500
+
+class SweeperStats(Resource):
+    method_decorators = [jwt_required()]
+
+    def get(self):
+        """Métriques du sweeper des règles: dernier passage, dernière réinitialisation journalière (admin only)"""
+        if not is_superadmin():
+            return {'error': 'Accès non autorisé'}, 403
+        return get_sweeper_metrics(), 200
+
+class EquityStats(Resource):
+    method_decorators = [jwt_required()]
+
+    def get(self):
+        """Métriques de la valorisation des challenges actifs: passages, durée, taille (admin only)"""
+        if not is_superadmin():
+            return {'error': 'Accès non autorisé'}, 403
+        return get_equity_metrics(), 200
+
+class ActiveChallengeCacheStats(Resource):
+    method_decorators = [jwt_required()]
+
+    def get(self):
+        """Compteurs du cache des challenges actifs (admin only)"""
+        if not is_superadmin():
+            return {'error': 'Accès non autorisé'}, 403
+        return get_active_challenge_cache_stats(), 200
+
 api.add_resource(AdminDashboard, '/')
+api.add_resource(ChallengeReevaluation, '/api/admin/challenges/reevaluate')
+api.add_resource(EquityStats, '/api/admin/equity/stats')
+api.add_resource(SweeperStats, '/api/admin/sweeper/stats')
+api.add_resource(ActiveChallengeCacheStats, '/api/admin/active-challenge/cache/stats')
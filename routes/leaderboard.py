@@ -1,56 +1,53 @@
-from flask import Blueprint, jsonify
-from sqlalchemy import func
+from flask import Blueprint, jsonify, make_response, request
 from datetime import datetime
-from models import db, User, Challenge, Trade
+from services import leaderboard as leaderboard_service
 
 leaderboard_bp = Blueprint('leaderboard', __name__)
 
 @leaderboard_bp.route('/api/leaderboard/monthly', methods=['GET'])
 def get_monthly_leaderboard():
-    """Classement mensuel par profit en pourcentage basé sur Challenge"""
+    """
+    Classement mensuel par profit moyen en pourcentage des challenges du mois
+    
+    Query Parameters:
+        month (int): Le mois 1-12 (défaut: mois courant)
+        year (int): L'année (défaut: année courante)
+    """
     try:
-        current_month = f"{datetime.now().month:02d}"
-        current_year = str(datetime.now().year)
-
-        # Calculer le profit % à partir des balances des challenges du mois courant
-        profit_percent_expr = (
-            ((Challenge.current_balance - Challenge.initial_balance) / Challenge.initial_balance) * 100.0
-        )
-
-        leaderboard_query = db.session.query(
-            User.username.label('username'),
-            func.round(func.avg(profit_percent_expr), 2).label('avg_profit_percent'),
-            func.count(Trade.id).label('total_trades')
-        ).join(
-            Challenge, Challenge.user_id == User.id
-        ).outerjoin(
-            Trade, Trade.challenge_id == Challenge.id
-        ).filter(
-            func.strftime('%m', Challenge.started_at) == current_month,
-            func.strftime('%Y', Challenge.started_at) == current_year
-        ).group_by(
-            User.id,
-            User.username
-        ).order_by(
-            func.avg(profit_percent_expr).desc()
-        ).limit(10)
-
-        results = leaderboard_query.all()
-
-        leaderboard = []
-        for rank, row in enumerate(results, start=1):
-            username = row.username
-            avg_profit_percent = float(row.avg_profit_percent or 0)
-            total_trades = int(row.total_trades or 0)
-            leaderboard.append({
-                'rank': rank,
-                'username': username,
-                'profit_percent': avg_profit_percent,
-                'avg_profit_percent': avg_profit_percent,
-                'total_trades': total_trades
-            })
-
-        return jsonify(leaderboard), 200
+        now = datetime.utcnow()
+        try:
+            month = int(request.args.get('month', now.month))
+            year = int(request.args.get('year', now.year))
+        except ValueError:
+            month = year = 0
+        
+        if not 1 <= month <= 12 or not 1970 <= year < 9999:
+            return jsonify({'error': 'Paramètres month (1-12) et year invalides'}), 400
+        
+        # Classement maintenu (services/leaderboard.py), mis en cache et
+        # invalidé à chaque trade ou nouveau challenge du mois
+        leaderboard = leaderboard_service.get_monthly_leaderboard(year, month)
+        etag = leaderboard['etag']
+
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            response = make_response(jsonify(leaderboard['entries']), 200)
+
+        response.set_etag(etag)
+        # Le navigateur revalide à chaque fois (304 si inchangé)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
 
     except Exception:
         return jsonify({'error': 'Erreur lors de la récupération du classement'}), 500
+
+@leaderboard_bp.route('/api/leaderboard/cache/stats', methods=['GET'])
+def get_leaderboard_cache_statistics():
+    """
+    Retourne les statistiques du cache des réponses du classement
+    
+    Returns:
+        JSON: Compteurs hit/miss/éviction
+    """
+    return jsonify(leaderboard_service.get_leaderboard_cache_stats()), 200
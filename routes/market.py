@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from services.market_data import get_live_price, get_chart_data, SUPPORTED_SYMBOLS
-from services.morocco_scraper import scrape_casablanca_stock, get_supported_morocco_tickers
+from config import Config
+from services.market_data import get_live_price, get_live_prices, get_chart_data, get_quote_cache_stats, SUPPORTED_SYMBOLS, CHART_LAYOUTS
+from services.morocco_scraper import scrape_casablanca_stock, scrape_casablanca_many, get_supported_morocco_tickers, get_morocco_cache_stats, get_scraper_metrics
 
 market_bp = Blueprint('market', __name__)
 
@@ -32,6 +33,39 @@ def get_live_market_data(symbol):
             'symbol': symbol
         }), 500
 
+@market_bp.route('/api/market/live', methods=['GET'])
+def get_live_market_data_batch():
+    """
+    Récupère les données de marché en direct pour plusieurs symboles
+    
+    Query Parameters:
+        symbols (str): Symboles séparés par des virgules (défaut: tous les symboles supportés)
+    
+    Returns:
+        JSON: Prix par symbole et erreurs éventuelles par symbole
+    """
+    try:
+        symbols_param = request.args.get('symbols', '')
+        symbols = [s.strip().upper() for s in symbols_param.split(',') if s.strip()]
+        if not symbols:
+            symbols = SUPPORTED_SYMBOLS
+        
+        results = get_live_prices(symbols)
+        
+        quotes = {symbol: data for symbol, data in results.items() if 'error' not in data}
+        errors = {symbol: data['error'] for symbol, data in results.items() if 'error' in data}
+        
+        return jsonify({
+            'quotes': quotes,
+            'errors': errors,
+            'count': len(quotes)
+        }), 200 if quotes else 400
+        
+    except Exception as e:
+        return jsonify({
+            'error': f'Erreur lors de la récupération des données de marché: {str(e)}'
+        }), 500
+
 @market_bp.route('/api/market/chart/<symbol>', methods=['GET'])
 def get_chart_market_data(symbol):
     """
@@ -43,6 +77,8 @@ def get_chart_market_data(symbol):
     Query Parameters:
         interval (str): L'intervalle de temps (défaut: '1d')
         period (str): La période de temps (défaut: '1mo')
+        format (str): 'rows' (défaut) ou 'columns' pour une réponse en colonnes
+        indicators (str): '1' pour ajouter RSI, MA20 et MA50 à chaque barre
     
     Returns:
         JSON: Données historiques formatées
@@ -51,20 +87,31 @@ def get_chart_market_data(symbol):
         # Récupérer les paramètres de la requête
         interval = request.args.get('interval', '1d')
         period = request.args.get('period', '1mo')
+        layout = request.args.get('format', 'rows')
+        indicators = request.args.get('indicators') == '1'
+        
+        if layout not in CHART_LAYOUTS:
+            return jsonify({
+                'error': f'Format invalide. Formats supportés: {", ".join(CHART_LAYOUTS)}',
+                'symbol': symbol
+            }), 400
         
         # Appeler la fonction du service
-        result = get_chart_data(symbol.upper(), interval, period)
+        result = get_chart_data(symbol.upper(), interval, period, layout, indicators)
         
         # Vérifier s'il y a une erreur
         if isinstance(result, dict) and 'error' in result:
             return jsonify(result), 400
         
+        count = len(result['timestamp']) if layout == 'columns' else len(result)
+        
         return jsonify({
             'symbol': symbol.upper(),
             'interval': interval,
             'period': period,
+            'format': layout,
             'data': result,
-            'count': len(result)
+            'count': count
         }), 200
         
     except Exception as e:
@@ -86,6 +133,66 @@ def get_supported_symbols():
         'count': len(SUPPORTED_SYMBOLS)
     }), 200
 
+@market_bp.route('/api/market/cache/stats', methods=['GET'])
+def get_market_cache_stats():
+    """
+    Retourne les statistiques des caches de cotations
+    
+    Returns:
+        JSON: Compteurs hit/miss/éviction par cache
+    """
+    return jsonify({
+        'quotes': get_quote_cache_stats(),
+        'morocco': get_morocco_cache_stats(),
+        'morocco_http': get_scraper_metrics()
+    }), 200
+
+@market_bp.route('/api/market/morocco', methods=['GET'])
+def get_morocco_stocks_data():
+    """
+    Récupère les données de plusieurs titres de la Bourse de Casablanca
+    
+    Query Parameters:
+        tickers (str): Tickers séparés par des virgules (défaut: tous les tickers
+            supportés), au plus MOROCCO_MAX_TICKERS tickers distincts
+    
+    Returns:
+        JSON: Cotations par ticker et erreurs éventuelles par ticker
+    """
+    try:
+        tickers_param = request.args.get('tickers', '')
+        tickers = list(dict.fromkeys(t.strip().upper() for t in tickers_param.split(',') if t.strip()))
+        if len(tickers) > Config.MOROCCO_MAX_TICKERS:
+            return jsonify({
+                'error': f'Trop de tickers: {len(tickers)} (maximum {Config.MOROCCO_MAX_TICKERS})'
+            }), 400
+        if not tickers:
+            tickers = get_supported_morocco_tickers()
+        
+        supported = get_supported_morocco_tickers()
+        unsupported = [ticker for ticker in tickers if ticker not in supported]
+        if unsupported:
+            return jsonify({
+                'error': f'Tickers non supportés: {", ".join(unsupported)}. Tickers supportés: {", ".join(supported)}',
+                'tickers': unsupported
+            }), 400
+        
+        results = scrape_casablanca_many(tickers)
+        
+        quotes = {ticker: data for ticker, data in results.items() if 'error' not in data}
+        errors = {ticker: data['error'] for ticker, data in results.items() if 'error' in data}
+        
+        return jsonify({
+            'quotes': quotes,
+            'errors': errors,
+            'count': len(quotes)
+        }), 200 if quotes else 400
+        
+    except Exception as e:
+        return jsonify({
+            'error': f'Erreur lors de la récupération des données marocaines: {str(e)}'
+        }), 500
+
 @market_bp.route('/api/market/morocco/<ticker>', methods=['GET'])
 def get_morocco_stock_data(ticker):
     """
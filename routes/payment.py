@@ -1,9 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Challenge, Payment, PayPalConfig
+from models import db, User, Payment, PayPalConfig
 from datetime import datetime
 from config import Config
-import time
+from services.checkout import submit_checkout, get_checkout_status
+from services.pagination import keyset_page, parse_datetime, parse_limit, stream_ndjson
 import uuid
 
 payment_bp = Blueprint('payment', __name__)
@@ -52,7 +53,12 @@ def get_plans():
 @payment_bp.route('/api/payment/checkout', methods=['POST'])
 @jwt_required()
 def checkout():
-    """Simule un paiement et crée un challenge actif"""
+    """
+    Enregistre un paiement en attente et planifie son traitement
+    
+    Le paiement est finalisé et le challenge créé en arrière-plan;
+    le client suit l'avancement via /api/payment/status/<job_id>.
+    """
     try:
         user_id = int(get_jwt_identity())
         data = request.get_json()
@@ -70,66 +76,105 @@ def checkout():
         if payment_method not in valid_methods:
             return jsonify({'error': 'Méthode de paiement invalide'}), 400
         
-        # Simulation d'un délai de traitement de paiement
-        time.sleep(2)
-        
-        # Générer un ID de transaction unique
+        # Générer un ID de transaction unique (sert aussi d'identifiant de job)
         transaction_id = str(uuid.uuid4())
         plan_data = Config.PLANS[plan_type]
         
-        # Créer le payment record
+        # Créer le payment record en attente
         payment = Payment(
             user_id=user_id,
             amount=plan_data['price'],
             currency=plan_data['currency'],
             payment_method=payment_method,
-            status='completed',
+            status='pending',
             transaction_id=transaction_id,
-            created_at=datetime.utcnow()
-        )
-        
-        # Créer le challenge actif
-        challenge = Challenge(
-            user_id=user_id,
-            plan_type=plan_type,
-            initial_balance=plan_data['balance'],
-            current_balance=plan_data['balance'],
-            daily_start_balance=plan_data['balance'],
-            status='active',
-            profit_target=Config.PROFIT_TARGET_PERCENT,
-            max_daily_loss_percent=Config.MAX_DAILY_LOSS_PERCENT,
-            max_total_loss_percent=Config.MAX_TOTAL_LOSS_PERCENT,
-            started_at=datetime.utcnow()
+            created_at=datetime.utcnow(),
+            plan_type=plan_type
         )
         
         db.session.add(payment)
-        db.session.add(challenge)
         db.session.commit()
         
-        return jsonify({
-            'payment': payment.to_dict(),
-            'challenge': challenge.to_dict()
-        }), 201
+        submit_checkout(current_app._get_current_object(), payment, plan_type)
+        
+        status_url = f'/api/payment/status/{transaction_id}'
+        response = jsonify({
+            'job_id': transaction_id,
+            'status': 'pending',
+            'status_url': status_url,
+            'payment': payment.to_dict()
+        })
+        response.headers['Location'] = status_url
+        return response, 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Erreur lors du traitement du paiement'}), 400
 
+@payment_bp.route('/api/payment/status/<job_id>', methods=['GET'])
+@jwt_required()
+def get_checkout_job_status(job_id):
+    """Retourne l'état d'un paiement en cours de traitement et le challenge créé"""
+    try:
+        user_id = int(get_jwt_identity())
+        result = get_checkout_status(job_id, user_id)
+        
+        if result is None:
+            return jsonify({'error': 'Paiement introuvable'}), 404
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Erreur lors de la récupération du paiement'}), 400
+
 @payment_bp.route('/api/payment/history', methods=['GET'])
 @jwt_required()
 def get_payment_history():
-    """Récupère l'historique des paiements de l'utilisateur"""
+    """
+    Récupère l'historique des paiements de l'utilisateur, du plus récent au plus ancien
+    
+    Query Parameters:
+        limit (int): Taille de page (défaut 50, max 500)
+        cursor (str): Curseur next_cursor de la page précédente
+        status (str): Filtre sur le statut (pending, completed, failed)
+        start (str): Date ISO incluse (created_at >= start)
+        end (str): Date ISO exclue (created_at < end)
+        format (str): 'ndjson' pour exporter tout l'historique en flux
+    """
     try:
         user_id = get_jwt_identity()
         
-        payments = Payment.query.filter_by(user_id=user_id).order_by(
-            Payment.created_at.desc()
-        ).all()
+        query = Payment.query.filter_by(user_id=user_id)
+        
+        status = request.args.get('status')
+        if status:
+            query = query.filter(Payment.status == status.lower())
+        
+        start = parse_datetime(request.args.get('start'))
+        if start:
+            query = query.filter(Payment.created_at >= start)
+        
+        end = parse_datetime(request.args.get('end'))
+        if end:
+            query = query.filter(Payment.created_at < end)
+        
+        if request.args.get('format') == 'ndjson':
+            return Response(
+                stream_with_context(stream_ndjson(query, Payment.created_at, Payment.id)),
+                mimetype='application/x-ndjson'
+            )
+        
+        limit = parse_limit(request.args.get('limit'))
+        payments, next_cursor = keyset_page(query, Payment.created_at, Payment.id, request.args.get('cursor'), limit)
         
         return jsonify({
-            'payments': [payment.to_dict() for payment in payments]
+            'payments': [payment.to_dict() for payment in payments],
+            'count': len(payments),
+            'next_cursor': next_cursor
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': f'Paramètres invalides: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': 'Erreur lors de la récupération de l\'historique'}), 400
 
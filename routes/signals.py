@@ -1,32 +1,117 @@
-from flask import Blueprint, jsonify
-import yfinance as yf
+from flask import Blueprint, jsonify, request
 
-from services.ai_signals import generate_signal
+from services import bar_store
+from services.ai_signals import (
+    SIGNAL_CACHE,
+    generate_signals_batch,
+    get_signal_cache_stats,
+    memoized_signal,
+    signal_cache_key,
+)
+from services.market_data import SUPPORTED_SYMBOLS
 from services.morocco_scraper import scrape_casablanca_stock
 
 
 signals_bp = Blueprint("signals", __name__)
 
 
+@signals_bp.route("/api/signals", methods=["GET"])
+def get_signals():
+    """
+    Génère les signaux de plusieurs symboles en une seule passe.
+    Les historiques sont complétés par un téléchargement groupé puis les
+    indicateurs sont calculés pour tous les symboles à la fois.
+
+    Query Parameters:
+        symbols (str): Symboles séparés par des virgules (défaut: tous les symboles supportés)
+    """
+    try:
+        symbols_param = request.args.get("symbols", "")
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols_param.split(",") if s.strip()))
+        if not symbols:
+            symbols = SUPPORTED_SYMBOLS
+
+        unsupported = [symbol for symbol in symbols if not bar_store.is_supported(symbol)]
+        if unsupported:
+            return jsonify({
+                "error": f'Symboles non supportés: {", ".join(unsupported)}. Symboles supportés: {", ".join(SUPPORTED_SYMBOLS)}',
+                "symbols": unsupported,
+            }), 400
+
+        errors = bar_store.refresh_many(symbols, "1d", "3mo")
+
+        signals = {}
+        loaded_symbols = []
+        closes_list = []
+        last_bars = {}
+        for symbol in symbols:
+            if symbol in errors:
+                continue
+            last_bar = bar_store.last_bar(symbol, "1d")
+            if last_bar is None:
+                errors[symbol] = "Historique indisponible"
+                continue
+            cached = SIGNAL_CACHE.get(signal_cache_key(symbol, "1d", last_bar))
+            if cached is not None:
+                signals[symbol] = cached
+                continue
+            last_bars[symbol] = last_bar
+            loaded_symbols.append(symbol)
+            closes_list.append(_load_closes(symbol))
+
+        for symbol, result in generate_signals_batch(loaded_symbols, closes_list).items():
+            if "error" in result:
+                errors[symbol] = "Historique indisponible"
+            else:
+                SIGNAL_CACHE.set(signal_cache_key(symbol, "1d", last_bars[symbol]), result)
+                signals[symbol] = result
+
+        # Conserver l'ordre demandé
+        signals = {symbol: signals[symbol] for symbol in symbols if symbol in signals}
+
+        return jsonify({
+            "signals": signals,
+            "errors": errors,
+            "count": len(signals),
+        }), 200 if signals else 400
+    except Exception as e:
+        return jsonify({"error": f"Erreur lors de la génération des signaux: {str(e)}"}), 500
+
+
+@signals_bp.route("/api/signals/cache/stats", methods=["GET"])
+def get_signals_cache_stats():
+    return jsonify(get_signal_cache_stats()), 200
+
+
 @signals_bp.route("/api/signals/<symbol>", methods=["GET"])
 def get_signal(symbol):
     try:
-        ticker = yf.Ticker(symbol)
-        history = ticker.history(period="3mo")
+        symbol = symbol.upper()
+        if not bar_store.is_supported(symbol):
+            return jsonify({
+                "error": f'Symbole non supporté. Symboles supportés: {", ".join(SUPPORTED_SYMBOLS)}',
+                "symbol": symbol,
+            }), 400
 
-        if history is None or history.empty or "Close" not in history.columns:
-            return jsonify({"error": "Historique indisponible", "symbol": symbol}), 400
+        bar_store.refresh(symbol, "1d", "3mo")
 
-        closes = history["Close"].dropna()
-        if closes.empty:
+        # Entre deux clôtures, le signal est servi sans relire l'historique;
+        # à chaque nouvelle barre, seules les barres ajoutées sont lues
+        last_bar = bar_store.last_bar(symbol, "1d")
+        if last_bar is None:
             return jsonify({"error": "Historique indisponible", "symbol": symbol}), 400
 
-        price_history = [{"close": float(v)} for v in closes.tolist()]
-        result = generate_signal(symbol.upper(), price_history)
+        result = memoized_signal(symbol, "1d", last_bar, lambda since: bar_store.load_closes(symbol, "1d", since))
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"error": f"Erreur lors de la génération du signal: {str(e)}", "symbol": symbol}), 500
 
+
+def _load_closes(symbol):
+    history = bar_store.load(symbol, "1d", "3mo")
+    return history["Close"].dropna().to_numpy()
+
+
 @signals_bp.route("/api/signals/morocco/<ticker>", methods=["GET"])
 def get_morocco_signal(ticker):
     """
@@ -1,30 +1,42 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, User, Challenge, Trade
 from datetime import datetime
 from config import Config
+from services.leaderboard import record_trade
+from services.positions import apply_buy, apply_sell
+from services.active_challenge import get_active_snapshot, invalidate_active_challenge
+from services.equity import challenge_equity, get_challenge_equity
+from services.market_data import SUPPORTED_SYMBOLS
+from services.morocco_scraper import get_supported_morocco_tickers
+from services.pagination import keyset_page, parse_datetime, parse_limit, stream_ndjson
 
 trading_bp = Blueprint('trading', __name__)
 
-def check_challenge_rules(challenge):
-    """Vérifie les règles du challenge et retourne le statut"""
+# Nombre maximal d'ordres acceptés par /api/trades/execute-batch
+MAX_BATCH_ORDERS = 500
+
+def check_challenge_rules(challenge, equity=None):
+    """Vérifie les règles du challenge sur son equity (par défaut la balance) et retourne le statut"""
+    if equity is None:
+        equity = challenge.current_balance
     
     # 1. Vérifier si le profit target est atteint
-    profit_percent = ((challenge.current_balance - challenge.initial_balance) / challenge.initial_balance) * 100
+    profit_percent = ((equity - challenge.initial_balance) / challenge.initial_balance) * 100
     if profit_percent >= challenge.profit_target:
         challenge.status = 'passed'
         challenge.ended_at = datetime.utcnow()
         return {'status': 'passed', 'reason': 'Profit target reached!'}
     
     # 2. Vérifier si la perte totale maximale est dépassée
-    total_loss_percent = ((challenge.initial_balance - challenge.current_balance) / challenge.initial_balance) * 100
+    total_loss_percent = ((challenge.initial_balance - equity) / challenge.initial_balance) * 100
     if total_loss_percent >= challenge.max_total_loss_percent:
         challenge.status = 'failed'
         challenge.ended_at = datetime.utcnow()
         return {'status': 'failed', 'reason': 'Max total loss exceeded'}
     
     # 3. Vérifier si la perte journalière maximale est dépassée
-    daily_loss_percent = ((challenge.daily_start_balance - challenge.current_balance) / challenge.daily_start_balance) * 100
+    daily_loss_percent = ((challenge.daily_start_balance - equity) / challenge.daily_start_balance) * 100
     if daily_loss_percent >= challenge.max_daily_loss_percent:
         challenge.status = 'failed'
         challenge.ended_at = datetime.utcnow()
@@ -32,6 +44,146 @@ def check_challenge_rules(challenge):
     
     return {'status': 'active'}
 
+class TradeRejected(Exception):
+    """Trade refusé (solde insuffisant, challenge terminé)"""
+    
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def parse_order(data):
+    """
+    Valide un ordre {symbol, action, quantity, price}
+    
+    Seuls les symboles cotés (SUPPORTED_SYMBOLS et tickers de Casablanca)
+    sont acceptés: une position sur un symbole sans cotation ne pourrait
+    pas être valorisée.
+    
+    Returns:
+        tuple: (symbol, action, quantity, price)
+    
+    Raises:
+        TradeRejected: Si l'ordre est incomplet ou invalide
+    """
+    if not isinstance(data, dict) or not data.get('symbol') or not data.get('action') or not data.get('quantity') or not data.get('price'):
+        raise TradeRejected('Symbol, action, quantity et price requis')
+    
+    try:
+        symbol = str(data['symbol']).upper()
+        action = str(data['action']).lower()
+        quantity = float(data['quantity'])
+        price = float(data['price'])
+    except (TypeError, ValueError):
+        raise TradeRejected('Valeurs invalides')
+    
+    if symbol not in SUPPORTED_SYMBOLS and symbol not in get_supported_morocco_tickers():
+        raise TradeRejected(f'Symbole non supporté: {symbol}')
+    
+    if action not in ['buy', 'sell']:
+        raise TradeRejected('Action doit être buy ou sell')
+    
+    if quantity <= 0 or price <= 0:
+        raise TradeRejected('Quantity et price doivent être positifs')
+    
+    return symbol, action, quantity, price
+
+def find_active_challenge(user_id):
+    """
+    Retourne le challenge actif de l'utilisateur (None si aucun)
+    
+    Lu directement en base (index user_id, status): chaque trade invalide
+    l'instantané en cache, qui ne ferait qu'ajouter des requêtes ici.
+    """
+    return Challenge.query.filter_by(
+        user_id=user_id,
+        status='active'
+    ).first()
+
+def apply_trade(challenge, user_id, symbol, action, quantity, price):
+    """
+    Applique un trade au challenge dans la transaction courante
+    
+    La balance est modifiée par un UPDATE conditionnel atomique
+    (challenge actif et, pour un achat, solde suffisant): deux trades
+    concurrents ne peuvent ni passer tous deux le contrôle de solde ni
+    écraser la mise à jour de l'autre. La ligne reste verrouillée jusqu'au
+    commit, ce qui couvre aussi la vérification des règles.
+    
+    La position du symbole est mise à jour dans la même transaction; une
+    vente réalise son P&L à partir du prix moyen d'achat. Les règles sont
+    évaluées sur l'equity (solde + positions): un achat ne compte pas
+    comme une perte. Si une autre position n'a pas de cotation en cache,
+    le trade est enregistré mais les règles ne sont pas appliquées (le
+    challenge reste actif, rule_check liste unpriced_symbols): le sweeper
+    les appliquera aux prix du marché.
+    
+    Returns:
+        tuple: (Trade, résultat de check_challenge_rules)
+    
+    Raises:
+        TradeRejected: Si le challenge n'est plus actif, le solde ou la
+            position insuffisants. La transaction (ou le savepoint) doit
+            alors être annulée.
+    """
+    # Calculer la valeur du trade
+    trade_value = quantity * price
+    delta = -trade_value if action == 'buy' else trade_value
+    
+    conditions = [Challenge.id == challenge.id, Challenge.status == 'active']
+    if action == 'buy':
+        conditions.append(Challenge.current_balance >= trade_value)
+    
+    updated = Challenge.query.filter(*conditions).update(
+        {Challenge.current_balance: Challenge.current_balance + delta},
+        synchronize_session=False
+    )
+    
+    # Relire la ligne modifiée (ou l'état qui a fait échouer la mise à jour)
+    db.session.refresh(challenge)
+    
+    if not updated:
+        if challenge.status != 'active':
+            raise TradeRejected('Le challenge n\'est plus actif')
+        raise TradeRejected('Solde insuffisant')
+    
+    previous_balance = challenge.current_balance - delta
+    
+    # Mettre à jour la position; pour un sell, P&L réalisé au prix moyen d'achat
+    if action == 'buy':
+        apply_buy(challenge.id, symbol, quantity, price)
+        profit_loss = 0.0
+    else:
+        profit_loss = apply_sell(challenge.id, symbol, quantity, price)
+        if profit_loss is None:
+            raise TradeRejected('Position insuffisante pour cette vente')
+    
+    # Créer le trade record
+    trade = Trade(
+        challenge_id=challenge.id,
+        user_id=user_id,
+        symbol=symbol,
+        action=action,
+        quantity=quantity,
+        price=price,
+        profit_loss=profit_loss,
+        timestamp=datetime.utcnow()
+    )
+    
+    db.session.add(trade)
+    
+    # Mettre à jour le classement mensuel dans la même transaction
+    record_trade(challenge, previous_balance)
+    invalidate_active_challenge(user_id)
+    
+    # Vérifier les règles sur l'equity, le symbole tradé valorisé au prix d'exécution
+    equity, unpriced = challenge_equity(challenge, {symbol: price})
+    if unpriced:
+        rule_check = {'status': 'active', 'unpriced_symbols': unpriced}
+    else:
+        rule_check = check_challenge_rules(challenge, equity)
+    
+    return trade, rule_check
+
 @trading_bp.route('/api/challenges/active', methods=['GET'])
 @jwt_required()
 def get_active_challenge():
@@ -39,16 +191,18 @@ def get_active_challenge():
     try:
         user_id = get_jwt_identity()
         
-        challenge = Challenge.query.filter_by(
-            user_id=user_id,
-            status='active'
-        ).first()
+        # Instantané en cache: pas de requête tant que rien n'a changé
+        snapshot = get_active_snapshot(user_id)
+        challenge = snapshot['challenge']
         
         if not challenge:
             return jsonify({'error': 'Aucun challenge actif trouvé'}), 404
         
         return jsonify({
-            'challenge': challenge.to_dict()
+            'challenge': challenge,
+            'positions': snapshot['positions'],
+            # Valorisation aux derniers prix en cache, quel que soit le worker
+            'equity': get_challenge_equity(challenge, snapshot['positions'])
         }), 200
         
     except Exception as e:
@@ -60,91 +214,155 @@ def execute_trade():
     """Exécute un trade et met à jour le challenge"""
     try:
         user_id = get_jwt_identity()
-        data = request.get_json()
+        symbol, action, quantity, price = parse_order(request.get_json())
         
-        if not data or not data.get('symbol') or not data.get('action') or not data.get('quantity') or not data.get('price'):
-            return jsonify({'error': 'Symbol, action, quantity et price requis'}), 400
+        # Trouver le challenge actif
+        challenge = find_active_challenge(user_id)
         
-        symbol = data['symbol'].upper()
-        action = data['action'].lower()
-        quantity = float(data['quantity'])
-        price = float(data['price'])
+        if not challenge:
+            return jsonify({'error': 'Aucun challenge actif trouvé'}), 404
         
-        if action not in ['buy', 'sell']:
-            return jsonify({'error': 'Action doit être buy ou sell'}), 400
+        trade, rule_check = apply_trade(challenge, user_id, symbol, action, quantity, price)
         
-        if quantity <= 0 or price <= 0:
-            return jsonify({'error': 'Quantity et price doivent être positifs'}), 400
+        db.session.commit()
+        
+        return jsonify({
+            'trade': trade.to_dict(),
+            'challenge': challenge.to_dict(),
+            'rule_check': rule_check
+        }), 200
+        
+    except TradeRejected as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Erreur lors de l\'exécution du trade'}), 400
+
+@trading_bp.route('/api/trades/execute-batch', methods=['POST'])
+@jwt_required()
+def execute_trade_batch():
+    """
+    Exécute une liste d'ordres sur le challenge actif en une seule transaction
+    
+    Les ordres sont appliqués dans l'ordre reçu; les règles du challenge sont
+    vérifiées après chaque ordre et les ordres restants sont ignorés dès que
+    le challenge est réussi ou échoué.
+    
+    Chaque ordre s'exécute dans un savepoint: un ordre refusé (invalide,
+    solde ou position insuffisants) n'annule que ses propres écritures et
+    n'interrompt pas le lot. Toute autre erreur annule le lot entier,
+    ordres déjà exécutés compris (réponse 400, rien n'est validé).
+    
+    Body:
+        orders (list): Ordres {symbol, action, quantity, price} (max MAX_BATCH_ORDERS)
+    
+    Returns:
+        JSON: Résultat par ordre (executed, rejected ou skipped) et challenge final
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+        orders = data.get('orders') if isinstance(data, dict) else None
+        
+        if not isinstance(orders, list) or not orders:
+            return jsonify({'error': 'Liste orders requise'}), 400
+        
+        if len(orders) > MAX_BATCH_ORDERS:
+            return jsonify({'error': f'Maximum {MAX_BATCH_ORDERS} ordres par lot'}), 400
         
         # Trouver le challenge actif
-        challenge = Challenge.query.filter_by(
-            user_id=user_id,
-            status='active'
-        ).first()
+        challenge = find_active_challenge(user_id)
         
         if not challenge:
             return jsonify({'error': 'Aucun challenge actif trouvé'}), 404
         
-        # Calculer la valeur du trade
-        trade_value = quantity * price
-        profit_loss = 0.0
+        results = []
+        rule_check = {'status': 'active'}
+        for index, order in enumerate(orders):
+            if rule_check['status'] != 'active':
+                results.append({'index': index, 'status': 'skipped', 'error': 'Challenge terminé'})
+                continue
+            try:
+                # Savepoint: un ordre refusé n'annule que ses propres modifications
+                with db.session.begin_nested():
+                    trade, rule_check = apply_trade(challenge, user_id, *parse_order(order))
+            except TradeRejected as e:
+                results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+                continue
+            results.append({'index': index, 'status': 'executed', 'trade': trade, 'rule_check': rule_check})
         
-        # Mettre à jour le solde du challenge
-        if action == 'buy':
-            if challenge.current_balance < trade_value:
-                return jsonify({'error': 'Solde insuffisant'}), 400
-            challenge.current_balance -= trade_value
-        else:  # sell
-            challenge.current_balance += trade_value
-            # Pour un sell, on considère que le profit/loss est la différence avec le prix d'achat moyen
-            # Dans une implémentation réelle, vous auriez besoin de suivre le prix d'achat moyen
-            profit_loss = 0.0  # À implémenter selon votre logique de trading
-        
-        # Créer le trade record
-        trade = Trade(
-            challenge_id=challenge.id,
-            user_id=user_id,
-            symbol=symbol,
-            action=action,
-            quantity=quantity,
-            price=price,
-            profit_loss=profit_loss,
-            timestamp=datetime.utcnow()
-        )
-        
-        db.session.add(trade)
-        
-        # Vérifier les règles du challenge
-        rule_check = check_challenge_rules(challenge)
+        # Sérialiser avant le commit: évite de recharger chaque trade expiré
+        db.session.flush()
+        for result in results:
+            if 'trade' in result:
+                result['trade'] = result['trade'].to_dict()
         
         db.session.commit()
         
         return jsonify({
-            'trade': trade.to_dict(),
+            'results': results,
+            'executed': sum(1 for result in results if result['status'] == 'executed'),
             'challenge': challenge.to_dict(),
             'rule_check': rule_check
         }), 200
         
-    except ValueError as e:
-        return jsonify({'error': 'Valeurs invalides'}), 400
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': 'Erreur lors de l\'exécution du trade'}), 400
+        return jsonify({'error': 'Erreur lors de l\'exécution des trades'}), 400
 
 @trading_bp.route('/api/trades/history', methods=['GET'])
 @jwt_required()
 def get_trade_history():
-    """Récupère l'historique des trades de l'utilisateur"""
+    """
+    Récupère l'historique des trades de l'utilisateur, du plus récent au plus ancien
+    
+    Query Parameters:
+        limit (int): Taille de page (défaut 50, max 500)
+        cursor (str): Curseur next_cursor de la page précédente
+        challenge_id (int): Filtre sur un challenge
+        symbol (str): Filtre sur un symbole
+        start (str): Date ISO incluse (timestamp >= start)
+        end (str): Date ISO exclue (timestamp < end)
+        format (str): 'ndjson' pour exporter tout l'historique en flux
+    """
     try:
         user_id = get_jwt_identity()
         
-        trades = Trade.query.filter_by(user_id=user_id).order_by(
-            Trade.timestamp.desc()
-        ).all()
+        query = Trade.query.filter_by(user_id=user_id)
+        
+        challenge_id = request.args.get('challenge_id')
+        if challenge_id:
+            query = query.filter(Trade.challenge_id == int(challenge_id))
+        
+        symbol = request.args.get('symbol')
+        if symbol:
+            query = query.filter(Trade.symbol == symbol.upper())
+        
+        start = parse_datetime(request.args.get('start'))
+        if start:
+            query = query.filter(Trade.timestamp >= start)
+        
+        end = parse_datetime(request.args.get('end'))
+        if end:
+            query = query.filter(Trade.timestamp < end)
+        
+        if request.args.get('format') == 'ndjson':
+            return Response(
+                stream_with_context(stream_ndjson(query, Trade.timestamp, Trade.id)),
+                mimetype='application/x-ndjson'
+            )
+        
+        limit = parse_limit(request.args.get('limit'))
+        trades, next_cursor = keyset_page(query, Trade.timestamp, Trade.id, request.args.get('cursor'), limit)
         
         return jsonify({
-            'trades': [trade.to_dict() for trade in trades]
+            'trades': [trade.to_dict() for trade in trades],
+            'count': len(trades),
+            'next_cursor': next_cursor
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': f'Paramètres invalides: {str(e)}'}), 400
     except Exception as e:
-        return jsonify({'error': 'Erreur lors de la récupération de l\'historique'}), 400
\ No newline at end of file
+        return jsonify({'error': 'Erreur lors de la récupération de l\'historique'}), 400
@@ -0,0 +1,123 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import Config
+from models import db, Challenge
+from services.cache import create_cache
+from services.positions import get_open_positions
+
+# Challenge actif par utilisateur (clé: user_id): instantané des soldes et
+# positions servi par /api/challenges/active. L'absence de challenge actif
+# n'est gardée que ACTIVE_CHALLENGE_NEGATIVE_TTL secondes. Une invalidation
+# ne touche que le stockage du processus qui valide: sans backend partagé
+# (Redis), un instantané en cache n'est servi qu'après avoir comparé son
+# statut et ses soldes à la ligne du challenge, que tout trade, changement
+# de statut ou réinitialisation journalière modifie.
+ACTIVE_CHALLENGE_CACHE = create_cache(
+    'active_challenge',
+    Config.ACTIVE_CHALLENGE_CACHE_TTL,
+    Config.ACTIVE_CHALLENGE_CACHE_MAX_ENTRIES
+)
+
+# Clé de session: utilisateurs à invalider une fois la transaction validée
+_PENDING_KEY = 'active_challenge_invalidate'
+_ALL_USERS = 'all'
+
+
+def _load(user_id):
+    challenge = Challenge.query.filter_by(user_id=user_id, status='active').first()
+    if challenge is None:
+        return {'challenge': None, 'positions': []}
+    return {
+        'challenge': challenge.to_dict(),
+        'positions': [position.to_dict() for position in get_open_positions(challenge.id)]
+    }
+
+
+def get_active_snapshot(user_id):
+    """
+    Retourne le challenge actif d'un utilisateur et ses positions ouvertes
+
+    Lu en base au premier appel puis servi depuis le cache jusqu'à la
+    prochaine modification (paiement, trade, changement de statut). Sans
+    backend partagé, l'instantané est d'abord vérifié par une lecture du
+    challenge par clé primaire (sans les positions) et rechargé s'il a
+    changé.
+
+    Args:
+        user_id: L'utilisateur
+
+    Returns:
+        dict: 'challenge' (dict ou None) et 'positions' (liste de dict)
+    """
+    snapshot = _get_or_load(user_id)
+    if ACTIVE_CHALLENGE_CACHE.backend.shared or _is_current(snapshot['challenge']):
+        return snapshot
+    ACTIVE_CHALLENGE_CACHE.delete(user_id)
+    return _get_or_load(user_id)
+
+
+def _get_or_load(user_id):
+    return ACTIVE_CHALLENGE_CACHE.get_or_load(
+        user_id,
+        lambda: _load(user_id),
+        cache_if=lambda snapshot: snapshot['challenge'] is not None,
+        negative_ttl=Config.ACTIVE_CHALLENGE_NEGATIVE_TTL
+    )
+
+
+def _is_current(challenge):
+    """
+    Vérifie qu'un challenge en cache a toujours le statut et les soldes de
+    sa ligne en base
+    """
+    if challenge is None:
+        return True
+    row = db.session.query(
+        Challenge.status, Challenge.current_balance, Challenge.daily_start_balance
+    ).filter(Challenge.id == challenge['id']).first()
+    return row is not None and tuple(row) == (
+        challenge['status'], challenge['current_balance'], challenge['daily_start_balance']
+    )
+
+
+def invalidate_active_challenge(user_id=None):
+    """
+    Demande l'invalidation du challenge actif d'un utilisateur (ou de tous)
+    à la validation de la transaction courante
+
+    Args:
+        user_id: L'utilisateur, ou None pour tous (mises à jour en bloc)
+    """
+    db.session.info.setdefault(_PENDING_KEY, set()).add(_ALL_USERS if user_id is None else str(user_id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    # Libération d'un savepoint: rien n'est encore validé en base
+    if session.in_nested_transaction():
+        return
+    users = session.info.pop(_PENDING_KEY, None)
+    if not users:
+        return
+    if _ALL_USERS in users:
+        ACTIVE_CHALLENGE_CACHE.clear()
+        return
+    for user_id in users:
+        ACTIVE_CHALLENGE_CACHE.delete(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    # Rollback d'un savepoint: le reste de la transaction peut encore être validé
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_PENDING_KEY, None)
+
+
+def get_active_challenge_cache_stats():
+    """
+    Retourne les compteurs du cache des challenges actifs ('shared':
+    backend partagé, sinon chaque lecture est vérifiée en base)
+    """
+    return dict(ACTIVE_CHALLENGE_CACHE.stats(), shared=ACTIVE_CHALLENGE_CACHE.backend.shared)
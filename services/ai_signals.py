@@ -1,7 +1,20 @@
+import threading
+from collections import deque
+
 import numpy as np
 
+from config import Config
+from services.cache import create_cache
+
+RSI_PERIOD = 14
+MA_SHORT = 20
+MA_LONG = 50
+
+# Signaux indexés par la dernière barre à partir de laquelle ils ont été calculés
+SIGNAL_CACHE = create_cache("signals", Config.SIGNAL_CACHE_TTL, Config.SIGNAL_CACHE_MAX_ENTRIES)
+
 
-def calculate_rsi(prices, period=14):
+def calculate_rsi(prices, period=RSI_PERIOD):
     prices_arr = np.asarray(prices, dtype=float)
     if prices_arr.size < 2:
         return 50.0
@@ -15,6 +28,10 @@ def calculate_rsi(prices, period=14):
     avg_gain = float(np.mean(gains)) if gains.size else 0.0
     avg_loss = float(np.mean(losses)) if losses.size else 0.0
 
+    return _rsi_from_averages(avg_gain, avg_loss)
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
     if avg_gain == 0.0 and avg_loss == 0.0:
         return 50.0
     if avg_loss == 0.0:
@@ -36,16 +53,256 @@ def calculate_ma(prices, period):
     return float(np.mean(prices_arr[-period:]))
 
 
+def indicator_series(closes):
+    """
+    RSI, MA20 et MA50 de chaque barre sous forme de tableaux NumPy (graphiques)
+
+    La valeur i est égale à calculate_rsi / calculate_ma sur closes[:i + 1]:
+    mêmes moyennes simples sur fenêtre, calculées pour toutes les barres par
+    fenêtres glissantes.
+    """
+    prices = np.asarray(closes, dtype=float)
+    deltas = np.diff(prices)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+
+    rsi = np.full(prices.size, 50.0)
+    rsi[1:] = _rsi_array(_rolling_means(gains, RSI_PERIOD), _rolling_means(losses, RSI_PERIOD))
+    return {
+        "rsi": rsi,
+        "ma20": _rolling_means(prices, MA_SHORT),
+        "ma50": _rolling_means(prices, MA_LONG),
+    }
+
+
+def _rolling_means(values, period):
+    # Moyenne des `period` dernières valeurs à chaque indice (toutes pendant le démarrage)
+    means = np.empty(values.size)
+    warmup = min(period - 1, values.size)
+    for index in range(warmup):
+        means[index] = values[:index + 1].mean()
+    if values.size >= period:
+        means[period - 1:] = np.lib.stride_tricks.sliding_window_view(values, period).mean(axis=1)
+    return means
+
+
+def _rsi_array(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    rsi = np.where(avg_loss == 0.0, 100.0, rsi)
+    rsi = np.where(avg_gain == 0.0, 0.0, rsi)
+    rsi = np.where((avg_gain == 0.0) & (avg_loss == 0.0), 50.0, rsi)
+    return np.clip(rsi, 0.0, 100.0)
+
+
+class _IndicatorState:
+    __slots__ = ("timestamp", "close", "closes", "gains", "losses")
+
+    def __init__(self):
+        self.timestamp = None
+        self.close = None
+        self.closes = deque(maxlen=MA_LONG)
+        self.gains = deque(maxlen=RSI_PERIOD)
+        self.losses = deque(maxlen=RSI_PERIOD)
+
+    def push(self, timestamp, close):
+        if self.close is not None:
+            delta = close - self.close
+            self.gains.append(delta if delta > 0 else 0.0)
+            self.losses.append(-delta if delta < 0 else 0.0)
+        self.closes.append(close)
+        self.timestamp = timestamp
+        self.close = close
+
+    def indicators(self):
+        if not self.gains:
+            raise ValueError("price_history insuffisant")
+        closes = np.fromiter(self.closes, dtype=float, count=len(self.closes))
+        return {
+            "rsi": _rsi_from_averages(
+                float(np.mean(np.fromiter(self.gains, dtype=float, count=len(self.gains)))),
+                float(np.mean(np.fromiter(self.losses, dtype=float, count=len(self.losses)))),
+            ),
+            "ma20": float(np.mean(closes[-MA_SHORT:])),
+            "ma50": float(np.mean(closes)),
+            "current_price": self.close,
+        }
+
+
+class IndicatorEngine:
+    """
+    RSI/MA20/MA50 courants par (symbole, intervalle), avancés barre par barre
+
+    Chaque état ne garde que les RSI_PERIOD derniers gains/pertes et les
+    MA_LONG dernières clôtures: une nouvelle barre coûte autant quelle que
+    soit la longueur de l'historique. Les moyennes sont prises sur ces
+    fenêtres exactement comme dans calculate_rsi et calculate_ma (des sommes
+    glissantes dériveraient): les indicateurs sont identiques au bit près à
+    un recalcul sur la série complète.
+
+    Un verrou par clé: les lectures du store de deux symboles différents ne
+    s'attendent pas.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _lock_for(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def advance(self, key, load_bars):
+        """
+        Amène l'état de `key` jusqu'à la dernière barre stockée et retourne
+        ses indicateurs
+
+        load_bars(since) retourne (timestamps, closes) des barres à partir de
+        `since` (toutes si None); seules les barres postérieures à la
+        dernière de l'état sont ajoutées. L'état est reconstruit depuis la fin
+        du store quand cette dernière barre a été réécrite (clôture révisée,
+        historique réajusté).
+        """
+        with self._lock_for(key):
+            with self._lock:
+                state = self._states.get(key)
+            since = state.timestamp if state is not None else None
+            timestamps, closes = _valid_bars(*load_bars(since))
+            if state is not None and len(timestamps) and timestamps[0] == state.timestamp and closes[0] == state.close:
+                start = 1
+            else:
+                if state is not None:
+                    timestamps, closes = _valid_bars(*load_bars(None))
+                state = _IndicatorState()
+                start = max(len(closes) - MA_LONG, 0)
+            for timestamp, close in zip(timestamps[start:].tolist(), closes[start:].tolist()):
+                state.push(timestamp, close)
+            if state.timestamp is not None:
+                with self._lock:
+                    self._states[key] = state
+            return state.indicators()
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+
+
+def _valid_bars(timestamps, closes):
+    closes = np.asarray(closes, dtype=float)
+    valid = ~np.isnan(closes)
+    return np.asarray(timestamps)[valid], closes[valid]
+
+
+INDICATOR_ENGINE = IndicatorEngine()
+
+
 def generate_signal(symbol, price_history):
     prices = [float(p["close"]) for p in price_history if p.get("close") is not None]
-    if len(prices) < 2:
+    return generate_signal_from_closes(symbol, prices)
+
+
+def generate_signal_from_closes(symbol, closes):
+    prices = np.asarray(closes, dtype=float)
+    prices = prices[~np.isnan(prices)]
+    if prices.size < 2:
         raise ValueError("price_history insuffisant")
 
-    current_price = float(prices[-1])
-    rsi = float(calculate_rsi(prices))
-    ma20 = float(calculate_ma(prices, 20))
-    ma50 = float(calculate_ma(prices, 50))
+    return _decide_signal(
+        rsi=float(calculate_rsi(prices)),
+        ma20=float(calculate_ma(prices, MA_SHORT)),
+        ma50=float(calculate_ma(prices, MA_LONG)),
+        current_price=float(prices[-1]),
+    )
+
+
+def signal_cache_key(symbol, interval, last_bar):
+    last_ts, last_close = last_bar
+    return (symbol, interval, last_ts, repr(last_close), RSI_PERIOD, MA_SHORT, MA_LONG)
+
+
+def memoized_signal(symbol, interval, last_bar, load_bars):
+    """
+    Retourne depuis le cache le signal de la dernière barre (timestamp, close)
+
+    Si cette barre n'a jamais été vue, INDICATOR_ENGINE est avancé avec les
+    seules nouvelles barres (voir IndicatorEngine.advance pour load_bars).
+    """
+    return SIGNAL_CACHE.get_or_load(
+        signal_cache_key(symbol, interval, last_bar),
+        lambda: _decide_signal(**INDICATOR_ENGINE.advance((symbol, interval), load_bars)),
+    )
+
+
+def get_signal_cache_stats():
+    return SIGNAL_CACHE.stats()
+
+
+def stack_closes(closes_list, width):
+    """Aligne à droite les `width` dernières clôtures de chaque série dans un tableau 2D complété par des NaN"""
+    matrix = np.full((len(closes_list), width), np.nan)
+    for row, closes in enumerate(closes_list):
+        prices = np.asarray(closes, dtype=float)
+        tail = prices[~np.isnan(prices)][-width:]
+        if tail.size:
+            matrix[row, width - tail.size:] = tail
+    return matrix
+
+
+def generate_signals_batch(symbols, closes_list):
+    """
+    Calcule generate_signal pour plusieurs symboles à la fois
+
+    Les clôtures sont empilées dans un seul tableau 2D et RSI/MA20/MA50 sont
+    calculés pour toutes les lignes par des opérations vectorisées. Retourne
+    {symbole: signal ou {"error": ...}}.
+    """
+    matrix = stack_closes(closes_list, max(MA_LONG, RSI_PERIOD + 1))
+    counts = np.count_nonzero(~np.isnan(matrix), axis=1)
+
+    deltas = np.diff(matrix[:, -(RSI_PERIOD + 1):], axis=1)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+    delta_counts = np.maximum(counts - 1, 0)
+
+    avg_gain = _tail_means(gains, delta_counts, RSI_PERIOD)
+    avg_loss = _tail_means(losses, delta_counts, RSI_PERIOD)
+    ma20 = _tail_means(matrix, counts, MA_SHORT)
+    ma50 = _tail_means(matrix, counts, MA_LONG)
+
+    rsi = _rsi_array(avg_gain, avg_loss)
+
+    results = {}
+    for row, symbol in enumerate(symbols):
+        if counts[row] < 2:
+            results[symbol] = {"error": "price_history insuffisant", "symbol": symbol}
+            continue
+        results[symbol] = _decide_signal(
+            rsi=float(rsi[row]),
+            ma20=float(ma20[row]),
+            ma50=float(ma50[row]),
+            current_price=float(matrix[row, -1]),
+        )
+    return results
+
+
+def _tail_means(matrix, counts, period):
+    # Lignes groupées par nombre de valeurs finales valides: chaque moyenne est
+    # prise sur un bloc sans NaN, identique au bit près à np.mean.
+    sizes = np.minimum(counts, period)
+    means = np.full(matrix.shape[0], np.nan)
+    for size in np.unique(sizes):
+        if size == 0:
+            continue
+        rows = np.flatnonzero(sizes == size)
+        means[rows] = matrix[rows, matrix.shape[1] - size:].mean(axis=1)
+    return means
+
 
+def _decide_signal(rsi, ma20, ma50, current_price):
     signal = "HOLD"
     confidence = 50
     risk_level = "medium"
@@ -0,0 +1,401 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Chaque fichier .npy est un tableau (6, n) stocké colonne par colonne:
+# timestamp (secondes epoch UTC) puis les colonnes OHLCV
+FRAME_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+_CLOSE_ROW = 1 + FRAME_COLUMNS.index('Close')
+
+# Périodes yfinance converties en décalage calendaire
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10)
+}
+
+_KEY_PATTERN = re.compile(r'^[A-Z0-9.^=\-]{1,20}$')
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def get_history(symbol, interval='1d', period='1mo'):
+    """
+    Retourne l'historique OHLCV d'un symbole depuis le store local,
+    après l'avoir complété si nécessaire avec les barres manquantes
+
+    Args:
+        symbol (str): Le symbole boursier
+        interval (str): L'intervalle des barres (ex: '1d', '1h')
+        period (str): La période demandée (ex: '1mo', '3mo', 'max')
+
+    Returns:
+        DataFrame: Historique au format yfinance (Open, High, Low, Close, Volume)
+    """
+    refresh(symbol, interval, period)
+    return load(symbol, interval, period)
+
+
+def refresh(symbol, interval='1d', period='1mo', force=False):
+    """
+    Met à jour le store pour un symbole et un intervalle
+
+    Seules les barres postérieures à l'avant-dernière barre stockée sont
+    téléchargées. Les cours étant ajustés (auto_adjust), un dividende ou un
+    split modifie rétroactivement tout l'historique: si cette barre de
+    recouvrement revient avec une autre clôture, tout l'historique couvert
+    est retéléchargé et remplace le store. Si la période demandée remonte
+    avant les données stockées, la période complète est téléchargée. En cas
+    d'échec de la source, les données déjà stockées restent servies.
+
+    Args:
+        symbol (str): Le symbole boursier
+        interval (str): L'intervalle des barres
+        period (str): La période que le store doit couvrir
+        force (bool): Ignore le délai minimal entre deux rafraîchissements
+    """
+    base = _base_path(symbol, interval)
+    with _lock_for(base):
+        now = time.time()
+        meta = _read_meta(base)
+        start = _period_start(period, now)
+        covered = meta is not None and _covers(meta, start)
+
+        if covered and not force and now - meta['refreshed_at'] < Config.BAR_STORE_REFRESH_SECONDS:
+            return
+
+        overlap = _overlap_bar(base) if covered else None
+        replace = False
+        try:
+            ticker = yf.Ticker(symbol)
+            if overlap is not None:
+                hist = ticker.history(start=pd.Timestamp(overlap[0], unit='s', tz='UTC'), interval=interval)
+                if _readjusted(hist, overlap):
+                    logger.info("Historique réajusté pour %s (dividende ou split): rechargement complet", symbol)
+                    hist = _full_history(ticker, meta, interval)
+                    replace = True
+            else:
+                hist = ticker.history(period=period, interval=interval)
+        except Exception as e:
+            if meta is None:
+                raise
+            logger.warning("Rafraîchissement du store impossible pour %s: %s", symbol, e)
+            return
+
+        _save(base, meta, hist, start, now, replace)
+
+
+def refresh_many(symbols, interval='1d', period='1mo', force=False):
+    """
+    Met à jour le store pour plusieurs symboles
+
+    Les symboles déjà stockés sont complétés ensemble par un unique
+    téléchargement groupé à partir de la plus ancienne barre de
+    recouvrement (voir refresh); les symboles jamais stockés, et ceux dont
+    l'historique a été réajusté, passent par refresh().
+
+    Args:
+        symbols (list): Liste de symboles boursiers
+        interval (str): L'intervalle des barres
+        period (str): La période que le store doit couvrir
+        force (bool): Ignore le délai minimal entre deux rafraîchissements
+
+    Returns:
+        dict: Symbole -> message d'erreur pour les symboles non rafraîchis
+    """
+    now = time.time()
+    start = _period_start(period, now)
+    errors = {}
+    stale = {}
+
+    for symbol in dict.fromkeys(symbols):
+        try:
+            base = _base_path(symbol, interval)
+            meta = _read_meta(base)
+            overlap = _overlap_bar(base)
+            if meta is None or overlap is None or not _covers(meta, start):
+                refresh(symbol, interval, period, force)
+            elif force or now - meta['refreshed_at'] >= Config.BAR_STORE_REFRESH_SECONDS:
+                stale[symbol] = overlap
+        except Exception as e:
+            errors[symbol] = str(e)
+
+    if not stale:
+        return errors
+
+    try:
+        data = yf.download(
+            list(stale),
+            start=pd.Timestamp(min(overlap[0] for overlap in stale.values()), unit='s', tz='UTC'),
+            interval=interval,
+            group_by='ticker',
+            auto_adjust=True,
+            ignore_tz=False,
+            progress=False,
+            threads=True
+        )
+    except Exception as e:
+        logger.warning("Téléchargement groupé impossible: %s", e)
+        return errors
+
+    readjusted = []
+    for symbol, overlap in stale.items():
+        if data is None or data.empty:
+            hist = None
+        elif len(stale) == 1:
+            hist = data
+        elif symbol in data.columns.get_level_values(0):
+            hist = data[symbol]
+        else:
+            hist = None
+
+        if hist is not None:
+            # Retirer les lignes propres aux calendriers des autres symboles
+            hist = hist.dropna(subset=['Close'])
+            hist = hist[hist.index >= pd.Timestamp(overlap[0], unit='s', tz='UTC')]
+            if _readjusted(hist, overlap):
+                readjusted.append(symbol)
+                continue
+
+        base = _base_path(symbol, interval)
+        with _lock_for(base):
+            _save(base, _read_meta(base), hist, start, now)
+
+    for symbol in readjusted:
+        try:
+            refresh(symbol, interval, period, force=True)
+        except Exception as e:
+            errors[symbol] = str(e)
+
+    return errors
+
+
+def _save(base, meta, hist, start, now, replace=False):
+    if hist is None or hist.empty:
+        if meta is not None:
+            meta['refreshed_at'] = now
+            _write_meta(base, meta)
+        return
+
+    bars = _read_bars(base) if meta is not None and not replace else None
+    merged = _merge(bars, _frame_to_bars(hist))
+
+    coverage_start = 0 if start is None else start
+    if meta is not None:
+        coverage_start = min(coverage_start, meta['coverage_start'])
+
+    _write_bars(base, merged)
+    _write_meta(base, {
+        # Le fuseau d'origine est conservé (le téléchargement groupé est en UTC)
+        'tz': meta['tz'] if meta is not None else str(hist.index.tz or 'UTC'),
+        'coverage_start': coverage_start,
+        'refreshed_at': now
+    })
+
+
+def load(symbol, interval='1d', period='1mo'):
+    """
+    Lit l'historique stocké (fichier mappé en mémoire) sans accès réseau
+
+    Args:
+        symbol (str): Le symbole boursier
+        interval (str): L'intervalle des barres
+        period (str): La période à retourner
+
+    Returns:
+        DataFrame: Historique au format yfinance, vide si rien n'est stocké
+    """
+    base = _base_path(symbol, interval)
+    meta = _read_meta(base)
+    if meta is None or not os.path.exists(f'{base}.npy'):
+        return pd.DataFrame(columns=list(FRAME_COLUMNS))
+
+    bars = np.load(f'{base}.npy', mmap_mode='r')
+    start = _period_start(period, time.time())
+    first = int(np.searchsorted(bars[0], start)) if start is not None else 0
+    # Comme yfinance, une période courte retourne au moins la dernière barre
+    first = min(first, max(bars.shape[1] - 1, 0))
+    window = np.array(bars[:, first:])
+    del bars
+
+    index = pd.to_datetime(window[0].astype(np.int64), unit='s', utc=True).tz_convert(meta['tz'])
+    return pd.DataFrame(
+        {column: window[row] for row, column in enumerate(FRAME_COLUMNS, start=1)},
+        index=index
+    )
+
+
+def load_closes(symbol, interval='1d', since=None):
+    """
+    Lit les clôtures stockées à partir d'un timestamp, sans construire de DataFrame
+
+    Args:
+        symbol (str): Le symbole boursier
+        interval (str): L'intervalle des barres
+        since (int): Timestamp (secondes epoch) de la première barre, incluse;
+            None pour tout l'historique stocké
+
+    Returns:
+        tuple: (timestamps int64, clôtures float), vides si rien n'est stocké
+    """
+    base = _base_path(symbol, interval)
+    if not os.path.exists(f'{base}.npy'):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    bars = np.load(f'{base}.npy', mmap_mode='r')
+    first = int(np.searchsorted(bars[0], since)) if since is not None else 0
+    return bars[0, first:].astype(np.int64), np.array(bars[_CLOSE_ROW, first:])
+
+
+def last_bar(symbol, interval='1d'):
+    """
+    Retourne (timestamp, close) de la dernière barre stockée, ou None
+
+    Seul l'en-tête et la dernière colonne du fichier mappé sont lus.
+    """
+    base = _base_path(symbol, interval)
+    if not os.path.exists(f'{base}.npy'):
+        return None
+    bars = np.load(f'{base}.npy', mmap_mode='r')
+    if not bars.shape[1]:
+        return None
+    return int(bars[0, -1]), float(bars[_CLOSE_ROW, -1])
+
+
+def is_supported(symbol):
+    """
+    Indique si le store accepte un symbole (symboles supportés uniquement:
+    chaque symbole stocké coûte des téléchargements et des fichiers)
+    """
+    # Import à l'appel: market_data importe ce module
+    from services.market_data import SUPPORTED_SYMBOLS
+    return symbol in SUPPORTED_SYMBOLS
+
+
+def _base_path(symbol, interval):
+    if not _KEY_PATTERN.match(symbol) or not re.match(r'^[0-9a-z]{1,4}$', interval):
+        raise ValueError(f'Symbole ou intervalle invalide: {symbol} {interval}')
+    if not is_supported(symbol):
+        raise ValueError(f'Symbole non supporté: {symbol}')
+    os.makedirs(Config.BAR_STORE_DIR, exist_ok=True)
+    return os.path.join(Config.BAR_STORE_DIR, f'{symbol}_{interval}')
+
+
+def _lock_for(base):
+    with _locks_lock:
+        return _locks.setdefault(base, threading.Lock())
+
+
+def _overlap_bar(base):
+    """
+    (timestamp, close) de la barre de recouvrement: l'avant-dernière barre
+    stockée, la dernière pouvant être une barre en cours encore révisée
+    """
+    if not os.path.exists(f'{base}.npy'):
+        return None
+    bars = np.load(f'{base}.npy', mmap_mode='r')
+    if not bars.shape[1]:
+        return None
+    index = max(bars.shape[1] - 2, 0)
+    return int(bars[0, index]), float(bars[_CLOSE_ROW, index])
+
+
+def _readjusted(hist, overlap):
+    """
+    Indique si la barre de recouvrement revient avec une autre clôture
+    (historique ajusté après un dividende ou un split)
+    """
+    if hist is None or hist.empty:
+        return False
+    bars = _frame_to_bars(hist)
+    matches = np.flatnonzero(bars[0] == overlap[0])
+    if not matches.size:
+        return False
+    close = bars[_CLOSE_ROW, matches[0]]
+    return bool(np.isfinite(close) and np.isfinite(overlap[1]) and not np.isclose(close, overlap[1], rtol=1e-6, atol=0))
+
+
+def _full_history(ticker, meta, interval):
+    # Toute la période déjà couverte par le store
+    if meta['coverage_start'] == 0:
+        return ticker.history(period='max', interval=interval)
+    return ticker.history(start=pd.Timestamp(meta['coverage_start'], unit='s', tz='UTC'), interval=interval)
+
+
+def _period_start(period, now):
+    if period == 'max':
+        return None
+    current = pd.Timestamp(now, unit='s', tz='UTC')
+    if period == 'ytd':
+        return pd.Timestamp(year=current.year, month=1, day=1, tz='UTC').timestamp()
+    return (current - PERIOD_OFFSETS.get(period, PERIOD_OFFSETS['1mo'])).timestamp()
+
+
+def _covers(meta, start):
+    if start is None:
+        return meta['coverage_start'] == 0
+    return meta['coverage_start'] <= start
+
+
+def _frame_to_bars(hist):
+    ts = hist.index.tz_convert(None) if hist.index.tz is not None else hist.index
+    return np.vstack([
+        ts.values.astype('datetime64[s]').astype(np.int64).astype(float),
+        *(hist[column].to_numpy(dtype=float) for column in FRAME_COLUMNS)
+    ])
+
+
+def _merge(existing, new):
+    """
+    Concatène les barres stockées et les nouvelles; les nouvelles barres
+    remplacent celles à partir de leur premier timestamp (barre en cours révisée).
+    """
+    if existing is None or not existing.shape[1]:
+        return new
+    keep = int(np.searchsorted(existing[0], new[0, 0]))
+    return np.hstack([existing[:, :keep], new])
+
+
+def _read_meta(base):
+    try:
+        with open(f'{base}.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _read_bars(base):
+    try:
+        return np.load(f'{base}.npy')
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_meta(base, meta):
+    tmp_path = f'{base}.json.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, f'{base}.json')
+
+
+def _write_bars(base, bars):
+    # Écriture atomique: les lecteurs voient l'ancien ou le nouveau fichier
+    tmp_path = f'{base}.{os.getpid()}.tmp.npy'
+    np.save(tmp_path, np.ascontiguousarray(bars))
+    os.replace(tmp_path, f'{base}.npy')
@@ -0,0 +1,513 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """
+    Interface minimale d'un backend de cache clé -> valeur avec expiration.
+
+    Les valeurs stockées sont des dictionnaires sérialisables en JSON, ce qui
+    permet à un backend partagé (Redis ou compatible) d'être utilisé par
+    tous les workers gunicorn.
+    """
+
+    # Stockage commun à tous les processus (une invalidation est vue de tous)
+    shared = False
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self, prefix):
+        raise NotImplementedError
+
+    def generations(self, keys):
+        """
+        Retourne les compteurs d'invalidation des clés (0 si jamais incrémenté)
+        """
+        raise NotImplementedError
+
+    def bump(self, key):
+        """
+        Incrémente le compteur d'invalidation d'une clé
+        """
+        raise NotImplementedError
+
+    def set_if_generations(self, key, value, ttl, generation_keys, expected):
+        """
+        Écrit la valeur seulement si les compteurs n'ont pas changé depuis
+        la lecture expected (aucune invalidation entre-temps)
+
+        Returns:
+            bool: True si la valeur a été écrite
+        """
+        raise NotImplementedError
+
+    def stats(self, prefix):
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Backend en mémoire du processus: TTL par entrée et éviction LRU
+    au-delà de max_entries.
+
+    Les compteurs d'invalidation sont eux aussi bornés à max_entries (LRU
+    sur le dernier incrément). Un compteur évincé relève un plancher, valeur
+    de toute clé sans compteur: il ne revient jamais en arrière, une écriture
+    lue avant une invalidation reste refusée (au pire une écriture légitime
+    l'est aussi).
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        # Compteurs d'invalidation, hors LRU des valeurs: une éviction de
+        # valeur ne doit pas les remettre à zéro
+        self._generations = OrderedDict()
+        self._generation_floor = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def _set(self, key, value, ttl):
+        self._data[key] = (time.time() + ttl if ttl else None, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def _generations_of(self, keys):
+        return tuple(self._generations.get(key, self._generation_floor) for key in keys)
+
+    def generations(self, keys):
+        with self._lock:
+            return self._generations_of(keys)
+
+    def bump(self, key):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, self._generation_floor) + 1
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.max_entries:
+                _, generation = self._generations.popitem(last=False)
+                self._generation_floor = max(self._generation_floor, generation)
+
+    def set_if_generations(self, key, value, ttl, generation_keys, expected):
+        with self._lock:
+            if self._generations_of(generation_keys) != tuple(expected):
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def stats(self, prefix):
+        with self._lock:
+            size = sum(1 for k in self._data if k.startswith(prefix))
+        return {
+            'backend': 'memory',
+            'size': size,
+            'max_entries': self.max_entries,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'generations': len(self._generations)
+        }
+
+
+class RedisBackend(CacheBackend):
+    """
+    Backend partagé entre processus, compatible avec tout serveur parlant le
+    protocole Redis. L'éviction LRU est déléguée au serveur
+    (maxmemory-policy allkeys-lru).
+    """
+
+    shared = True
+
+    # Durée de vie des compteurs d'invalidation (bien au-delà d'un chargement)
+    GENERATION_TTL = 86400
+
+    def __init__(self, url):
+        import redis
+
+        self._redis = redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        payload = json.dumps(value)
+        if ttl:
+            self._client.set(key, payload, px=int(ttl * 1000))
+        else:
+            self._client.set(key, payload)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def clear(self, prefix):
+        keys = list(self._client.scan_iter(match=f'{prefix}*'))
+        if keys:
+            self._client.delete(*keys)
+
+    def generations(self, keys):
+        return tuple(int(value or 0) for value in self._client.mget(keys))
+
+    def bump(self, key):
+        pipe = self._client.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, self.GENERATION_TTL)
+        pipe.execute()
+
+    def set_if_generations(self, key, value, ttl, generation_keys, expected):
+        payload = json.dumps(value)
+        with self._client.pipeline() as pipe:
+            try:
+                # WATCH: une invalidation entre la comparaison et l'écriture annule l'EXEC
+                pipe.watch(*generation_keys)
+                current = tuple(int(v or 0) for v in pipe.mget(generation_keys))
+                if current != tuple(expected):
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                if ttl:
+                    pipe.set(key, payload, px=int(ttl * 1000))
+                else:
+                    pipe.set(key, payload)
+                pipe.execute()
+                return True
+            except self._redis.WatchError:
+                return False
+
+    def stats(self, prefix):
+        info = self._client.info('stats')
+        return {
+            'backend': 'redis',
+            'evictions': info.get('evicted_keys', 0),
+            'expirations': info.get('expired_keys', 0)
+        }
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Cache nommé avec TTL, compteurs hit/miss et déduplication des chargements
+    concurrents (single-flight): plusieurs requêtes manquant la même clé
+    déclenchent un seul appel au loader.
+
+    Avec stale_ttl > 0, une entrée expirée reste servie pendant stale_ttl
+    secondes supplémentaires pendant qu'elle est rechargée en arrière-plan
+    (stale-while-revalidate). Un rechargement en échec est noté dans
+    l'entrée (champ 'f'): les suivants attendent revalidate_backoff
+    secondes au lieu de relancer la source à chaque requête.
+
+    delete() et clear() incrémentent un compteur d'invalidation (dans le
+    backend, donc partagé entre workers). Un chargement commencé avant une
+    invalidation ne met pas son résultat en cache: il a pu lire l'état
+    précédant la modification qui a provoqué l'invalidation.
+    """
+
+    def __init__(self, name, ttl, backend, stale_ttl=0, revalidate_backoff=0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.revalidate_backoff = revalidate_backoff
+        self.backend = backend
+        self._prefix = f'{name}:'
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.negative_stores = 0
+        self.revalidation_failures = 0
+        self.discarded_loads = 0
+
+    def _key(self, key):
+        if isinstance(key, tuple):
+            key = '|'.join(str(part) for part in key)
+        return f'{self._prefix}{key}'
+
+    def _lookup(self, key):
+        """
+        Retourne (entrée, fraîche) et met à jour les compteurs
+        """
+        entry = self.backend.get(self._key(key))
+        fresh = entry is not None and (entry.get('e') is None or entry['e'] > time.time())
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            elif fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+        return entry, fresh
+
+    def get(self, key, default=None):
+        entry, fresh = self._lookup(key)
+        return entry['v'] if fresh else default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, value, ttl, self.stale_ttl)
+
+    def _store(self, key, value, ttl, stale_ttl, generation=None):
+        """
+        Écrit l'entrée; avec generation (lue avant le chargement), seulement
+        si la clé n'a pas été invalidée depuis
+
+        Returns:
+            bool: True si l'entrée a été écrite
+        """
+        now = time.time()
+        entry = {'v': value, 't': now, 'e': now + ttl if ttl else None}
+        backend_ttl = ttl + stale_ttl if ttl else None
+        if generation is None:
+            self.backend.set(self._key(key), entry, backend_ttl)
+            return True
+        return self._store_entry(self._key(key), entry, backend_ttl, generation)
+
+    def _store_entry(self, full_key, entry, backend_ttl, generation):
+        if self.backend.set_if_generations(full_key, entry, backend_ttl, self._generation_keys(full_key), generation):
+            return True
+        with self._lock:
+            self.discarded_loads += 1
+        return False
+
+    def _generation_keys(self, full_key):
+        # Hors du préfixe du cache: clear() ne doit pas remettre les compteurs à zéro
+        return (f'~gen:{self.name}', f'~gen:{full_key}')
+
+    def _generation(self, full_key):
+        return self.backend.generations(self._generation_keys(full_key))
+
+    def delete(self, key):
+        full_key = self._key(key)
+        # Compteur d'abord: un chargement qui écrirait entre les deux est refusé
+        self.backend.bump(self._generation_keys(full_key)[1])
+        self.backend.delete(full_key)
+
+    def clear(self):
+        self.backend.bump(f'~gen:{self.name}')
+        self.backend.clear(self._prefix)
+
+    def get_or_load(self, key, loader, ttl=None, cache_if=None, negative_ttl=None):
+        """
+        Retourne la valeur en cache ou l'obtient via loader().
+
+        Args:
+            key: Clé (str ou tuple)
+            loader (callable): Fonction sans argument produisant la valeur
+            ttl (float): TTL spécifique, sinon celui du cache
+            cache_if (callable): Prédicat décidant si la valeur est mise en cache
+            negative_ttl (float): Si fourni, les valeurs refusées par cache_if
+                sont tout de même mises en cache pour cette durée (plus courte)
+
+        Returns:
+            La valeur en cache ou fraîchement chargée
+        """
+        entry, fresh = self._lookup(key)
+        if entry is not None:
+            if not fresh and not self._backing_off(entry):
+                self._revalidate(key, loader, ttl, cache_if, negative_ttl)
+            return entry['v']
+
+        full_key = self._key(key)
+        with self._lock:
+            call = self._inflight.get(full_key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._inflight[full_key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        return self._run(key, full_key, call, loader, ttl, cache_if, negative_ttl)
+
+    def refresh(self, key, loader, ttl=None, cache_if=None, negative_ttl=None):
+        """
+        Recharge la clé sans consulter le cache (ex: tâche planifiée)
+        """
+        call = _InFlight()
+        with self._lock:
+            self._inflight.setdefault(self._key(key), call)
+        return self._run(key, self._key(key), call, loader, ttl, cache_if, negative_ttl)
+
+    def _backing_off(self, entry):
+        failed_at = entry.get('f')
+        return failed_at is not None and failed_at + self.revalidate_backoff > time.time()
+
+    def _mark_failed(self, full_key, generation):
+        """
+        Note l'échec d'un rechargement sur l'entrée périmée encore servie
+        """
+        entry = self.backend.get(full_key)
+        if entry is None:
+            return
+        now = time.time()
+        remaining = None
+        if entry.get('e') is not None:
+            remaining = entry['e'] + self.stale_ttl - now
+            if remaining <= 0:
+                return
+        entry['f'] = now
+        # Pas de réécriture d'une entrée invalidée entre-temps
+        if self._store_entry(full_key, entry, remaining, generation):
+            with self._lock:
+                self.revalidation_failures += 1
+
+    def _revalidate(self, key, loader, ttl, cache_if, negative_ttl):
+        full_key = self._key(key)
+        with self._lock:
+            if full_key in self._inflight:
+                return
+            call = _InFlight()
+            self._inflight[full_key] = call
+
+        def run():
+            try:
+                self._run(key, full_key, call, loader, ttl, cache_if, negative_ttl)
+            except Exception:
+                logger.exception("Rechargement en arrière-plan impossible: %s", full_key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _run(self, key, full_key, call, loader, ttl, cache_if, negative_ttl):
+        generation = None
+        try:
+            with self._lock:
+                self.loads += 1
+            # Lu avant le chargement: une invalidation pendant loader() est détectée
+            generation = self._generation(full_key)
+            value = loader()
+            ttl = self.ttl if ttl is None else ttl
+            if cache_if is None or cache_if(value):
+                self._store(key, value, ttl, self.stale_ttl, generation)
+            elif self.backend.get(full_key) is not None:
+                # Une ancienne valeur valide reste préférable à une erreur récente
+                self._mark_failed(full_key, generation)
+            elif negative_ttl:
+                if self._store(key, value, negative_ttl, 0, generation):
+                    with self._lock:
+                        self.negative_stores += 1
+            call.value = value
+            return value
+        except Exception as e:
+            call.error = e
+            if generation is not None:
+                self._mark_failed(full_key, generation)
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(full_key) is call:
+                    del self._inflight[full_key]
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'name': self.name,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'negative_stores': self.negative_stores,
+                'revalidation_failures': self.revalidation_failures,
+                'discarded_loads': self.discarded_loads
+            }
+        counters.update(self.backend.stats(self._prefix))
+        return counters
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(max_entries):
+    """
+    Retourne le backend configuré (CACHE_BACKEND). Le client Redis est partagé
+    entre tous les caches; en mode mémoire chaque cache a son propre stockage.
+    Si Redis est demandé mais indisponible, on se rabat sur la mémoire.
+    """
+    with _backends_lock:
+        if Config.CACHE_BACKEND == 'redis':
+            if 'redis' not in _backends:
+                try:
+                    _backends['redis'] = RedisBackend(Config.CACHE_REDIS_URL)
+                except ImportError:
+                    logger.warning("Package redis absent, utilisation du cache mémoire")
+                    _backends['redis'] = None
+            if _backends['redis'] is not None:
+                return _backends['redis']
+        return MemoryBackend(max_entries=max_entries)
+
+
+def create_cache(name, ttl, max_entries=1024, stale_ttl=0, revalidate_backoff=None):
+    """
+    Crée un cache nommé sur le backend configuré
+
+    Args:
+        name (str): Espace de noms des clés (ex: 'quotes')
+        ttl (float): Durée de vie par défaut des entrées en secondes
+        max_entries (int): Taille maximale pour le backend mémoire
+        stale_ttl (float): Durée pendant laquelle une entrée expirée reste servie
+        revalidate_backoff (float): Délai entre deux rechargements en échec
+            d'une entrée périmée (défaut CACHE_REVALIDATE_BACKOFF)
+
+    Returns:
+        TTLCache: Le cache prêt à l'emploi
+    """
+    if revalidate_backoff is None:
+        revalidate_backoff = Config.CACHE_REVALIDATE_BACKOFF
+    return TTLCache(name, ttl, get_backend(max_entries), stale_ttl=stale_ttl,
+                    revalidate_backoff=revalidate_backoff)
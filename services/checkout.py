@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from config import Config
+from models import db, Challenge, Payment
+from services.active_challenge import invalidate_active_challenge
+from services.leaderboard import record_challenge_started
+
+logger = logging.getLogger(__name__)
+
+# L'état des jobs (clé: transaction_id) est celui de la ligne Payment: un
+# paiement en attente dont le worker a été arrêté est repris par
+# resume_stale_payments.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit_checkout(app, payment, plan_type):
+    """
+    Planifie le traitement d'un paiement en attente sur le pool de workers
+
+    Args:
+        app (Flask): L'application Flask (contexte des workers)
+        payment (Payment): Le paiement en attente, déjà enregistré
+        plan_type (str): Le plan acheté
+    """
+    _get_executor().submit(_run_checkout, app, payment.id, payment.transaction_id, plan_type)
+
+
+def process_checkout(payment_id, plan_type):
+    """
+    Finalise un paiement en attente et crée le challenge actif
+
+    Le passage pending -> completed est une mise à jour conditionnelle:
+    un paiement déjà traité ne crée jamais un second challenge.
+
+    Args:
+        payment_id (int): L'identifiant du paiement
+        plan_type (str): Le plan acheté
+
+    Returns:
+        Challenge | None: Le challenge créé, ou None si le paiement n'était plus en attente
+    """
+    # Simulation du délai de la passerelle de paiement (hors requête HTTP)
+    time.sleep(Config.PAYMENT_PROCESSING_DELAY)
+
+    plan_data = Config.PLANS[plan_type]
+    updated = Payment.query.filter_by(id=payment_id, status='pending').update(
+        {'status': 'completed'},
+        synchronize_session=False
+    )
+    if not updated:
+        db.session.rollback()
+        return None
+
+    payment = db.session.get(Payment, payment_id)
+
+    challenge = Challenge(
+        user_id=payment.user_id,
+        plan_type=plan_type,
+        initial_balance=plan_data['balance'],
+        current_balance=plan_data['balance'],
+        daily_start_balance=plan_data['balance'],
+        status='active',
+        profit_target=Config.PROFIT_TARGET_PERCENT,
+        max_daily_loss_percent=Config.MAX_DAILY_LOSS_PERCENT,
+        max_total_loss_percent=Config.MAX_TOTAL_LOSS_PERCENT,
+        started_at=datetime.utcnow()
+    )
+    db.session.add(challenge)
+    db.session.flush()
+    payment.challenge_id = challenge.id
+    record_challenge_started(challenge)
+    invalidate_active_challenge(payment.user_id)
+    db.session.commit()
+    return challenge
+
+
+def get_checkout_status(transaction_id, user_id):
+    """
+    Retourne l'état d'un job de paiement de l'utilisateur
+
+    Args:
+        transaction_id (str): L'identifiant du job
+        user_id (int): L'utilisateur propriétaire du paiement
+
+    Returns:
+        dict | None: status, payment et challenge (une fois créé), ou None si inconnu
+    """
+    payment = Payment.query.filter_by(transaction_id=transaction_id, user_id=user_id).first()
+    if payment is None:
+        return None
+
+    result = {
+        'job_id': transaction_id,
+        'status': payment.status,
+        'payment': payment.to_dict(),
+        'challenge': None
+    }
+    if payment.status == 'failed':
+        result['error'] = 'Le paiement a échoué'
+
+    if payment.status == 'completed' and payment.challenge_id is not None:
+        challenge = db.session.get(Challenge, payment.challenge_id)
+        result['challenge'] = challenge.to_dict() if challenge else None
+
+    return result
+
+
+def resume_stale_payments(stale_after=None):
+    """
+    Reprend les paiements en attente depuis plus de stale_after secondes
+
+    Un paiement reste en attente si le worker qui le traitait a été arrêté
+    (redémarrage, crash). Il est retraité s'il porte son plan; sinon, ou si
+    le traitement échoue, il passe en échec. process_checkout ne crée jamais
+    un second challenge pour un paiement déjà traité.
+
+    Args:
+        stale_after (int): Âge minimal en secondes (défaut CHECKOUT_STALE_AFTER)
+
+    Returns:
+        dict: Nombre de paiements repris et mis en échec
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after or Config.CHECKOUT_STALE_AFTER)
+    stale = db.session.query(Payment.id, Payment.transaction_id, Payment.plan_type).filter(
+        Payment.status == 'pending',
+        Payment.created_at < cutoff
+    ).order_by(Payment.id).all()
+
+    resumed = failed = 0
+    for payment_id, transaction_id, plan_type in stale:
+        if plan_type in Config.PLANS:
+            try:
+                if process_checkout(payment_id, plan_type) is not None:
+                    resumed += 1
+                continue
+            except Exception:
+                logger.exception("Reprise du paiement %s impossible", transaction_id)
+                db.session.rollback()
+        else:
+            logger.warning("Paiement %s en attente sans plan, mis en échec", transaction_id)
+        failed += _fail_payment(payment_id)
+
+    if resumed or failed:
+        logger.info("Paiements en attente: %s repris, %s en échec", resumed, failed)
+    return {'resumed': resumed, 'failed': failed}
+
+
+def _fail_payment(payment_id):
+    updated = Payment.query.filter_by(id=payment_id, status='pending').update(
+        {'status': 'failed'},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return updated
+
+
+def _run_checkout(app, payment_id, transaction_id, plan_type):
+    with app.app_context():
+        try:
+            process_checkout(payment_id, plan_type)
+        except Exception:
+            logger.exception("Traitement du paiement %s impossible", transaction_id)
+            db.session.rollback()
+            _fail_payment(payment_id)
+        finally:
+            db.session.remove()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.PAYMENT_WORKERS),
+                thread_name_prefix='checkout'
+            )
+        return _executor
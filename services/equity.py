@@ -0,0 +1,420 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import case, exists, func
+
+from models import db, Challenge, Position
+from services.market_data import QUOTE_CACHE, SUPPORTED_SYMBOLS, get_live_prices
+from services.morocco_scraper import MOROCCO_CACHE, scrape_casablanca_many
+from services.positions import QUANTITY_EPSILON
+
+logger = logging.getLogger(__name__)
+
+# Dernière valorisation calculée par ce processus (leader du scheduler),
+# remplacée en bloc à chaque passage
+_snapshot_lock = threading.Lock()
+_latest = None
+
+# Chargement en arrière-plan des cotations absentes lors d'une lecture
+_background_load_lock = threading.Lock()
+
+# Métriques des passages de valorisation
+_metrics_lock = threading.Lock()
+_metrics = {
+    'runs': 0,
+    'errors': 0,
+    'last_run_at': None,
+    'last_duration_ms': None,
+    'last_challenges': 0,
+    'last_positions': 0,
+    'last_symbols': 0,
+    'last_unpriced_symbols': []
+}
+
+
+def peek_price(symbol):
+    """
+    Lit le dernier prix en cache d'un symbole, sans déclencher de chargement
+
+    Args:
+        symbol (str): Le symbole (cotation Yahoo ou ticker de Casablanca)
+
+    Returns:
+        float | None: Le prix, ou None s'il n'est pas en cache
+    """
+    for cache in (QUOTE_CACHE, MOROCCO_CACHE):
+        quote = cache.get(symbol)
+        if quote and 'error' not in quote and quote.get('price') is not None:
+            return float(quote['price'])
+    return None
+
+
+def get_cached_prices(symbols):
+    """
+    Lit les prix en cache de plusieurs symboles (sans chargement)
+
+    Returns:
+        dict: symbole -> prix, pour les seuls symboles en cache
+    """
+    prices = {}
+    for symbol in symbols:
+        price = peek_price(symbol)
+        if price is not None:
+            prices[symbol] = price
+    return prices
+
+
+def load_prices(symbols):
+    """
+    Met en cache les cotations de symboles absents du cache: un
+    téléchargement groupé Yahoo, puis le scraper pour la Bourse de
+    Casablanca
+
+    Args:
+        symbols (list): Symboles sans prix en cache
+    """
+    yahoo = [symbol for symbol in symbols if symbol in SUPPORTED_SYMBOLS]
+    casablanca = [symbol for symbol in symbols if symbol not in SUPPORTED_SYMBOLS]
+    if yahoo:
+        get_live_prices(yahoo)
+    if casablanca:
+        scrape_casablanca_many(casablanca)
+
+
+def get_open_symbols():
+    """
+    Retourne les symboles détenus par au moins un challenge actif
+    """
+    rows = db.session.query(Position.symbol).join(Challenge, Challenge.id == Position.challenge_id).filter(
+        Challenge.status == 'active',
+        Position.quantity > QUANTITY_EPSILON
+    ).distinct()
+    return [symbol for symbol, in rows]
+
+
+def challenge_equity(challenge, prices=None):
+    """
+    Valorise un seul challenge: solde + positions au dernier prix connu
+
+    Une position sans prix (ni imposé ni en cache) est valorisée à son prix
+    moyen d'achat et son symbole est retourné: l'equity n'est alors qu'une
+    estimation, sur laquelle les règles ne doivent pas être appliquées.
+
+    Args:
+        challenge (Challenge): Le challenge (current_balance à jour)
+        prices (dict): Prix imposés par symbole (ex: prix d'exécution d'un
+            trade), prioritaires sur le cache
+
+    Returns:
+        tuple: (equity du challenge, liste triée des symboles sans prix)
+    """
+    prices = prices or {}
+    equity = challenge.current_balance
+    unpriced = []
+    positions = db.session.query(Position.symbol, Position.quantity, Position.avg_cost).filter(
+        Position.challenge_id == challenge.id,
+        Position.quantity > QUANTITY_EPSILON
+    )
+    for symbol, quantity, avg_cost in positions:
+        price = prices.get(symbol)
+        if price is None:
+            price = peek_price(symbol)
+        if price is None:
+            unpriced.append(symbol)
+            price = avg_cost
+        equity += quantity * price
+    return equity, sorted(unpriced)
+
+
+def equity_expression(prices):
+    """
+    Expression SQL de l'equity de chaque ligne challenge
+
+    Les prix sont passés en paramètres (CASE sur le symbole); une position
+    sans prix est valorisée à son prix moyen d'achat, comme dans
+    compute_equity.
+
+    Args:
+        prices (dict): symbole -> prix
+
+    Returns:
+        ColumnElement: current_balance + valeur des positions ouvertes
+    """
+    mark = case(prices, value=Position.symbol, else_=Position.avg_cost) if prices else Position.avg_cost
+    market_value = db.session.query(
+        func.coalesce(func.sum(Position.quantity * mark), 0.0)
+    ).filter(
+        Position.challenge_id == Challenge.id
+    ).correlate(Challenge).scalar_subquery()
+    return Challenge.current_balance + market_value
+
+
+def holds_any(symbols):
+    """
+    Condition SQL sur chaque ligne challenge: une position ouverte sur l'un des symboles
+
+    Sert à écarter des passages ensemblistes les challenges détenant un
+    symbole sans cotation, plutôt que de les valoriser au prix d'achat.
+
+    Args:
+        symbols (list): Symboles recherchés
+
+    Returns:
+        ColumnElement: EXISTS corrélé sur les positions du challenge
+    """
+    return exists().where(
+        Position.challenge_id == Challenge.id,
+        Position.symbol.in_(symbols),
+        Position.quantity > QUANTITY_EPSILON
+    )
+
+
+def compute_equity(balances, daily_start_balances, initial_balances, owners, quantities, avg_costs, prices):
+    """
+    Valorise des portefeuilles au prix du marché, en tableaux
+
+    Les positions sont décrites par des tableaux parallèles; owners donne
+    l'indice du challenge de chaque position. Une position sans prix (NaN)
+    est valorisée à son prix moyen d'achat. Les pertes sont en pourcentage
+    positif (négatif en cas de gain), comme dans check_challenge_rules.
+
+    Args:
+        balances (ndarray): Solde en espèces par challenge
+        daily_start_balances (ndarray): Référence de la perte journalière par challenge
+        initial_balances (ndarray): Capital initial par challenge
+        owners (ndarray): Indice du challenge de chaque position
+        quantities (ndarray): Quantité détenue par position
+        avg_costs (ndarray): Prix moyen d'achat par position
+        prices (ndarray): Dernier prix par position (NaN si inconnu)
+
+    Returns:
+        dict: Tableaux par challenge: market_value, unrealized_pnl, equity,
+            profit_percent, daily_drawdown_percent, total_drawdown_percent
+    """
+    count = balances.size
+    marks = np.where(np.isnan(prices), avg_costs, prices)
+    market_value = np.bincount(owners, weights=quantities * marks, minlength=count)
+    unrealized_pnl = np.bincount(owners, weights=quantities * (marks - avg_costs), minlength=count)
+    equity = balances + market_value
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit_percent = np.where(initial_balances > 0, (equity - initial_balances) / initial_balances * 100, 0.0)
+        total_drawdown = np.where(initial_balances > 0, (initial_balances - equity) / initial_balances * 100, 0.0)
+        daily_drawdown = np.where(daily_start_balances > 0, (daily_start_balances - equity) / daily_start_balances * 100, 0.0)
+
+    return {
+        'market_value': market_value,
+        'unrealized_pnl': unrealized_pnl,
+        'equity': equity,
+        'profit_percent': profit_percent,
+        'daily_drawdown_percent': daily_drawdown,
+        'total_drawdown_percent': total_drawdown
+    }
+
+
+def load_book():
+    """
+    Charge en tableaux les challenges actifs et leurs positions ouvertes
+
+    Returns:
+        dict: challenge_ids (trié), balances, daily_start_balances,
+            initial_balances, seuils des règles, owners, symbols,
+            quantities, avg_costs
+    """
+    challenges = db.session.query(
+        Challenge.id,
+        Challenge.current_balance,
+        Challenge.daily_start_balance,
+        Challenge.initial_balance,
+        Challenge.profit_target,
+        Challenge.max_total_loss_percent,
+        Challenge.max_daily_loss_percent
+    ).filter(Challenge.status == 'active').order_by(Challenge.id).all()
+
+    positions = db.session.query(
+        Position.challenge_id,
+        Position.symbol,
+        Position.quantity,
+        Position.avg_cost
+    ).join(Challenge, Challenge.id == Position.challenge_id).filter(
+        Challenge.status == 'active',
+        Position.quantity > QUANTITY_EPSILON
+    ).all()
+
+    challenge_columns = list(zip(*challenges)) or [()] * 7
+    position_columns = list(zip(*positions)) or [(), (), (), ()]
+    challenge_ids = np.array(challenge_columns[0], dtype=np.int64)
+
+    return {
+        'challenge_ids': challenge_ids,
+        'balances': np.array(challenge_columns[1], dtype=float),
+        'daily_start_balances': np.array(challenge_columns[2], dtype=float),
+        'initial_balances': np.array(challenge_columns[3], dtype=float),
+        'profit_targets': np.array(challenge_columns[4], dtype=float),
+        'max_total_loss_percents': np.array(challenge_columns[5], dtype=float),
+        'max_daily_loss_percents': np.array(challenge_columns[6], dtype=float),
+        # Les ids sont triés: indice du challenge par recherche dichotomique
+        'owners': np.searchsorted(challenge_ids, np.array(position_columns[0], dtype=np.int64)),
+        'symbols': np.array(position_columns[1], dtype=object),
+        'quantities': np.array(position_columns[2], dtype=float),
+        'avg_costs': np.array(position_columns[3], dtype=float)
+    }
+
+
+def mark_to_market():
+    """
+    Valorise tous les challenges actifs aux dernières cotations en cache
+
+    Un seul prix est lu par symbole distinct, puis toutes les positions sont
+    valorisées en un passage vectorisé. Le résultat remplace la dernière
+    valorisation du processus (lue par get_challenge_equity).
+
+    Returns:
+        dict: challenge_ids, les tableaux de compute_equity et les entrées
+            des règles par challenge, computed_at, unpriced_symbols
+            (valorisés au prix moyen d'achat) et unpriced (booléen par
+            challenge: détient l'un de ces symboles)
+    """
+    global _latest
+    started = time.perf_counter()
+    try:
+        book = load_book()
+
+        symbols, inverse = np.unique(book['symbols'].astype(str), return_inverse=True)
+        cached = get_cached_prices(symbols.tolist())
+        symbol_prices = np.array([cached.get(symbol, np.nan) for symbol in symbols], dtype=float)
+        unpriced = [str(symbol) for symbol, price in zip(symbols, symbol_prices) if np.isnan(price)]
+        position_prices = symbol_prices[inverse]
+
+        result = compute_equity(
+            book['balances'],
+            book['daily_start_balances'],
+            book['initial_balances'],
+            book['owners'],
+            book['quantities'],
+            book['avg_costs'],
+            position_prices
+        )
+        result['unpriced'] = np.bincount(
+            book['owners'], weights=np.isnan(position_prices), minlength=book['challenge_ids'].size
+        ) > 0
+    except Exception:
+        with _metrics_lock:
+            _metrics['errors'] += 1
+        raise
+
+    snapshot = dict(result, unpriced_symbols=unpriced, computed_at=datetime.utcnow())
+    # Soldes valorisés et entrées des règles (evaluate_rules_arrays)
+    for field in ('challenge_ids', 'balances', 'initial_balances', 'daily_start_balances', 'profit_targets',
+                  'max_total_loss_percents', 'max_daily_loss_percents'):
+        snapshot[field] = book[field]
+    with _snapshot_lock:
+        _latest = snapshot
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    with _metrics_lock:
+        _metrics.update({
+            'runs': _metrics['runs'] + 1,
+            'last_run_at': snapshot['computed_at'].isoformat(),
+            'last_duration_ms': round(duration_ms, 2),
+            'last_challenges': int(book['challenge_ids'].size),
+            'last_positions': int(book['quantities'].size),
+            'last_symbols': int(symbols.size),
+            'last_unpriced_symbols': unpriced
+        })
+    logger.debug(
+        "Valorisation: %s challenges, %s positions en %.1f ms",
+        book['challenge_ids'].size, book['quantities'].size, duration_ms
+    )
+    return snapshot
+
+
+EQUITY_FIELDS = ('equity', 'market_value', 'unrealized_pnl', 'profit_percent',
+                 'daily_drawdown_percent', 'total_drawdown_percent')
+
+
+def get_challenge_equity(challenge, positions):
+    """
+    Retourne la valorisation d'un challenge
+
+    Dans le processus leader du scheduler, la valorisation du dernier
+    passage est réutilisée tant que les soldes n'ont pas changé depuis
+    (aucun trade ni réinitialisation journalière) et que toutes ses
+    positions étaient cotées. Sinon, et dans les autres workers, le
+    challenge est valorisé à la lecture à partir de son instantané, aux
+    seuls prix en cache (partagés entre workers avec CACHE_BACKEND=redis):
+    la requête n'attend jamais la source. Une position sans prix en cache
+    est valorisée à son prix moyen d'achat (son symbole figure dans
+    unpriced_symbols et stale vaut True) et sa cotation est chargée en
+    arrière-plan pour les lectures suivantes.
+
+    Args:
+        challenge (dict): Le challenge (Challenge.to_dict())
+        positions (list): Ses positions ouvertes (Position.to_dict())
+
+    Returns:
+        dict: equity, market_value, unrealized_pnl, profit_percent,
+            daily_drawdown_percent, total_drawdown_percent, computed_at,
+            unpriced_symbols et stale
+    """
+    with _snapshot_lock:
+        snapshot = _latest
+    if snapshot is not None:
+        ids = snapshot['challenge_ids']
+        index = int(np.searchsorted(ids, challenge['id']))
+        if index < ids.size and ids[index] == challenge['id'] \
+                and not snapshot['unpriced'][index] \
+                and snapshot['balances'][index] == challenge['current_balance'] \
+                and snapshot['daily_start_balances'][index] == challenge['daily_start_balance']:
+            result = {field: round(float(snapshot[field][index]), 2) for field in EQUITY_FIELDS}
+            result.update(computed_at=snapshot['computed_at'].isoformat(), unpriced_symbols=[], stale=False)
+            return result
+
+    symbols = [position['symbol'] for position in positions]
+    cached = get_cached_prices(set(symbols))
+    missing = sorted(set(symbols) - set(cached))
+    if missing:
+        _load_prices_in_background(missing)
+    values = compute_equity(
+        np.array([challenge['current_balance']], dtype=float),
+        np.array([challenge['daily_start_balance']], dtype=float),
+        np.array([challenge['initial_balance']], dtype=float),
+        np.zeros(len(positions), dtype=np.int64),
+        np.array([position['quantity'] for position in positions], dtype=float),
+        np.array([position['avg_cost'] for position in positions], dtype=float),
+        np.array([cached.get(symbol, np.nan) for symbol in symbols], dtype=float)
+    )
+    result = {field: round(float(values[field][0]), 2) for field in EQUITY_FIELDS}
+    result.update(computed_at=datetime.utcnow().isoformat(), unpriced_symbols=missing, stale=bool(missing))
+    return result
+
+
+def _load_prices_in_background(symbols):
+    """
+    Charge les cotations absentes dans un thread, sans attendre le résultat;
+    un seul chargement à la fois par processus (les lectures suivantes
+    pendant un chargement ou une panne de la source n'en lancent pas d'autre)
+    """
+    if not _background_load_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            load_prices(symbols)
+        except Exception as e:
+            logger.warning("Cotations indisponibles pour %s: %s", ', '.join(symbols), e)
+        finally:
+            _background_load_lock.release()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_equity_metrics():
+    """
+    Retourne les métriques des passages de valorisation
+    """
+    with _metrics_lock:
+        return dict(_metrics)
@@ -0,0 +1,364 @@
+import hashlib
+import json
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import case, event, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import Config
+from models import db, Challenge, Trade, LeaderboardEntry
+from services.cache import create_cache
+
+logger = logging.getLogger(__name__)
+
+# Réponses du classement par mois (clé: (année, mois)), identiques pour
+# tous les visiteurs entre deux trades
+LEADERBOARD_CACHE = create_cache('leaderboard', Config.LEADERBOARD_CACHE_TTL, 64)
+
+# Clé de session: mois à invalider une fois la transaction validée
+_PENDING_KEY = 'leaderboard_invalidate'
+_ALL_PERIODS = 'all'
+
+# Taille du classement publié
+LEADERBOARD_SIZE = 10
+
+# Écart toléré entre le classement maintenu et l'agrégat recalculé
+# (erreurs d'arrondi des sommes flottantes incrémentales)
+CONSISTENCY_TOLERANCE = 1e-6
+
+
+def month_range(year, month):
+    """
+    Retourne la plage semi-ouverte [début du mois, début du mois suivant)
+
+    Args:
+        year (int): L'année
+        month (int): Le mois (1-12)
+
+    Returns:
+        tuple: (month_start, next_month_start) en datetime
+    """
+    month_start = datetime(year, month, 1)
+    if month == 12:
+        next_month_start = datetime(year + 1, 1, 1)
+    else:
+        next_month_start = datetime(year, month + 1, 1)
+    return month_start, next_month_start
+
+
+def period_of(started_at):
+    """
+    Retourne le mois de classement (premier jour du mois) d'un challenge
+    """
+    return date(started_at.year, started_at.month, 1)
+
+
+def profit_percent(initial_balance, current_balance):
+    return (current_balance - initial_balance) / initial_balance * 100.0 if initial_balance else 0.0
+
+
+def get_top_entries(year, month, limit=10):
+    """
+    Lit le top N d'un mois dans le classement maintenu
+
+    Args:
+        year (int): L'année
+        month (int): Le mois (1-12)
+        limit (int): Nombre d'entrées
+
+    Returns:
+        list: LeaderboardEntry triées par profit moyen décroissant
+    """
+    return LeaderboardEntry.query.filter(
+        LeaderboardEntry.period == date(year, month, 1),
+        LeaderboardEntry.challenge_count > 0
+    ).order_by(
+        LeaderboardEntry.avg_profit_percent.desc(),
+        LeaderboardEntry.user_id.asc()
+    ).limit(limit).all()
+
+
+def get_monthly_leaderboard(year, month):
+    """
+    Retourne le top LEADERBOARD_SIZE d'un mois, depuis le cache si possible
+
+    Args:
+        year (int): L'année
+        month (int): Le mois (1-12)
+
+    Returns:
+        dict: 'entries' (liste sérialisable) et 'etag' (empreinte du contenu)
+    """
+    def load():
+        entries = []
+        for rank, row in enumerate(get_top_entries(year, month, LEADERBOARD_SIZE), start=1):
+            avg_profit_percent = round(float(row.avg_profit_percent or 0), 2)
+            entries.append({
+                'rank': rank,
+                'username': row.user.username,
+                'profit_percent': avg_profit_percent,
+                'avg_profit_percent': avg_profit_percent,
+                'total_trades': int(row.trade_count or 0)
+            })
+        payload = json.dumps(entries, sort_keys=True).encode('utf-8')
+        return {'entries': entries, 'etag': hashlib.sha1(payload).hexdigest()}
+
+    return LEADERBOARD_CACHE.get_or_load((year, month), load)
+
+
+def invalidate_leaderboard(period=None):
+    """
+    Demande l'invalidation du cache du classement d'un mois (ou de tous)
+    à la validation de la transaction courante
+
+    Invalider après le commit évite qu'une requête concurrente remette en
+    cache l'état précédent la transaction; un chargement déjà en cours au
+    moment du commit n'écrit pas son résultat (compteur d'invalidation du
+    cache).
+
+    Args:
+        period (date): Le mois (premier jour), ou None pour tous les mois
+    """
+    db.session.info.setdefault(_PENDING_KEY, set()).add(period or _ALL_PERIODS)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    # Libération d'un savepoint: rien n'est encore validé en base
+    if session.in_nested_transaction():
+        return
+    periods = session.info.pop(_PENDING_KEY, None)
+    if not periods:
+        return
+    if _ALL_PERIODS in periods:
+        LEADERBOARD_CACHE.clear()
+        return
+    for period in periods:
+        LEADERBOARD_CACHE.delete((period.year, period.month))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    # Rollback d'un savepoint: le reste de la transaction peut encore être validé
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_PENDING_KEY, None)
+
+
+def get_leaderboard_cache_stats():
+    """
+    Retourne les compteurs du cache des réponses du classement
+    """
+    return LEADERBOARD_CACHE.stats()
+
+
+def record_challenge_started(challenge):
+    """
+    Ajoute un nouveau challenge au classement de son mois
+
+    La mise à jour fait partie de la transaction courante: elle est validée
+    avec le challenge.
+
+    Args:
+        challenge (Challenge): Le challenge créé (user_id et started_at renseignés)
+    """
+    _apply(
+        period_of(challenge.started_at),
+        challenge.user_id,
+        challenges=1,
+        profit_delta=profit_percent(challenge.initial_balance, challenge.current_balance),
+        trades=0
+    )
+
+
+def record_trade(challenge, previous_balance):
+    """
+    Répercute un trade et la variation de balance du challenge sur le classement
+
+    Args:
+        challenge (Challenge): Le challenge dont la balance vient d'être modifiée
+        previous_balance (float): La balance avant le trade
+    """
+    _apply(
+        period_of(challenge.started_at),
+        challenge.user_id,
+        challenges=0,
+        profit_delta=profit_percent(challenge.initial_balance, challenge.current_balance)
+        - profit_percent(challenge.initial_balance, previous_balance),
+        trades=1
+    )
+
+
+def _apply(period, user_id, challenges, profit_delta, trades):
+    now = datetime.utcnow()
+    invalidate_leaderboard(period)
+    # Incréments atomiques côté base: deux workers peuvent mettre à jour la même ligne
+    count = LeaderboardEntry.challenge_count + challenges
+    total = LeaderboardEntry.profit_percent_sum + profit_delta
+    values = {
+        LeaderboardEntry.challenge_count: count,
+        LeaderboardEntry.profit_percent_sum: total,
+        LeaderboardEntry.avg_profit_percent: case((count > 0, total / count), else_=0.0),
+        LeaderboardEntry.trade_count: LeaderboardEntry.trade_count + trades,
+        LeaderboardEntry.updated_at: now
+    }
+    entry = LeaderboardEntry.query.filter_by(period=period, user_id=user_id)
+
+    if entry.update(values, synchronize_session=False):
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(LeaderboardEntry(
+                period=period,
+                user_id=user_id,
+                challenge_count=challenges,
+                profit_percent_sum=profit_delta,
+                avg_profit_percent=profit_delta / challenges if challenges else 0.0,
+                trade_count=trades,
+                updated_at=now
+            ))
+    except IntegrityError:
+        # Ligne créée entre-temps par une autre transaction
+        entry.update(values, synchronize_session=False)
+
+
+def compute_live(year=None, month=None):
+    """
+    Recalcule le classement depuis les tables challenge et trade
+
+    Les trades sont comptés par challenge avant l'agrégation, de sorte que
+    le profit moyen est une moyenne par challenge (non pondérée par le
+    nombre de trades).
+
+    Args:
+        year (int): L'année (avec month), sinon tous les mois
+        month (int): Le mois (1-12)
+
+    Returns:
+        dict: (period, user_id) -> challenge_count, profit_percent_sum, trade_count
+    """
+    trade_counts = db.session.query(
+        Trade.challenge_id.label('challenge_id'),
+        func.count(Trade.id).label('trade_count')
+    ).group_by(Trade.challenge_id).subquery()
+
+    query = db.session.query(
+        Challenge.user_id,
+        Challenge.started_at,
+        Challenge.initial_balance,
+        Challenge.current_balance,
+        func.coalesce(trade_counts.c.trade_count, 0)
+    ).outerjoin(
+        trade_counts, trade_counts.c.challenge_id == Challenge.id
+    )
+    if year is not None and month is not None:
+        month_start, next_month_start = month_range(year, month)
+        query = query.filter(
+            Challenge.started_at >= month_start,
+            Challenge.started_at < next_month_start
+        )
+
+    aggregates = {}
+    for user_id, started_at, initial_balance, current_balance, trade_count in query.yield_per(10_000):
+        row = aggregates.setdefault(
+            (period_of(started_at), user_id),
+            {'challenge_count': 0, 'profit_percent_sum': 0.0, 'trade_count': 0}
+        )
+        row['challenge_count'] += 1
+        row['profit_percent_sum'] += profit_percent(initial_balance, current_balance)
+        row['trade_count'] += int(trade_count)
+    return aggregates
+
+
+def rebuild(year=None, month=None):
+    """
+    Reconstruit le classement maintenu à partir de l'agrégat recalculé
+
+    Args:
+        year (int): L'année (avec month), sinon tous les mois
+        month (int): Le mois (1-12)
+
+    Returns:
+        int: Nombre d'entrées écrites
+    """
+    aggregates = compute_live(year, month)
+    now = datetime.utcnow()
+
+    entries = LeaderboardEntry.query
+    if year is not None and month is not None:
+        entries = entries.filter(LeaderboardEntry.period == date(year, month, 1))
+    entries.delete(synchronize_session=False)
+
+    db.session.bulk_insert_mappings(LeaderboardEntry, [
+        {
+            'period': period,
+            'user_id': user_id,
+            'challenge_count': row['challenge_count'],
+            'profit_percent_sum': row['profit_percent_sum'],
+            'avg_profit_percent': row['profit_percent_sum'] / row['challenge_count'],
+            'trade_count': row['trade_count'],
+            'updated_at': now
+        }
+        for (period, user_id), row in aggregates.items()
+    ])
+    invalidate_leaderboard(date(year, month, 1) if year is not None and month is not None else None)
+    db.session.commit()
+    return len(aggregates)
+
+
+def check_consistency(year=None, month=None):
+    """
+    Compare le classement maintenu à l'agrégat recalculé
+
+    Args:
+        year (int): L'année (avec month), sinon tous les mois
+        month (int): Le mois (1-12)
+
+    Returns:
+        list: Écarts (period, user_id, champ, valeur stockée, valeur attendue)
+    """
+    expected = compute_live(year, month)
+
+    entries = LeaderboardEntry.query
+    if year is not None and month is not None:
+        entries = entries.filter(LeaderboardEntry.period == date(year, month, 1))
+    stored = {(entry.period, entry.user_id): entry for entry in entries}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        row = expected.get(key, {'challenge_count': 0, 'profit_percent_sum': 0.0, 'trade_count': 0})
+        entry = stored.get(key)
+        for field in ('challenge_count', 'profit_percent_sum', 'trade_count'):
+            actual = getattr(entry, field) if entry is not None else None
+            if actual is None or abs(actual - row[field]) > CONSISTENCY_TOLERANCE:
+                mismatches.append({
+                    'period': key[0].isoformat(),
+                    'user_id': key[1],
+                    'field': field,
+                    'stored': actual,
+                    'expected': row[field]
+                })
+    return mismatches
+
+
+def ensure_built():
+    """
+    Construit le classement s'il est vide alors que des challenges existent
+    (première mise en service sur une base existante)
+
+    Exécuté par le leader du scheduler; une construction concurrente
+    (rebuild_leaderboard.py) fait échouer l'insertion sur la contrainte
+    d'unicité, sans effet sur le classement déjà écrit.
+    """
+    if LeaderboardEntry.query.first() is not None or Challenge.query.first() is None:
+        return
+    try:
+        count = rebuild()
+    except IntegrityError:
+        db.session.rollback()
+        logger.info("Classement mensuel déjà construit par un autre processus")
+        return
+    logger.info("Classement mensuel construit: %s entrées", count)
@@ -1,9 +1,29 @@
+import threading
+from concurrent.futures import Future
+
+import numpy as np
 import yfinance as yf
 from datetime import datetime
+from config import Config
+from services import bar_store
+from services.ai_signals import indicator_series
+from services.cache import create_cache
 
 # Symboles supportés
 SUPPORTED_SYMBOLS = ['AAPL', 'TSLA', 'GOOGL', 'AMZN', 'MSFT', 'BTC-USD', 'ETH-USD']
 
+# Formats de réponse des données historiques
+CHART_LAYOUTS = ('rows', 'columns')
+CHART_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+# Cache des cotations partagé par toutes les requêtes
+QUOTE_CACHE = create_cache('quotes', Config.QUOTE_CACHE_TTL, Config.QUOTE_CACHE_MAX_ENTRIES)
+
+# Téléchargements groupés en cours (clé: symboles triés), partagés par les
+# appels concurrents; hors de QUOTE_CACHE, qui ne contient que des cotations
+_bulk_lock = threading.Lock()
+_bulk_inflight = {}
+
 def get_live_price(symbol):
     """
     Récupère le prix en direct d'un symbole boursier
@@ -14,14 +34,26 @@ def get_live_price(symbol):
     Returns:
         dict: Dictionnaire contenant les informations de prix
     """
+    # Vérifier si le symbole est supporté
+    if symbol not in SUPPORTED_SYMBOLS:
+        return {
+            'error': f'Symbole non supporté. Symboles supportés: {", ".join(SUPPORTED_SYMBOLS)}',
+            'symbol': symbol
+        }
+    
+    # Les erreurs ne sont gardées que brièvement pour retenter rapidement
+    return QUOTE_CACHE.get_or_load(
+        symbol,
+        lambda: _fetch_live_price(symbol),
+        cache_if=lambda result: 'error' not in result,
+        negative_ttl=Config.QUOTE_CACHE_NEGATIVE_TTL
+    )
+
+def _fetch_live_price(symbol):
+    """
+    Interroge Yahoo Finance pour le prix en direct d'un symbole (sans cache)
+    """
     try:
-        # Vérifier si le symbole est supporté
-        if symbol not in SUPPORTED_SYMBOLS:
-            return {
-                'error': f'Symbole non supporté. Symboles supportés: {", ".join(SUPPORTED_SYMBOLS)}',
-                'symbol': symbol
-            }
-        
         # Créer le ticker
         ticker = yf.Ticker(symbol)
         
@@ -55,7 +87,165 @@ def get_live_price(symbol):
             'symbol': symbol
         }
 
-def get_chart_data(symbol, interval='1d', period='1mo'):
+def get_live_prices(symbols):
+    """
+    Récupère les prix en direct de plusieurs symboles en un seul appel
+    
+    Les symboles déjà en cache sont servis directement, les autres sont
+    récupérés ensemble via un unique téléchargement groupé, partagé par les
+    appels concurrents demandant les mêmes symboles. Une cotation en échec
+    est gardée QUOTE_CACHE_NEGATIVE_TTL secondes.
+    
+    Args:
+        symbols (list): Liste de symboles boursiers
+    
+    Returns:
+        dict: Dictionnaire symbole -> données de prix (ou erreur pour ce symbole)
+    """
+    requested = list(dict.fromkeys(symbols))
+    results = {}
+    missing = []
+    
+    for symbol in requested:
+        if symbol not in SUPPORTED_SYMBOLS:
+            results[symbol] = {
+                'error': f'Symbole non supporté. Symboles supportés: {", ".join(SUPPORTED_SYMBOLS)}',
+                'symbol': symbol
+            }
+            continue
+        
+        cached = QUOTE_CACHE.get(symbol)
+        if cached is not None:
+            results[symbol] = cached
+        else:
+            missing.append(symbol)
+    
+    if missing:
+        results.update(_load_live_prices(sorted(missing)))
+    
+    return {symbol: results[symbol] for symbol in requested}
+
+def _load_live_prices(symbols):
+    """
+    Télécharge les cotations de plusieurs symboles et les met en cache une à
+    une, les erreurs pour une durée courte. Un appel concurrent demandant
+    les mêmes symboles attend le téléchargement en cours au lieu d'en
+    lancer un autre.
+    """
+    key = tuple(symbols)
+    with _bulk_lock:
+        future = _bulk_inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _bulk_inflight[key] = future
+    
+    if not leader:
+        return future.result()
+    
+    try:
+        results = _fetch_live_prices(symbols)
+        for symbol, quote in results.items():
+            if 'error' in quote:
+                QUOTE_CACHE.set(symbol, quote, Config.QUOTE_CACHE_NEGATIVE_TTL)
+            else:
+                QUOTE_CACHE.set(symbol, quote)
+        future.set_result(results)
+        return results
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _bulk_lock:
+            del _bulk_inflight[key]
+
+def refresh_live_prices(symbols, ttl=None):
+    """
+    Recharge les cotations de plusieurs symboles et met à jour le cache,
+    sans consulter les entrées existantes (utilisé par le scheduler)
+    
+    Args:
+        symbols (list): Liste de symboles supportés
+        ttl (float): Durée de vie des entrées, sinon celle du cache
+    
+    Returns:
+        dict: Dictionnaire symbole -> données de prix (ou erreur)
+    """
+    results = _fetch_live_prices(symbols)
+    for symbol, quote in results.items():
+        if 'error' not in quote:
+            QUOTE_CACHE.set(symbol, quote, ttl)
+    return results
+
+def _fetch_live_prices(symbols):
+    """
+    Télécharge les dernières barres journalières de plusieurs symboles en une
+    seule requête et en déduit prix courant et variation (sans cache)
+    """
+    try:
+        data = yf.download(
+            symbols,
+            period='5d',
+            interval='1d',
+            progress=False,
+            auto_adjust=False,
+            threads=True
+        )
+    except Exception as e:
+        return {
+            symbol: {
+                'error': f'Erreur lors de la récupération des données: {str(e)}',
+                'symbol': symbol
+            }
+            for symbol in symbols
+        }
+    
+    if data is None or data.empty or 'Close' not in data:
+        return {
+            symbol: {'error': 'Impossible de récupérer les données de prix', 'symbol': symbol}
+            for symbol in symbols
+        }
+    
+    closes = data['Close']
+    # Avec un seul symbole, yfinance retourne une Series
+    if closes.ndim == 1:
+        closes = closes.to_frame(name=symbols[0])
+    
+    timestamp = datetime.utcnow().isoformat()
+    results = {}
+    for symbol in symbols:
+        series = closes[symbol].dropna() if symbol in closes.columns else None
+        if series is None or len(series) < 2:
+            results[symbol] = {
+                'error': 'Impossible de récupérer les données de prix',
+                'symbol': symbol
+            }
+            continue
+        
+        current_price = float(series.iloc[-1])
+        previous_close = float(series.iloc[-2])
+        change_percent = ((current_price - previous_close) / previous_close) * 100
+        
+        results[symbol] = {
+            'symbol': symbol,
+            'price': round(current_price, 2),
+            'change_percent': round(change_percent, 2),
+            'timestamp': timestamp,
+            'currency': 'USD'
+        }
+    
+    return results
+
+def get_quote_cache_stats():
+    """
+    Retourne les compteurs du cache des cotations
+    
+    Returns:
+        dict: hits, misses, loads, evictions, taille...
+    """
+    return QUOTE_CACHE.stats()
+
+def get_chart_data(symbol, interval='1d', period='1mo', layout='rows', indicators=False):
     """
     Récupère les données historiques d'un symbole boursier
     
@@ -63,9 +253,11 @@ def get_chart_data(symbol, interval='1d', period='1mo'):
         symbol (str): Le symbole boursier
         interval (str): L'intervalle de temps ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h', '1d', '5d', '1wk', '1mo', '3mo')
         period (str): La période de temps ('1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max')
+        layout (str): 'rows' (une entrée par barre) ou 'columns' (une liste par champ)
+        indicators (bool): Ajoute rsi, ma20 et ma50 à chaque barre
     
     Returns:
-        list: Liste de dictionnaires contenant les données de prix
+        list | dict: Données de prix au format demandé
     """
     try:
         # Vérifier si le symbole est supporté
@@ -75,11 +267,8 @@ def get_chart_data(symbol, interval='1d', period='1mo'):
                 'symbol': symbol
             }
         
-        # Créer le ticker
-        ticker = yf.Ticker(symbol)
-        
-        # Récupérer l'historique
-        hist = ticker.history(period=period, interval=interval)
+        # Récupérer l'historique depuis le store local (complété si nécessaire)
+        hist = bar_store.get_history(symbol, interval, period)
         
         if hist.empty:
             return {
@@ -88,21 +277,114 @@ def get_chart_data(symbol, interval='1d', period='1mo'):
             }
         
         # Formater les données
-        chart_data = []
-        for index, row in hist.iterrows():
-            chart_data.append({
-                'timestamp': index.isoformat(),
-                'open': float(row['Open']),
-                'high': float(row['High']),
-                'low': float(row['Low']),
-                'close': float(row['Close']),
-                'volume': int(row['Volume'])
-            })
-        
-        return chart_data
+        return serialize_history(hist, layout, chart_indicators(symbol, interval, hist) if indicators else None)
         
     except Exception as e:
         return {
             'error': f'Erreur lors de la récupération des données historiques: {str(e)}',
             'symbol': symbol
-        }
\ No newline at end of file
+        }
+
+def chart_indicators(symbol, interval, hist):
+    """
+    Séries RSI / MA20 / MA50 des barres d'un historique du store
+    
+    Calculées (indicator_series) sur tout l'historique stocké puis
+    restreintes aux barres de hist: les premières barres affichées ont leur
+    valeur réelle, pas celle d'une phase de démarrage. Les barres sans
+    clôture valent None.
+    
+    Args:
+        symbol (str): Le symbole boursier
+        interval (str): L'intervalle des barres
+        hist (DataFrame): Historique retourné par bar_store.get_history
+    
+    Returns:
+        dict: Nom de l'indicateur -> liste alignée sur les barres de hist
+    """
+    timestamps, closes = bar_store.load_closes(symbol, interval)
+    index = hist.index.tz_convert(None) if hist.index.tz is not None else hist.index
+    bounds = index[[0, -1]].values.astype('datetime64[s]').astype(np.int64)
+    first = int(np.searchsorted(timestamps, bounds[0]))
+    last = int(np.searchsorted(timestamps, bounds[1], side='right'))
+    
+    # Store réécrit entre les deux lectures: séries calculées sur hist seul
+    if last - first != len(hist):
+        closes, first, last = hist['Close'].to_numpy(dtype=float), 0, len(hist)
+    
+    valid = ~np.isnan(closes)
+    result = {}
+    for name, values in indicator_series(closes[valid]).items():
+        column = np.full(closes.size, np.nan)
+        column[valid] = values
+        result[name] = [value if value == value else None for value in column[first:last].tolist()]
+    return result
+
+def serialize_history(hist, layout='rows', indicators=None):
+    """
+    Convertit un historique OHLCV (DataFrame yfinance) en structures JSON
+    
+    Chaque colonne est convertie en une seule passe NumPy -> list, sans
+    parcourir le DataFrame ligne par ligne.
+    
+    Args:
+        hist (DataFrame): Historique avec les colonnes Open, High, Low, Close, Volume
+        layout (str): 'rows' ou 'columns'
+        indicators (dict): Colonnes supplémentaires alignées sur les barres (chart_indicators)
+    
+    Returns:
+        list | dict: Liste de barres ou dictionnaire champ -> liste de valeurs
+    """
+    columns = {
+        'timestamp': _isoformat_index(hist.index),
+        'open': hist['Open'].to_numpy(dtype=float).tolist(),
+        'high': hist['High'].to_numpy(dtype=float).tolist(),
+        'low': hist['Low'].to_numpy(dtype=float).tolist(),
+        'close': hist['Close'].to_numpy(dtype=float).tolist(),
+        'volume': hist['Volume'].fillna(0).to_numpy(dtype=np.int64).tolist()
+    }
+    
+    fields = CHART_FIELDS
+    if indicators:
+        columns.update(indicators)
+        fields = CHART_FIELDS + tuple(indicators)
+    
+    if layout == 'columns':
+        return columns
+    
+    return [
+        dict(zip(fields, values))
+        for values in zip(*(columns[field] for field in fields))
+    ]
+
+def _isoformat_index(index):
+    """
+    Équivalent vectorisé de [ts.isoformat() for ts in index] pour un DatetimeIndex
+    """
+    if index.tz is None:
+        local = index.values.astype('datetime64[ns]')
+        offsets = None
+    else:
+        local = index.tz_localize(None).values.astype('datetime64[ns]')
+        utc = index.tz_convert(None).values.astype('datetime64[ns]')
+        offsets = (local - utc).astype('timedelta64[s]').astype(np.int64)
+    
+    # Les fractions de seconde sont rares: on garde alors le chemin générique
+    if (local.astype(np.int64) % 10**9).any():
+        return [ts.isoformat() for ts in index]
+    
+    stamps = np.datetime_as_string(local, unit='s')
+    if offsets is None:
+        return stamps.tolist()
+    
+    unique_offsets, inverse = np.unique(offsets, return_inverse=True)
+    suffixes = np.array([_format_utc_offset(int(offset)) for offset in unique_offsets])
+    return np.char.add(stamps, suffixes[inverse]).tolist()
+
+def _format_utc_offset(seconds):
+    """
+    Formate un décalage UTC en secondes au format ISO 8601 (+HH:MM)
+    """
+    sign = '+' if seconds >= 0 else '-'
+    hours, minutes = divmod(abs(seconds) // 60, 60)
+    return f'{sign}{hours:02d}:{minutes:02d}'
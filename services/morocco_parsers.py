@@ -0,0 +1,120 @@
+import logging
+from functools import lru_cache
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from config import Config
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:  # lxml est optionnel
+    HAS_LXML = False
+
+logger = logging.getLogger(__name__)
+
+# Backends de parsing disponibles (MOROCCO_PARSER):
+# - 'html.parser': page complète avec le parser pur Python de la stdlib
+# - 'lxml': page complète avec le parser compilé lxml
+# - 'strainer': seuls les éléments utiles sont construits (SoupStrainer),
+#   avec lxml s'il est installé, sinon html.parser
+PARSER_BACKENDS = ('html.parser', 'lxml', 'strainer')
+
+# Classes CSS des éléments lus sur une page de cotation
+QUOTE_CLASSES = ['price', 'change-percent', 'company-name']
+
+_QUOTE_STRAINER = SoupStrainer(attrs={'class': QUOTE_CLASSES})
+_SNAPSHOT_STRAINER = SoupStrainer('tr', attrs={'data-ticker': True})
+
+
+def resolve_backend(name=None):
+    """
+    Retourne le backend effectif pour un nom configuré
+
+    Un backend inconnu, ou 'lxml' sans le package installé, retombe sur
+    'html.parser'.
+
+    Args:
+        name (str): Nom du backend (défaut: Config.MOROCCO_PARSER)
+
+    Returns:
+        str: Le backend utilisable
+    """
+    return _resolve(name or Config.MOROCCO_PARSER)
+
+
+@lru_cache(maxsize=None)
+def _resolve(name):
+    # Mis en cache pour n'avertir qu'une fois par nom configuré
+    if name not in PARSER_BACKENDS:
+        logger.warning("Parser HTML inconnu: %s, utilisation de html.parser", name)
+        return 'html.parser'
+    if name == 'lxml' and not HAS_LXML:
+        logger.warning("Package lxml absent, utilisation de html.parser")
+        return 'html.parser'
+    return name
+
+
+def parse_quote_page(content, backend=None):
+    """
+    Extrait le prix, la variation et le nom de société d'une page de cotation
+
+    Args:
+        content (bytes | str): Le HTML de la page
+        backend (str): Backend de parsing (défaut: Config.MOROCCO_PARSER)
+
+    Returns:
+        dict | None: Textes bruts price, change, company (None si absent),
+            ou None si le prix ou la variation sont introuvables
+    """
+    soup = _make_soup(content, backend, _QUOTE_STRAINER)
+
+    price_element = soup.find('span', class_='price')
+    change_element = soup.find('span', class_='change-percent')
+    company_element = soup.find('h1', class_='company-name')
+
+    if not price_element or not change_element:
+        return None
+
+    return {
+        'price': price_element.text,
+        'change': change_element.text,
+        'company': company_element.text if company_element else None
+    }
+
+
+def parse_snapshot_page(content, backend=None):
+    """
+    Extrait les lignes du tableau de la page listant tout le marché
+
+    Args:
+        content (bytes | str): Le HTML de la page
+        backend (str): Backend de parsing (défaut: Config.MOROCCO_PARSER)
+
+    Returns:
+        list: Dictionnaires ticker, price, change, company (textes bruts)
+    """
+    soup = _make_soup(content, backend, _SNAPSHOT_STRAINER)
+
+    rows = []
+    for row in soup.find_all('tr', attrs={'data-ticker': True}):
+        price_element = row.find(class_='price')
+        change_element = row.find(class_='change-percent')
+        company_element = row.find(class_='company-name')
+        if not price_element or not change_element:
+            continue
+        rows.append({
+            'ticker': row['data-ticker'],
+            'price': price_element.text,
+            'change': change_element.text,
+            'company': company_element.text if company_element else None
+        })
+    return rows
+
+
+def _make_soup(content, backend, strainer):
+    backend = resolve_backend(backend)
+    if backend == 'strainer':
+        features = 'lxml' if HAS_LXML else 'html.parser'
+        return BeautifulSoup(content, features, parse_only=strainer)
+    return BeautifulSoup(content, backend)
@@ -1,7 +1,16 @@
+import logging
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+from services.cache import MemoryBackend, create_cache
+from services.morocco_parsers import parse_quote_page, parse_snapshot_page
+
+logger = logging.getLogger(__name__)
 
 # Données mockées pour la démo
 MOCK_DATA = {
@@ -32,29 +41,93 @@ MOCK_DATA = {
     }
 }
 
-# Cache global pour stocker les résultats
-CACHE = {}
-CACHE_DURATION = 60  # 60 secondes
+# Cache des cotations (partagé entre workers si CACHE_BACKEND=redis).
+# Les échecs sont mis en cache moins longtemps et une cotation expirée reste
+# servie pendant son rechargement en arrière-plan.
+CACHE_DURATION = Config.MOROCCO_CACHE_TTL
+MOROCCO_CACHE = create_cache(
+    'morocco',
+    CACHE_DURATION,
+    Config.MOROCCO_CACHE_MAX_ENTRIES,
+    stale_ttl=Config.MOROCCO_CACHE_STALE_TTL
+)
+
+# Session HTTP partagée (keep-alive, pool de connexions, retries sur 5xx)
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+_session = None
+_session_lock = threading.Lock()
+
+# Pool de threads pour le scraping de plusieurs tickers
+_executor = None
+
+# Validateurs HTTP (ETag / Last-Modified) et dernier résultat parsé par URL
+_validators = MemoryBackend(max_entries=Config.MOROCCO_CACHE_MAX_ENTRIES)
+
+# Métriques des requêtes HTTP du scraper
+_metrics_lock = threading.Lock()
+_metrics = {
+    'requests': 0,
+    'errors': 0,
+    'not_modified': 0,
+    'total_latency': 0.0,
+    'max_latency': 0.0,
+    'last_latency': 0.0,
+    'status_codes': {}
+}
+
+def get_session():
+    """
+    Retourne la session HTTP partagée du scraper, créée au premier appel
+    
+    Returns:
+        requests.Session: Session avec pool de connexions et retries
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=Config.MOROCCO_HTTP_RETRIES,
+                backoff_factor=Config.MOROCCO_HTTP_BACKOFF,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(['GET']),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=Config.MOROCCO_HTTP_POOL_SIZE,
+                pool_maxsize=Config.MOROCCO_HTTP_POOL_SIZE,
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'User-Agent': USER_AGENT})
+            _session = session
+        return _session
 
-def scrape_casablanca_stock(ticker):
+def scrape_casablanca_stock(ticker, force_refresh=False):
     """
     Scrape les données de la Bourse de Casablanca pour un ticker spécifique
     
     Args:
         ticker (str): Le ticker boursier (ex: 'IAM', 'ATW', 'BCP')
+        force_refresh (bool): Ignore le cache et relance le scraping
     
     Returns:
         dict: Dictionnaire contenant les informations boursières
     """
     ticker = ticker.upper()
-    current_time = time.time()
-    
-    # Vérifier le cache d'abord
-    if ticker in CACHE:
-        cached_data, timestamp = CACHE[ticker]
-        if current_time - timestamp < CACHE_DURATION:
-            return cached_data
-    
+    load = MOROCCO_CACHE.refresh if force_refresh else MOROCCO_CACHE.get_or_load
+    return load(
+        ticker,
+        lambda: _scrape_casablanca_stock(ticker),
+        cache_if=lambda result: 'error' not in result,
+        negative_ttl=Config.MOROCCO_CACHE_NEGATIVE_TTL
+    )
+
+def _scrape_casablanca_stock(ticker):
+    """
+    Scrape un ticker sans passer par le cache
+    """
     try:
         # Option 1: Données mockées (pour démo)
         if ticker in MOCK_DATA:
@@ -68,33 +141,25 @@ def scrape_casablanca_stock(ticker):
                 'company_name': MOCK_DATA[ticker]['company_name']
             }
             
-            # Mettre en cache
-            CACHE[ticker] = (result, current_time)
             return result
         
         # Option 2: Scraper réel (framework prêt)
         # URL de base pour la Bourse de Casablanca
-        base_url = "https://www.boursenews.ma/cotation"
-        url = f"{base_url}/{ticker}"
+        url = f"{Config.MOROCCO_BASE_URL}/{ticker}"
         
-        # Faire la requête HTTP
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        # Requête conditionnelle: la page inchangée n'est ni retéléchargée ni reparsée
+        previous = _validators.get(url)
+        response = _fetch(url, previous)
         
-        response = requests.get(url, timeout=10, headers=headers)
-        response.raise_for_status()  # Lève une exception pour les codes d'erreur HTTP
+        if response.status_code == 304 and previous is not None:
+            return {**previous['result'], 'timestamp': datetime.utcnow().isoformat()}
         
-        # Parser le HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
+        response.raise_for_status()  # Lève une exception pour les codes d'erreur HTTP
         
-        # Ici, vous devrez adapter le parsing selon la structure HTML réelle du site
-        # Exemple générique (à adapter):
-        price_element = soup.find('span', class_='price')
-        change_element = soup.find('span', class_='change-percent')
-        company_element = soup.find('h1', class_='company-name')
+        # Parser le HTML (backend choisi par MOROCCO_PARSER)
+        fields = parse_quote_page(response.content)
         
-        if not price_element or not change_element:
+        if fields is None:
             return {
                 'error': 'Impossible de parser les données du site',
                 'ticker': ticker,
@@ -102,23 +167,17 @@ def scrape_casablanca_stock(ticker):
             }
         
         # Extraire les données
-        price = float(price_element.text.strip().replace(',', ''))
-        change_text = change_element.text.strip()
-        change_percent = float(change_text.replace('%', '').replace('+', ''))
-        company_name = company_element.text.strip() if company_element else ticker
+        result = _build_quote(ticker, fields['price'], fields['change'], fields['company'])
         
-        result = {
-            'symbol': ticker,
-            'price': price,
-            'change_percent': change_percent,
-            'timestamp': datetime.utcnow().isoformat(),
-            'currency': 'MAD',
-            'source': 'Casablanca Stock Exchange',
-            'company_name': company_name
-        }
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            _validators.set(url, {
+                'etag': etag,
+                'last_modified': last_modified,
+                'result': result
+            }, None)
         
-        # Mettre en cache
-        CACHE[ticker] = (result, current_time)
         return result
         
     except requests.exceptions.Timeout:
@@ -142,6 +201,172 @@ def scrape_casablanca_stock(ticker):
             'ticker': ticker
         }
 
+def scrape_casablanca_many(tickers, force_refresh=False):
+    """
+    Scrape plusieurs tickers de la Bourse de Casablanca en parallèle
+    
+    Si MOROCCO_SNAPSHOT_URL est configurée, la page listant tout le marché
+    est d'abord parsée en une seule requête pour remplir le cache; seuls les
+    tickers absents de cette page sont ensuite scrapés un par un, au plus
+    MOROCCO_CONCURRENCY à la fois.
+    
+    Args:
+        tickers (list): Liste de tickers (ex: ['IAM', 'ATW'])
+        force_refresh (bool): Ignore le cache et relance le scraping
+    
+    Returns:
+        dict: Ticker -> données boursières (ou erreur), dans l'ordre demandé
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    if not tickers:
+        return {}
+    
+    # Les tickers mockés ne figurent pas sur la page du marché
+    missing = [
+        t for t in tickers
+        if t not in MOCK_DATA and (force_refresh or MOROCCO_CACHE.get(t) is None)
+    ]
+    covered = set()
+    if missing and Config.MOROCCO_SNAPSHOT_URL:
+        snapshot = scrape_casablanca_snapshot()
+        for ticker, result in snapshot.items():
+            MOROCCO_CACHE.set(ticker, result)
+        covered = set(snapshot)
+    
+    futures = [
+        _get_executor().submit(scrape_casablanca_stock, t, force_refresh and t not in covered)
+        for t in tickers
+    ]
+    return {ticker: future.result() for ticker, future in zip(tickers, futures)}
+
+def scrape_casablanca_snapshot():
+    """
+    Parse toutes les cotations depuis la page du marché (MOROCCO_SNAPSHOT_URL)
+    
+    Chaque ligne du tableau des cotations porte le ticker dans l'attribut
+    data-ticker et les cellules price, change-percent et company-name
+    (voir services.morocco_parsers).
+    
+    Returns:
+        dict: Ticker -> données boursières; vide si la page est indisponible
+    """
+    url = Config.MOROCCO_SNAPSHOT_URL
+    if not url:
+        return {}
+    
+    try:
+        previous = _validators.get(url)
+        response = _fetch(url, previous)
+        if response.status_code == 304 and previous is not None:
+            now = datetime.utcnow().isoformat()
+            return {t: {**q, 'timestamp': now} for t, q in previous['result'].items()}
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.warning("Page du marché indisponible: %s", e)
+        return {}
+    
+    quotes = {}
+    for row in parse_snapshot_page(response.content):
+        ticker = row['ticker'].strip().upper()
+        if not ticker:
+            continue
+        try:
+            quotes[ticker] = _build_quote(ticker, row['price'], row['change'], row['company'])
+        except ValueError:
+            logger.warning("Ligne illisible pour %s sur la page du marché", ticker)
+    
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if quotes and (etag or last_modified):
+        _validators.set(url, {
+            'etag': etag,
+            'last_modified': last_modified,
+            'result': quotes
+        }, None)
+    
+    return quotes
+
+def _build_quote(ticker, price_text, change_text, company_text=None):
+    """
+    Construit une cotation à partir des textes extraits de la page
+    
+    Raises:
+        ValueError: Si le prix ou la variation ne sont pas numériques
+    """
+    price = float(price_text.strip().replace(',', ''))
+    change_percent = float(change_text.strip().replace('%', '').replace('+', ''))
+    company_name = company_text.strip() if company_text else ticker
+    
+    return {
+        'symbol': ticker,
+        'price': price,
+        'change_percent': change_percent,
+        'timestamp': datetime.utcnow().isoformat(),
+        'currency': 'MAD',
+        'source': 'Casablanca Stock Exchange',
+        'company_name': company_name
+    }
+
+def _get_executor():
+    global _executor
+    with _session_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.MOROCCO_CONCURRENCY),
+                thread_name_prefix='morocco-scraper'
+            )
+        return _executor
+
+def _fetch(url, previous=None):
+    """
+    Effectue un GET via la session partagée en mesurant la latence
+    
+    Args:
+        url (str): URL à récupérer
+        previous (dict): Validateurs de la réponse précédente (etag, last_modified)
+    
+    Returns:
+        requests.Response: La réponse HTTP
+    """
+    headers = {}
+    if previous is not None:
+        if previous.get('etag'):
+            headers['If-None-Match'] = previous['etag']
+        if previous.get('last_modified'):
+            headers['If-Modified-Since'] = previous['last_modified']
+    
+    start = time.perf_counter()
+    status = None
+    try:
+        response = get_session().get(url, timeout=Config.MOROCCO_HTTP_TIMEOUT, headers=headers)
+        status = response.status_code
+        return response
+    finally:
+        latency = time.perf_counter() - start
+        with _metrics_lock:
+            _metrics['requests'] += 1
+            _metrics['total_latency'] += latency
+            _metrics['last_latency'] = latency
+            _metrics['max_latency'] = max(_metrics['max_latency'], latency)
+            if status is None or status >= 400:
+                _metrics['errors'] += 1
+            if status == 304:
+                _metrics['not_modified'] += 1
+            key = str(status) if status is not None else 'exception'
+            _metrics['status_codes'][key] = _metrics['status_codes'].get(key, 0) + 1
+
+def get_scraper_metrics():
+    """
+    Retourne les métriques des requêtes HTTP du scraper
+    
+    Returns:
+        dict: Nombre de requêtes, erreurs, 304, latences moyenne/max/dernière (secondes)
+    """
+    with _metrics_lock:
+        metrics = {**_metrics, 'status_codes': dict(_metrics['status_codes'])}
+    metrics['avg_latency'] = metrics['total_latency'] / metrics['requests'] if metrics['requests'] else 0.0
+    return metrics
+
 def get_supported_morocco_tickers():
     """
     Retourne la liste des tickers marocains supportés
@@ -151,9 +376,17 @@ def get_supported_morocco_tickers():
     """
     return list(MOCK_DATA.keys())
 
+def get_morocco_cache_stats():
+    """
+    Retourne les compteurs du cache des cotations marocaines
+    
+    Returns:
+        dict: hits, stale_hits, misses, loads...
+    """
+    return MOROCCO_CACHE.stats()
+
 def clear_cache():
     """
-    Vide le cache global
+    Vide le cache des cotations marocaines
     """
-    global CACHE
-    CACHE = {}
+    MOROCCO_CACHE.clear()
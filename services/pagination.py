@@ -0,0 +1,141 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, or_
+
+# Taille de page par défaut et maximale des historiques
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Lignes lues par requête lors d'un export NDJSON
+STREAM_BATCH_SIZE = 1000
+
+
+def encode_cursor(timestamp, row_id):
+    """
+    Encode la position (timestamp, id) de la dernière ligne d'une page
+
+    Returns:
+        str: Curseur opaque (base64 URL-safe)
+    """
+    payload = json.dumps([timestamp.isoformat(), row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Décode un curseur produit par encode_cursor
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f'Curseur invalide: {cursor}') from e
+
+
+def parse_limit(value):
+    """
+    Valide le paramètre limit (défaut DEFAULT_PAGE_SIZE, plafonné à MAX_PAGE_SIZE)
+
+    Raises:
+        ValueError: Si limit n'est pas un entier positif
+    """
+    if value is None or value == '':
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit <= 0:
+        raise ValueError('limit doit être positif')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_datetime(value):
+    """
+    Convertit un paramètre date ou date-heure ISO 8601 (None si absent)
+
+    Les dates des tables sont en UTC sans fuseau: une date avec décalage
+    (ex: 2024-01-01T10:00+02:00) est convertie en UTC puis rendue naïve.
+
+    Raises:
+        ValueError: Si la date est invalide
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _after(query, timestamp_column, id_column, position):
+    # Lignes strictement après la position dans l'ordre (timestamp desc, id desc)
+    timestamp, row_id = position
+    return query.filter(or_(
+        timestamp_column < timestamp,
+        and_(timestamp_column == timestamp, id_column < row_id)
+    ))
+
+
+def keyset_page(query, timestamp_column, id_column, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Retourne une page d'une requête triée du plus récent au plus ancien
+
+    La page suivante repart de la dernière ligne lue (keyset) au lieu d'un
+    OFFSET: le coût d'une page ne dépend pas de sa position.
+
+    Args:
+        query (Query): Requête filtrée (sans tri)
+        timestamp_column: Colonne de date du tri
+        id_column: Colonne id, départage des dates identiques
+        cursor (str): Curseur de la page précédente
+        limit (int): Taille de page
+
+    Returns:
+        tuple: (lignes, curseur de la page suivante ou None)
+    """
+    if cursor:
+        query = _after(query, timestamp_column, id_column, decode_cursor(cursor))
+
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+
+
+def stream_ndjson(query, timestamp_column, id_column, batch_size=STREAM_BATCH_SIZE):
+    """
+    Génère toutes les lignes d'une requête en NDJSON (un objet JSON par ligne)
+
+    Les lignes sont lues par lots successifs en keyset: la mémoire utilisée
+    ne dépend que de batch_size, jamais de la taille de l'historique.
+
+    Args:
+        query (Query): Requête filtrée (sans tri) sur un modèle avec to_dict()
+        timestamp_column: Colonne de date du tri
+        id_column: Colonne id
+
+    Yields:
+        str: Une ligne NDJSON
+    """
+    position = None
+    while True:
+        batch_query = query if position is None else _after(query, timestamp_column, id_column, position)
+        rows = batch_query.order_by(timestamp_column.desc(), id_column.desc()).limit(batch_size).all()
+        if not rows:
+            return
+        for row in rows:
+            yield json.dumps(row.to_dict()) + '\n'
+        last = rows[-1]
+        position = (getattr(last, timestamp_column.key), getattr(last, id_column.key))
+        # Libérer les objets du lot (seulement eux) de l'identity map de la session
+        for row in rows:
+            query.session.expunge(row)
+        if len(rows) < batch_size:
+            return
@@ -0,0 +1,181 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Position, Trade
+
+logger = logging.getLogger(__name__)
+
+# Tolérance sur les quantités (cumul de flottants)
+QUANTITY_EPSILON = 1e-9
+
+
+def apply_buy(challenge_id, symbol, quantity, price):
+    """
+    Ajoute un achat à la position (prix moyen pondéré) dans la transaction courante
+
+    Args:
+        challenge_id (int): Le challenge
+        symbol (str): Le symbole
+        quantity (float): Quantité achetée
+        price (float): Prix d'exécution
+    """
+    now = datetime.utcnow()
+    # Les expressions lisent les valeurs avant mise à jour: moyenne pondérée atomique
+    values = {
+        Position.avg_cost: (Position.avg_cost * Position.quantity + price * quantity) / (Position.quantity + quantity),
+        Position.quantity: Position.quantity + quantity,
+        Position.updated_at: now
+    }
+    position = Position.query.filter_by(challenge_id=challenge_id, symbol=symbol)
+
+    if position.update(values, synchronize_session=False):
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(Position(
+                challenge_id=challenge_id,
+                symbol=symbol,
+                quantity=quantity,
+                avg_cost=price,
+                realized_pnl=0.0,
+                updated_at=now
+            ))
+    except IntegrityError:
+        # Position créée entre-temps par une autre transaction
+        position.update(values, synchronize_session=False)
+
+
+def apply_sell(challenge_id, symbol, quantity, price):
+    """
+    Retire une vente de la position et calcule le P&L réalisé en O(1)
+
+    La mise à jour est conditionnelle (quantité détenue suffisante): une
+    vente à découvert ne modifie rien.
+
+    Args:
+        challenge_id (int): Le challenge
+        symbol (str): Le symbole
+        quantity (float): Quantité vendue
+        price (float): Prix d'exécution
+
+    Returns:
+        float | None: Le P&L réalisé, ou None si la position est insuffisante
+    """
+    remaining = Position.quantity - quantity
+    updated = Position.query.filter(
+        Position.challenge_id == challenge_id,
+        Position.symbol == symbol,
+        Position.quantity >= quantity - QUANTITY_EPSILON
+    ).update({
+        Position.realized_pnl: Position.realized_pnl + (price - Position.avg_cost) * quantity,
+        # Position soldée: remise à zéro exacte malgré les arrondis
+        Position.quantity: case((remaining > QUANTITY_EPSILON, remaining), else_=0.0),
+        Position.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+
+    if not updated:
+        return None
+
+    # avg_cost n'est pas modifié par une vente; la ligne est verrouillée jusqu'au commit
+    avg_cost = db.session.query(Position.avg_cost).filter_by(
+        challenge_id=challenge_id,
+        symbol=symbol
+    ).scalar()
+    return (price - avg_cost) * quantity
+
+
+def get_open_positions(challenge_id):
+    """
+    Retourne les positions ouvertes d'un challenge
+
+    Returns:
+        list: Position avec une quantité non nulle, triées par symbole
+    """
+    return Position.query.filter(
+        Position.challenge_id == challenge_id,
+        Position.quantity > QUANTITY_EPSILON
+    ).order_by(Position.symbol).all()
+
+
+def rebuild_positions(batch_size=10_000, update_trades=True):
+    """
+    Reconstruit toutes les positions en rejouant les trades en un seul passage
+
+    Les trades sont lus en flux, triés par challenge puis par date: seules les
+    positions du challenge en cours sont gardées en mémoire. Les ventes
+    au-delà de la quantité détenue (trades antérieurs au suivi des positions)
+    ne réalisent de P&L que sur la quantité détenue.
+
+    Args:
+        batch_size (int): Lignes lues par lot et taille des écritures groupées
+        update_trades (bool): Renseigne aussi profit_loss des ventes
+
+    Returns:
+        dict: Nombre de trades lus, positions écrites et ventes à découvert
+    """
+    Position.query.delete(synchronize_session=False)
+
+    stats = {'trades': 0, 'positions': 0, 'oversold': 0}
+    now = datetime.utcnow()
+    current_challenge = None
+    positions = {}
+    pending_positions = []
+    pending_trades = []
+
+    def flush_challenge():
+        for symbol, state in positions.items():
+            pending_positions.append({
+                'challenge_id': current_challenge,
+                'symbol': symbol,
+                'quantity': state['quantity'] if state['quantity'] > QUANTITY_EPSILON else 0.0,
+                'avg_cost': state['avg_cost'],
+                'realized_pnl': state['realized_pnl'],
+                'updated_at': now
+            })
+        stats['positions'] += len(positions)
+        positions.clear()
+
+    # Colonnes seules: pas d'objets ORM gardés dans la session
+    rows = db.session.query(
+        Trade.id, Trade.challenge_id, Trade.symbol, Trade.action, Trade.quantity, Trade.price
+    ).order_by(Trade.challenge_id, Trade.timestamp, Trade.id).execution_options(yield_per=batch_size)
+
+    for trade_id, challenge_id, symbol, action, quantity, price in rows:
+        if challenge_id != current_challenge:
+            flush_challenge()
+            current_challenge = challenge_id
+
+        state = positions.setdefault(symbol, {'quantity': 0.0, 'avg_cost': 0.0, 'realized_pnl': 0.0})
+        if action == 'buy':
+            total = state['quantity'] + quantity
+            state['avg_cost'] = (state['avg_cost'] * state['quantity'] + price * quantity) / total
+            state['quantity'] = total
+        else:
+            matched = min(quantity, max(state['quantity'], 0.0))
+            if matched < quantity - QUANTITY_EPSILON:
+                stats['oversold'] += 1
+            profit_loss = (price - state['avg_cost']) * matched
+            state['realized_pnl'] += profit_loss
+            state['quantity'] -= matched
+            if update_trades:
+                pending_trades.append({'id': trade_id, 'profit_loss': profit_loss})
+
+        stats['trades'] += 1
+        if len(pending_trades) >= batch_size:
+            db.session.bulk_update_mappings(Trade, pending_trades)
+            pending_trades.clear()
+        if len(pending_positions) >= batch_size:
+            db.session.bulk_insert_mappings(Position, pending_positions)
+            pending_positions.clear()
+
+    flush_challenge()
+    if pending_trades:
+        db.session.bulk_update_mappings(Trade, pending_trades)
+    if pending_positions:
+        db.session.bulk_insert_mappings(Position, pending_positions)
+    db.session.commit()
+    return stats
@@ -0,0 +1,159 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import case
+
+from models import db, Challenge
+from services.active_challenge import invalidate_active_challenge
+from services.equity import get_cached_prices, get_open_symbols, load_prices, mark_to_market
+
+# Issues des règles, dans l'ordre d'évaluation de check_challenge_rules
+RULE_OUTCOMES = (
+    ('passed', 'Profit target reached!'),
+    ('failed', 'Max total loss exceeded'),
+    ('failed', 'Max daily loss exceeded')
+)
+
+# Code de règle d'un challenge qui reste actif
+RULE_NONE = -1
+
+
+def evaluate_rules_arrays(initial_balances, equities, daily_start_balances,
+                          profit_targets, max_total_loss_percents, max_daily_loss_percents):
+    """
+    Version tableaux de check_challenge_rules
+
+    Mêmes formules (même ordre d'opérations, donc mêmes arrondis) et même
+    priorité: objectif de profit, puis perte totale, puis perte journalière.
+    Les soldes initiaux et de début de journée doivent être non nuls.
+
+    Args:
+        initial_balances (ndarray): Capital initial
+        equities (ndarray): Equity évaluée (ou current_balance)
+        daily_start_balances (ndarray): Référence de la perte journalière
+        profit_targets (ndarray): Objectif de profit (%)
+        max_total_loss_percents (ndarray): Perte totale maximale (%)
+        max_daily_loss_percents (ndarray): Perte journalière maximale (%)
+
+    Returns:
+        tuple: (statuts 'passed' / 'failed' / 'active', codes de règle:
+            indice dans RULE_OUTCOMES ou RULE_NONE)
+    """
+    initial_balances = np.asarray(initial_balances, dtype=float)
+    equities = np.asarray(equities, dtype=float)
+    daily_start_balances = np.asarray(daily_start_balances, dtype=float)
+
+    profit_percent = ((equities - initial_balances) / initial_balances) * 100
+    total_loss_percent = ((initial_balances - equities) / initial_balances) * 100
+    daily_loss_percent = ((daily_start_balances - equities) / daily_start_balances) * 100
+
+    # np.select retient la première condition vraie, comme les if successifs
+    conditions = [
+        profit_percent >= np.asarray(profit_targets, dtype=float),
+        total_loss_percent >= np.asarray(max_total_loss_percents, dtype=float),
+        daily_loss_percent >= np.asarray(max_daily_loss_percents, dtype=float)
+    ]
+    codes = np.select(conditions, list(range(len(RULE_OUTCOMES))), default=RULE_NONE)
+    statuses = np.array([status for status, _ in RULE_OUTCOMES] + ['active'])[codes]
+    return statuses, codes
+
+
+def rule_status_expression(equity):
+    """
+    Expression SQL du statut d'un challenge selon ses règles
+
+    Même ordre et mêmes formules que check_challenge_rules: objectif de
+    profit, puis perte totale, puis perte journalière.
+
+    Args:
+        equity (ColumnElement): L'equity de la ligne challenge
+
+    Returns:
+        ColumnElement: 'passed', 'failed' ou 'active'
+    """
+    profit_percent = ((equity - Challenge.initial_balance) / Challenge.initial_balance) * 100
+    total_loss_percent = ((Challenge.initial_balance - equity) / Challenge.initial_balance) * 100
+    daily_loss_percent = ((Challenge.daily_start_balance - equity) / Challenge.daily_start_balance) * 100
+    return case(
+        (profit_percent >= Challenge.profit_target, RULE_OUTCOMES[0][0]),
+        (total_loss_percent >= Challenge.max_total_loss_percent, RULE_OUTCOMES[1][0]),
+        (daily_loss_percent >= Challenge.max_daily_loss_percent, RULE_OUTCOMES[2][0]),
+        else_='active'
+    )
+
+
+def apply_rule_statuses(challenge_ids, statuses, batch_size=1000):
+    """
+    Termine en bloc les challenges dont le statut évalué n'est plus actif
+
+    Un UPDATE ... SET status = CASE id ... par lot de batch_size ids, dans
+    la transaction courante. Un challenge déjà terminé entre-temps n'est
+    pas modifié.
+
+    Args:
+        challenge_ids (ndarray): Ids des challenges évalués
+        statuses (ndarray): Statuts retournés par evaluate_rules_arrays
+        batch_size (int): Ids par UPDATE
+
+    Returns:
+        int: Nombre de challenges terminés
+    """
+    ended = np.asarray(statuses) != 'active'
+    ids = np.asarray(challenge_ids)[ended].tolist()
+    new_statuses = np.asarray(statuses)[ended].tolist()
+    now = datetime.utcnow()
+
+    updated = 0
+    for start in range(0, len(ids), batch_size):
+        batch = dict(zip(ids[start:start + batch_size], new_statuses[start:start + batch_size]))
+        updated += Challenge.query.filter(
+            Challenge.id.in_(list(batch)),
+            Challenge.status == 'active'
+        ).update({
+            Challenge.status: case(batch, value=Challenge.id),
+            Challenge.ended_at: now
+        }, synchronize_session=False)
+    return updated
+
+
+def reevaluate_all(batch_size=1000):
+    """
+    Réévalue les règles de tous les challenges actifs sur leur equity au
+    prix du marché et termine ceux qui sont en infraction
+
+    Les cotations absentes du cache (worker qui n'exécute pas le
+    scheduler) sont d'abord chargées. Un challenge détenant un symbole
+    toujours sans prix serait valorisé au prix moyen d'achat: il n'est pas
+    évalué et figure dans 'skipped', les autres sont évalués normalement.
+
+    Returns:
+        dict: Nombre de challenges évalués, terminés, terminés par règle,
+            ids des challenges non évalués et symboles sans cotation
+    """
+    symbols = get_open_symbols()
+    cached = get_cached_prices(symbols)
+    load_prices([symbol for symbol in symbols if symbol not in cached])
+
+    snapshot = mark_to_market()
+    priced = ~snapshot['unpriced']
+    statuses, codes = evaluate_rules_arrays(
+        snapshot['initial_balances'][priced],
+        snapshot['equity'][priced],
+        snapshot['daily_start_balances'][priced],
+        snapshot['profit_targets'][priced],
+        snapshot['max_total_loss_percents'][priced],
+        snapshot['max_daily_loss_percents'][priced]
+    )
+    updated = apply_rule_statuses(snapshot['challenge_ids'][priced], statuses, batch_size)
+    if updated:
+        invalidate_active_challenge()
+    db.session.commit()
+
+    counts = np.bincount(codes[codes != RULE_NONE], minlength=len(RULE_OUTCOMES))
+    return {
+        'evaluated': int(priced.sum()),
+        'ended': updated,
+        'by_rule': {reason: int(count) for (_, reason), count in zip(RULE_OUTCOMES, counts)},
+        'skipped': snapshot['challenge_ids'][snapshot['unpriced']].tolist(),
+        'unpriced_symbols': snapshot['unpriced_symbols']
+    }
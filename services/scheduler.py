@@ -0,0 +1,234 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from models import db
+from services import bar_store
+from services.checkout import resume_stale_payments
+from services.equity import mark_to_market
+from services.leaderboard import ensure_built as ensure_leaderboard_built
+from services.market_data import SUPPORTED_SYMBOLS, refresh_live_prices
+from services.morocco_scraper import get_supported_morocco_tickers, scrape_casablanca_many
+from services.sweeper import reset_daily_start_balances, sweep_rules
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou inter-processus
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+_start_lock = threading.Lock()
+_lock_handle = None
+
+
+def init_scheduler(app):
+    """
+    Enregistre le démarrage du scheduler de rafraîchissement des prix
+
+    Le scheduler démarre à la première requête servie par le processus
+    (jamais dans le processus parent du reloader ni dans le maître gunicorn
+    avant le fork), et un verrou fichier garantit qu'un seul worker
+    exécute les tâches.
+
+    Args:
+        app (Flask): L'application Flask
+    """
+    if not app.config.get('SCHEDULER_ENABLED') or app.testing:
+        return
+
+    @app.before_request
+    def _ensure_scheduler_started():
+        if _scheduler is None:
+            start_scheduler(app)
+
+
+def start_scheduler(app):
+    """
+    Démarre le scheduler si ce processus obtient le verrou de leader
+
+    Args:
+        app (Flask): L'application Flask
+
+    Returns:
+        BackgroundScheduler | None: Le scheduler démarré, ou None
+    """
+    global _scheduler
+    with _start_lock:
+        if _scheduler is not None:
+            return _scheduler or None
+        if not _acquire_leader_lock(app.config['SCHEDULER_LOCK_FILE']):
+            # Un autre worker exécute les tâches: retenter régulièrement pour
+            # prendre le relais s'il s'arrête (recyclage, crash)
+            _scheduler = False
+            _schedule_leader_retry(app)
+            return None
+
+        scheduler = BackgroundScheduler(daemon=True, timezone='UTC')
+        _register_jobs(scheduler, app)
+        scheduler.start()
+        atexit.register(scheduler.shutdown, wait=False)
+
+        logger.info("Scheduler de rafraîchissement démarré (pid %s)", os.getpid())
+        _scheduler = scheduler
+        return scheduler
+
+
+def _register_jobs(scheduler, app):
+    config = app.config
+    jitter = config['SCHEDULER_JITTER']
+    stocks = [s for s in SUPPORTED_SYMBOLS if not s.endswith('-USD')]
+    crypto = [s for s in SUPPORTED_SYMBOLS if s.endswith('-USD')]
+
+    jobs = [
+        ('refresh_stocks', refresh_quotes, [stocks, config['SCHEDULER_STOCKS_INTERVAL'], app], config['SCHEDULER_STOCKS_INTERVAL']),
+        ('refresh_crypto', refresh_quotes, [crypto, config['SCHEDULER_CRYPTO_INTERVAL'], app], config['SCHEDULER_CRYPTO_INTERVAL']),
+        ('refresh_morocco', refresh_morocco, [app], config['SCHEDULER_MOROCCO_INTERVAL']),
+        ('refresh_bars', refresh_bars, [SUPPORTED_SYMBOLS], config['SCHEDULER_BARS_INTERVAL']),
+        ('sweep_rules', run_sweeper, [app], config['SCHEDULER_SWEEP_INTERVAL']),
+        ('resume_checkouts', run_checkout_reaper, [app], config['SCHEDULER_CHECKOUT_INTERVAL'])
+    ]
+    for job_id, func, args, interval in jobs:
+        scheduler.add_job(
+            func,
+            'interval',
+            args=args,
+            id=job_id,
+            seconds=interval,
+            jitter=jitter,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now(timezone.utc)
+        )
+
+    # Construction initiale du classement, une seule fois au démarrage du leader
+    scheduler.add_job(build_leaderboard, args=[app], id='build_leaderboard', max_instances=1)
+
+    # Début de la journée de trading (heure UTC)
+    scheduler.add_job(
+        run_daily_reset,
+        'cron',
+        args=[app],
+        id='reset_daily_start',
+        hour=config['TRADING_DAY_START_HOUR'],
+        minute=0,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=3600
+    )
+
+
+def refresh_quotes(symbols, interval, app=None):
+    """
+    Rafraîchit les cotations d'une classe d'actifs dans le cache partagé,
+    puis revalorise les challenges actifs
+    """
+    # Les entrées survivent jusqu'au passage suivant, même avec le jitter
+    results = refresh_live_prices(symbols, ttl=interval * 2)
+    failed = [symbol for symbol, quote in results.items() if 'error' in quote]
+    if failed:
+        logger.warning("Cotations non rafraîchies: %s", ", ".join(failed))
+    revalue_challenges(app)
+
+
+def refresh_morocco(app=None):
+    """
+    Rafraîchit les cotations de la Bourse de Casablanca, puis revalorise
+    les challenges actifs
+    """
+    results = scrape_casablanca_many(get_supported_morocco_tickers(), force_refresh=True)
+    failed = [ticker for ticker, quote in results.items() if 'error' in quote]
+    if failed:
+        logger.warning("Cotations marocaines non rafraîchies: %s", ", ".join(failed))
+    revalue_challenges(app)
+
+
+def revalue_challenges(app):
+    """
+    Valorise les positions ouvertes aux cotations qui viennent d'être mises en cache
+    """
+    _run_with_app(app, mark_to_market, "Valorisation des challenges impossible")
+
+
+def run_sweeper(app):
+    """
+    Applique les règles de perte et d'objectif à tous les challenges actifs
+    """
+    _run_with_app(app, sweep_rules, "Application des règles impossible")
+
+
+def build_leaderboard(app):
+    """
+    Construit le classement maintenu s'il est vide (base existante)
+    """
+    _run_with_app(app, ensure_leaderboard_built, "Construction du classement impossible")
+
+
+def run_checkout_reaper(app):
+    """
+    Reprend les paiements restés en attente (worker redémarré pendant le traitement)
+    """
+    _run_with_app(app, resume_stale_payments, "Reprise des paiements en attente impossible")
+
+
+def run_daily_reset(app):
+    """
+    Réinitialise les soldes de début de journée des challenges actifs
+    """
+    _run_with_app(app, reset_daily_start_balances, "Réinitialisation journalière impossible")
+
+
+def _run_with_app(app, func, error_message):
+    if app is None:
+        return
+    with app.app_context():
+        try:
+            func()
+        except Exception:
+            logger.exception(error_message)
+        finally:
+            db.session.remove()
+
+
+def refresh_bars(symbols):
+    """
+    Complète le store local des barres journalières utilisées par les signaux
+    """
+    errors = bar_store.refresh_many(symbols, '1d', '3mo', force=True)
+    for symbol, error in errors.items():
+        logger.warning("Barres non rafraîchies pour %s: %s", symbol, error)
+
+
+def _schedule_leader_retry(app):
+    timer = threading.Timer(app.config['SCHEDULER_LEADER_RETRY_INTERVAL'], _retry_leadership, [app])
+    timer.daemon = True
+    timer.start()
+
+
+def _retry_leadership(app):
+    global _scheduler
+    with _start_lock:
+        if _scheduler is not False:
+            return
+        _scheduler = None
+    start_scheduler(app)
+
+
+def _acquire_leader_lock(path):
+    global _lock_handle
+    if fcntl is None:
+        return True
+    handle = open(path, 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    # Le verrou est conservé tant que le processus vit
+    _lock_handle = handle
+    return True
@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func
+
+from config import Config
+from models import db, Challenge
+from services.active_challenge import invalidate_active_challenge
+from services.equity import equity_expression, get_cached_prices, get_open_symbols, holds_any
+from services.rules import rule_status_expression
+
+logger = logging.getLogger(__name__)
+
+# Métriques des passages (dernier passage et cumuls)
+_metrics_lock = threading.Lock()
+_metrics = {
+    'sweeps': 0,
+    'resets': 0,
+    'errors': 0,
+    'ended_total': 0,
+    'last_sweep': None,
+    'last_reset': None
+}
+
+
+def _id_ranges(batch_size):
+    """
+    Découpe les ids des challenges actifs en plages [début, fin) de batch_size ids
+    """
+    low, high = db.session.query(func.min(Challenge.id), func.max(Challenge.id)).filter(
+        Challenge.status == 'active'
+    ).one()
+    if low is None:
+        return []
+    return [(start, start + batch_size) for start in range(low, high + 1, batch_size)]
+
+
+def _priced_snapshot():
+    """
+    Prix en cache des symboles détenus et condition écartant les challenges
+    dont une position n'a pas de cotation
+
+    Returns:
+        tuple: (prix par symbole, symboles sans prix triés, condition SQL ou None)
+    """
+    symbols = get_open_symbols()
+    prices = get_cached_prices(symbols)
+    unpriced = sorted(set(symbols) - set(prices))
+    return prices, unpriced, ~holds_any(unpriced) if unpriced else None
+
+
+def _skipped(unpriced):
+    """
+    Nombre de challenges actifs laissés de côté faute de cotation
+    """
+    if not unpriced:
+        return 0
+    return db.session.query(func.count(Challenge.id)).filter(
+        Challenge.status == 'active',
+        holds_any(unpriced)
+    ).scalar()
+
+
+def _run_batches(batch_size, statement):
+    """
+    Exécute statement(début, fin) par plage d'ids, un commit par plage
+
+    Des transactions courtes évitent de verrouiller toute la table pendant
+    un passage; un trade concurrent n'attend qu'une plage.
+
+    Returns:
+        dict: Métriques du passage (lignes modifiées, lots, durées)
+    """
+    started = time.perf_counter()
+    ranges = _id_ranges(batch_size)
+    updated = 0
+    slowest = 0.0
+    for start, end in ranges:
+        batch_started = time.perf_counter()
+        count = statement(start, end)
+        if count:
+            invalidate_active_challenge()
+        db.session.commit()
+        updated += count
+        slowest = max(slowest, time.perf_counter() - batch_started)
+
+    return {
+        'at': datetime.utcnow().isoformat(),
+        'updated': updated,
+        'batches': len(ranges),
+        'batch_size': batch_size,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        'slowest_batch_ms': round(slowest * 1000, 2)
+    }
+
+
+def sweep_rules(batch_size=None):
+    """
+    Applique les règles à tous les challenges actifs, en SQL ensembliste
+
+    Chaque lot est un UPDATE ... CASE sur une plage d'ids: seuls les
+    challenges en infraction changent de statut. L'equity est calculée en
+    SQL avec les cotations en cache (voir equity_expression). Un challenge
+    détenant un symbole sans cotation n'est pas évalué: il est compté dans
+    'skipped' et ses symboles listés dans 'unpriced_symbols'.
+
+    Args:
+        batch_size (int): Ids par lot (défaut SWEEPER_BATCH_SIZE)
+
+    Returns:
+        dict: Métriques du passage; 'updated' = challenges terminés
+    """
+    batch_size = batch_size or Config.SWEEPER_BATCH_SIZE
+    try:
+        prices, unpriced, priced = _priced_snapshot()
+        status = rule_status_expression(equity_expression(prices))
+        now = datetime.utcnow()
+
+        def statement(start, end):
+            query = Challenge.query.filter(
+                Challenge.status == 'active',
+                Challenge.id >= start,
+                Challenge.id < end,
+                status != 'active'
+            )
+            if priced is not None:
+                query = query.filter(priced)
+            return query.update({
+                Challenge.status: status,
+                Challenge.ended_at: now
+            }, synchronize_session=False)
+
+        result = _run_batches(batch_size, statement)
+        result.update(skipped=_skipped(unpriced), unpriced_symbols=unpriced)
+    except Exception:
+        db.session.rollback()
+        with _metrics_lock:
+            _metrics['errors'] += 1
+        raise
+
+    with _metrics_lock:
+        _metrics['sweeps'] += 1
+        _metrics['ended_total'] += result['updated']
+        _metrics['last_sweep'] = result
+    if result['updated']:
+        logger.info("Règles appliquées: %s challenges terminés en %.0f ms", result['updated'], result['duration_ms'])
+    if result['skipped']:
+        logger.warning("Règles non appliquées à %s challenges, sans cotation: %s", result['skipped'], ', '.join(unpriced))
+    return result
+
+
+def reset_daily_start_balances(batch_size=None):
+    """
+    Début de journée de trading: la référence de perte journalière de
+    chaque challenge actif devient son equity courante
+
+    Les règles sont d'abord appliquées une dernière fois, pour ne pas
+    effacer une infraction de la journée écoulée. Un challenge détenant un
+    symbole sans cotation garde sa référence précédente (compté dans
+    'skipped').
+
+    Args:
+        batch_size (int): Ids par lot (défaut SWEEPER_BATCH_SIZE)
+
+    Returns:
+        dict: Métriques du passage; 'updated' = challenges réinitialisés
+    """
+    batch_size = batch_size or Config.SWEEPER_BATCH_SIZE
+    sweep_rules(batch_size)
+    try:
+        prices, unpriced, priced = _priced_snapshot()
+        equity = equity_expression(prices)
+
+        def statement(start, end):
+            query = Challenge.query.filter(
+                Challenge.status == 'active',
+                Challenge.id >= start,
+                Challenge.id < end
+            )
+            if priced is not None:
+                query = query.filter(priced)
+            return query.update({Challenge.daily_start_balance: equity}, synchronize_session=False)
+
+        result = _run_batches(batch_size, statement)
+        result.update(skipped=_skipped(unpriced), unpriced_symbols=unpriced)
+    except Exception:
+        db.session.rollback()
+        with _metrics_lock:
+            _metrics['errors'] += 1
+        raise
+
+    with _metrics_lock:
+        _metrics['resets'] += 1
+        _metrics['last_reset'] = result
+    logger.info("Soldes de début de journée réinitialisés: %s challenges en %.0f ms", result['updated'], result['duration_ms'])
+    if result['skipped']:
+        logger.warning("Soldes de début de journée conservés pour %s challenges, sans cotation: %s", result['skipped'], ', '.join(unpriced))
+    return result
+
+
+def get_sweeper_metrics():
+    """
+    Retourne les métriques des passages du sweeper
+    """
+    with _metrics_lock:
+        return dict(_metrics)